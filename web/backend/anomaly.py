@@ -0,0 +1,247 @@
+"""
+Streaming anomaly detection on the reading stream.
+
+Each (industry, pollutant) keeps an exponentially weighted mean and variance
+(Welford's update with a forgetting factor), the last value and how many
+times it has repeated: five numbers whatever the history length. The write
+path scores every persisted reading against its series before folding it
+in, so the cost per reading is constant:
+
+    spike / drop   |value - mean| > ANOMALY_Z standard deviations
+    stuck          the same value ANOMALY_STUCK_REPEATS times in a row
+
+Flagged values go to the anomalies table and, once their batch commits,
+out as an `anomaly` Socket.IO event. Threshold violations stay with
+compliance.is_violation; this catches faults and spikes below the limits.
+
+    python anomaly.py backfill [--days N]   # rescore stored readings
+"""
+import math
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from limits import POLLUTANTS
+from models import db, Industry, SensorReading, AnomalyState, Anomaly
+from cache import invalidate_on_commit, response_cache
+from metrics import Counter, SOCKET_EMITS
+
+ANOMALY = 'anomaly'
+Z_THRESHOLD = float(os.getenv('ANOMALY_Z', 4.0))
+STUCK_REPEATS = int(os.getenv('ANOMALY_STUCK_REPEATS', 10))
+DECAY = 0.01      # forgetting factor: statistics cover roughly the last 100 readings
+WARMUP = 30       # readings before a series is scored
+MIN_SD = 0.01     # floor on the sd, relative to the mean, for near-constant series
+
+ANOMALIES = Counter('aerosense_anomalies_total', 'Readings flagged by the anomaly detector',
+                    ('pollutant', 'kind'))
+
+_socketio = None
+_COLUMNS = ('n', 'mean', 'variance', 'last', 'repeats')
+
+
+class Detector:
+    __slots__ = _COLUMNS
+
+    def __init__(self, n=0, mean=0.0, variance=0.0, last=None, repeats=0):
+        self.n, self.mean, self.variance, self.last, self.repeats = n, mean, variance, last, repeats
+
+    def update(self, x):
+        """Score `x` against the series so far, fold it in, return (kind|None, z)."""
+        kind, z = None, 0.0
+        self.repeats = self.repeats + 1 if x == self.last else 0
+        self.last = x
+        if self.n >= WARMUP:
+            sd = max(math.sqrt(self.variance), MIN_SD * abs(self.mean), 1e-9)
+            z = (x - self.mean) / sd
+            if z > Z_THRESHOLD:
+                kind = 'spike'
+            elif z < -Z_THRESHOLD:
+                kind = 'drop'
+            elif self.repeats == STUCK_REPEATS - 1:
+                kind = 'stuck'
+            if kind in ('spike', 'drop'):
+                # Winsorise so one outlier does not drag the baseline along with it
+                x = self.mean + math.copysign(Z_THRESHOLD * sd, z)
+        self.n += 1
+        alpha = max(1.0 / self.n, DECAY)  # exact Welford until the window fills
+        diff = x - self.mean
+        self.mean += alpha * diff
+        self.variance = (1 - alpha) * (self.variance + alpha * diff * diff)
+        return kind, z
+
+
+# ── Scoring ───────────────────────────────────────────────────────────────────
+def _score(rows, detectors):
+    """Run `rows` (timestamp order) through `detectors`, returning anomaly dicts."""
+    found = []
+    for r in rows:
+        for p in POLLUTANTS:
+            value = r.get(p)
+            if value is None:
+                continue
+            key = (r['industry_id'], p)
+            d = detectors.get(key)
+            if d is None:
+                d = detectors[key] = Detector()
+            expected = d.mean
+            kind, z = d.update(value)
+            if kind:
+                found.append({'reading_id': r['id'], 'industry_id': r['industry_id'],
+                              'pollutant': p, 'kind': kind, 'value': value,
+                              'expected': round(expected, 3), 'score': round(z, 2),
+                              'timestamp': r['timestamp']})
+    return found
+
+
+def _load(keys):
+    if not keys:
+        return {}
+    table = AnomalyState.__table__
+    rows = db.session.execute(
+        select(table)
+        .where(tuple_(table.c.industry_id, table.c.pollutant).in_(list(keys)))
+        .with_for_update()
+    ).mappings()
+    return {(r['industry_id'], r['pollutant']): Detector(*(r[c] for c in _COLUMNS)) for r in rows}
+
+
+def _save(detectors):
+    if not detectors:
+        return
+    table = AnomalyState.__table__
+    if db.engine.dialect.name == 'postgresql':
+        stmt = postgresql.insert(table)
+    elif db.engine.dialect.name == 'sqlite':
+        stmt = sqlite.insert(table)
+    else:
+        raise NotImplementedError(f'Anomaly state needs SQLite or PostgreSQL, not {db.engine.dialect.name}')
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.industry_id, table.c.pollutant],
+                                      set_={c: stmt.excluded[c] for c in _COLUMNS})
+    db.session.execute(stmt, [{'industry_id': i, 'pollutant': p, **{c: getattr(d, c) for c in _COLUMNS}}
+                              for (i, p), d in detectors.items()])
+
+
+def apply_readings(rows):
+    """
+    Score freshly inserted reading dicts (with ids) and fold them into the
+    detector state, inside the caller's transaction. Flagged values are
+    stored and emitted after the commit.
+    """
+    keys = {(r['industry_id'], p) for r in rows for p in POLLUTANTS if r.get(p) is not None}
+    if not keys:
+        return []
+    detectors = _load(keys)
+    found = _score(sorted(rows, key=lambda r: r['timestamp']), detectors)
+    _save(detectors)
+    if found:
+        db.session.execute(Anomaly.__table__.insert(), found)
+        db.session.info.setdefault('anomalies', []).extend(found)
+        invalidate_on_commit(db.session, 'anomalies')
+    return found
+
+
+# ── Alerts ────────────────────────────────────────────────────────────────────
+def anomaly_dict(a):
+    ts = a['timestamp']
+    return {**a, 'timestamp': ts.isoformat() if isinstance(ts, datetime) else ts}
+
+
+@event.listens_for(Session, 'after_commit')
+def _emit_committed(session):
+    found = session.info.pop('anomalies', None)
+    if not found:
+        return
+    for a in found:
+        ANOMALIES.inc(a['pollutant'], a['kind'])
+        if _socketio is not None:
+            _socketio.emit(ANOMALY, anomaly_dict(a))
+            SOCKET_EMITS.inc(ANOMALY)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop('anomalies', None)
+
+
+def start_anomaly_alerts(socketio):
+    global _socketio
+    _socketio = socketio
+
+
+# ── Read side ─────────────────────────────────────────────────────────────────
+def recent(limit, before=None, industry_id=None):
+    """Flagged values newest first, keyset-paged on (timestamp, id)."""
+    query = (db.session.query(Anomaly, Industry.name)
+             .join(Industry, Industry.id == Anomaly.industry_id))
+    if industry_id is not None:
+        query = query.filter(Anomaly.industry_id == industry_id)
+    if before is not None:
+        query = query.filter(tuple_(Anomaly.timestamp, Anomaly.id) < tuple_(*before))
+    rows = query.order_by(Anomaly.timestamp.desc(), Anomaly.id.desc()).limit(limit)
+    return [{'id': a.id, 'reading_id': a.reading_id, 'industry_id': a.industry_id,
+             'industry_name': name, 'pollutant': a.pollutant, 'kind': a.kind,
+             'value': a.value, 'expected': a.expected, 'score': a.score,
+             'timestamp': a.timestamp.isoformat()} for a, name in rows]
+
+
+# ── Backfill ──────────────────────────────────────────────────────────────────
+def backfill(since=None, chunk_size=50000):
+    """
+    Rescore stored readings from scratch, replacing the detector state and
+    the flagged rows; run it with the writer stopped. Readings stream per
+    industry in timestamp order along ix_sensor_readings_industry_ts, so
+    there is no sort and only one detector per series is held. Alerts are
+    not emitted. Returns (readings scored, anomalies found).
+    """
+    table = SensorReading.__table__
+    cols = [table.c.id, table.c.industry_id, table.c.timestamp] + [table.c[p] for p in POLLUTANTS]
+    delete = Anomaly.__table__.delete()
+    if since is not None:
+        delete = delete.where(Anomaly.timestamp >= since)
+    db.session.execute(delete)
+    db.session.execute(AnomalyState.__table__.delete())
+    db.session.commit()
+
+    detectors, scored, flagged = {}, 0, 0
+    edge = (0, datetime.min, 0)
+    while True:
+        query = (select(*cols)
+                 .where(tuple_(table.c.industry_id, table.c.timestamp, table.c.id) > edge)
+                 .order_by(table.c.industry_id, table.c.timestamp, table.c.id)
+                 .limit(chunk_size))
+        if since is not None:
+            query = query.where(table.c.timestamp >= since)
+        rows = db.session.execute(query).mappings().all()
+        if not rows:
+            break
+        found = _score(rows, detectors)
+        if found:
+            db.session.execute(Anomaly.__table__.insert(), found)
+        db.session.commit()
+        scored += len(rows)
+        flagged += len(found)
+        last = rows[-1]
+        edge = (last['industry_id'], last['timestamp'], last['id'])
+    _save(detectors)
+    db.session.commit()
+    response_cache.clear()
+    return scored, flagged
+
+
+if __name__ == '__main__':
+    from app import app
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'backfill':
+        print('Usage: python anomaly.py backfill [--days N]')
+        sys.exit(2)
+    since = None
+    if '--days' in sys.argv:
+        since = datetime.utcnow() - timedelta(days=float(sys.argv[sys.argv.index('--days') + 1]))
+    with app.app_context():
+        scored, flagged = backfill(since)
+    print(f'[ANOMALY] Scored {scored} readings, flagged {flagged}')
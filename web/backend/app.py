@@ -1,7 +1,10 @@
+import startup  # first: times every import below when STARTUP_PROFILE is set
+import runtime  # next: may monkey-patch the standard library
+
 import os
 
-from flask import Flask
-from flask_socketio import SocketIO
+from flask import Flask, request
+from flask_socketio import SocketIO, emit
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from dotenv import load_dotenv
@@ -12,6 +15,14 @@ from models import db
 from routes import api
 from seed import seed
 from simulation import start_simulation
+from writer import start_writer
+from archive import start_retention
+from fanout import start_fanout, get_fanout
+from outbox import start_dispatcher
+from anomaly import start_anomaly_alerts
+from limits import registry as limit_registry
+import metrics
+import profiler
 from models import Industry, SensorReading, SafeLimit
 
 
@@ -26,29 +37,76 @@ def create_app():
 
     db.init_app(app)
     JWTManager(app)
-    CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True)
+    CORS(app, resources={r"/api/*": {"origins": "*"}}, supports_credentials=True,
+         expose_headers=['X-Next-Cursor', 'ETag', 'Last-Modified'])
 
     app.register_blueprint(api, url_prefix='/api')
+    metrics.init_app(app)
+    profiler.init_app(app)
 
     return app
 
 
-app = create_app()
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', logger=False, engineio_logger=False)
+with startup.step('create_app'):
+    app = create_app()
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode=runtime.ASYNC_MODE, logger=False, engineio_logger=False)
 
 
 @socketio.on('connect')
 def on_connect():
+    metrics.SOCKET_CLIENTS.inc()
     print(f'[SOCKET] Client connected')
 
 
 @socketio.on('disconnect')
 def on_disconnect():
+    metrics.SOCKET_CLIENTS.dec()
+    fanout = get_fanout()
+    if fanout is not None:
+        fanout.forget(request.sid)
     print(f'[SOCKET] Client disconnected')
 
 
+# The fan-out only exists once start_fanout() has run (the __main__ block
+# below, or whatever embeds `app`); until then live updates are unavailable
+@socketio.on('subscribe')
+def on_subscribe(data):
+    industry_id = (data or {}).get('industry_id')
+    if get_fanout() is None:
+        emit('subscribe_error', {'error': 'Live updates are not running', 'industry_id': industry_id})
+        return
+    valid = isinstance(industry_id, int) and not isinstance(industry_id, bool)
+    ind = db.session.get(Industry, industry_id) if valid else None
+    if ind is None:
+        emit('subscribe_error', {'error': 'Unknown industry', 'industry_id': industry_id})
+    else:
+        limits = limit_registry.get(ind.industry_type)
+        emit('subscribed', get_fanout().subscribe(request.sid, ind, limits.as_dict() if limits else None))
+    db.session.remove()
+
+
+@socketio.on('unsubscribe')
+def on_unsubscribe(data):
+    fanout = get_fanout()
+    if fanout is not None:
+        fanout.unsubscribe(request.sid, (data or {}).get('industry_id'))
+
+
 if __name__ == '__main__':
-    seed(app)
-    start_simulation(app, socketio, db, Industry, SensorReading, SafeLimit)
-    print("[SERVER] AeroSense backend running on http://localhost:5000")
-    socketio.run(app, host='0.0.0.0', port=5000, debug=False)
+    with startup.step('seed'):
+        seed(app)
+    with startup.step('start_fanout'):
+        start_fanout(socketio)
+        start_anomaly_alerts(socketio)
+    with startup.step('start_writer'):
+        start_writer(app)
+    with startup.step('start_dispatcher'):
+        start_dispatcher(app)
+    with startup.step('start_retention'):
+        start_retention(app)
+    with startup.step('start_simulation'):
+        start_simulation(app, socketio, db, Industry, SensorReading, SafeLimit)
+    startup.report()
+    port = int(os.getenv('PORT', 5000))
+    print(f"[SERVER] AeroSense backend running on http://localhost:{port} ({runtime.ASYNC_MODE})")
+    socketio.run(app, host='0.0.0.0', port=port, debug=False, **runtime.run_kwargs())
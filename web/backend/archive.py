@@ -0,0 +1,280 @@
+"""
+Cold storage for old sensor readings.
+
+`compact()` moves readings older than ARCHIVE_AFTER_DAYS out of
+sensor_readings into Parquet files partitioned by industry and month:
+
+    <ARCHIVE_DIR>/readings/industry_id=<id>/month=<YYYY-MM>/part-<first>-<last>.parquet
+
+Hour and day rollups stay in the database as the downsampled summary;
+minute rollups for the archived range are dropped. History and export read
+the archive alongside the hot table. pyarrow is only imported when an
+archive exists or a compaction runs.
+
+    python archive.py compact [days]
+"""
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from cache import response_cache
+from limits import POLLUTANTS
+from models import db, SensorReading, IndustrySummary, AdminComment, ReadingRollup
+
+COLUMNS = ['id', 'timestamp', *POLLUTANTS, 'temperature', 'humidity', 'gps_lat', 'gps_lng',
+           'is_violation']
+DELETE_CHUNK = 10000
+
+
+def archive_dir():
+    from flask import current_app
+    return os.getenv('ARCHIVE_DIR') or os.path.join(current_app.instance_path, 'archive')
+
+
+def _readings_path():
+    return os.path.join(archive_dir(), 'readings')
+
+
+def _arrow():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    return pa, ds, pq
+
+
+def _schema(pa):
+    return pa.schema([('id', pa.int64()), ('timestamp', pa.timestamp('us'))]
+                     + [(c, pa.float64()) for c in COLUMNS[2:-1]]
+                     + [('is_violation', pa.bool_())])
+
+
+# ── Compaction ────────────────────────────────────────────────────────────────
+def _protected_ids():
+    """Readings other tables point at stay hot."""
+    ids = set(db.session.scalars(select(IndustrySummary.latest_reading_id)
+                                 .where(IndustrySummary.latest_reading_id.isnot(None))))
+    ids.update(db.session.scalars(select(AdminComment.reading_id)
+                                  .where(AdminComment.reading_id.isnot(None))))
+    return ids
+
+
+def _write_partition(pa, pq, industry_id, month, rows):
+    part_dir = os.path.join(_readings_path(), f'industry_id={industry_id}', f'month={month}')
+    os.makedirs(part_dir, exist_ok=True)
+    table = pa.Table.from_pylist(rows, schema=_schema(pa))
+    name = f"part-{rows[0]['id']}-{rows[-1]['id']}.parquet"
+    tmp = os.path.join(part_dir, f'.{name}.tmp')
+    pq.write_table(table, tmp, compression='zstd')
+    # Same rows -> same file name, so re-running after a crash overwrites
+    os.replace(tmp, os.path.join(part_dir, name))
+
+
+def compact(older_than_days=None, chunk_size=50000):
+    """
+    Archive readings older than the cutoff. Each chunk is written to Parquet
+    before its rows are deleted, so a crash can only leave rows in both
+    places, never in neither. Returns the number of readings archived.
+    """
+    pa, _, pq = _arrow()
+    days = older_than_days if older_than_days is not None else int(os.getenv('ARCHIVE_AFTER_DAYS', 90))
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    protected = _protected_ids()
+    table = SensorReading.__table__
+    archived, last_id = 0, 0
+
+    while True:
+        rows = db.session.execute(
+            select(table.c.industry_id, *[table.c[c] for c in COLUMNS])
+            .where(table.c.timestamp < cutoff, table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(chunk_size)
+        ).mappings().all()
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+
+        groups = {}
+        for r in rows:
+            if r['id'] in protected:
+                continue
+            key = (r['industry_id'], r['timestamp'].strftime('%Y-%m'))
+            groups.setdefault(key, []).append({c: r[c] for c in COLUMNS})
+        for (industry_id, month), group in groups.items():
+            _write_partition(pa, pq, industry_id, month, group)
+
+        ids = [row['id'] for group in groups.values() for row in group]
+        for start in range(0, len(ids), DELETE_CHUNK):
+            db.session.execute(table.delete().where(table.c.id.in_(ids[start:start + DELETE_CHUNK])))
+        db.session.commit()
+        archived += len(ids)
+
+    db.session.execute(ReadingRollup.__table__.delete().where(
+        ReadingRollup.resolution == 'minute', ReadingRollup.bucket < cutoff))
+    db.session.commit()
+    if archived:
+        response_cache.clear()
+    return archived
+
+
+# ── Reads ─────────────────────────────────────────────────────────────────────
+def _dataset():
+    path = _readings_path()
+    if not os.path.isdir(path):
+        return None
+    pa, ds, _ = _arrow()
+    partitioning = ds.partitioning(pa.schema([('industry_id', pa.int64()), ('month', pa.string())]),
+                                   flavor='hive')
+    return ds.dataset(path, format='parquet', partitioning=partitioning,
+                      exclude_invalid_files=True)
+
+
+def _filter(industry_id=None, start=None, end=None, before=None, violations_only=False):
+    _, ds, _ = _arrow()
+    expr = None
+
+    def _and(e):
+        return e if expr is None else expr & e
+
+    # The month terms prune whole partition directories before any file is opened
+    if industry_id is not None:
+        expr = _and(ds.field('industry_id') == industry_id)
+    if start is not None:
+        expr = _and((ds.field('month') >= start.strftime('%Y-%m')) & (ds.field('timestamp') >= start))
+    if end is not None:
+        expr = _and((ds.field('month') <= end.strftime('%Y-%m')) & (ds.field('timestamp') < end))
+    if before is not None:
+        expr = _and((ds.field('month') <= before[0].strftime('%Y-%m')) & _before(ds, before))
+    if violations_only:
+        expr = _and(ds.field('is_violation'))
+    return expr
+
+
+def _before(ds, before):
+    ts, reading_id = before
+    return (ds.field('timestamp') < ts) | ((ds.field('timestamp') == ts) & (ds.field('id') < reading_id))
+
+
+def _months(industry_id, first=None, last=None, newest_first=False):
+    """[(month, directory)] of an industry's partitions within [first, last] (YYYY-MM)."""
+    root = os.path.join(_readings_path(), f'industry_id={industry_id}')
+    if not os.path.isdir(root):
+        return []
+    months = sorted(((d[len('month='):], os.path.join(root, d)) for d in os.listdir(root)
+                     if d.startswith('month=')), reverse=newest_first)
+    return [(m, path) for m, path in months
+            if (first is None or m >= first) and (last is None or m <= last)]
+
+
+def _first_rows(industry_id, months, expr, order, limit):
+    """
+    Up to `limit` rows in `order`, reading one month partition at a time
+    and stopping once enough are collected; months are disjoint in time,
+    so each only needs sorting on its own.
+    """
+    _, ds, _ = _arrow()
+    rows = []
+    for _, path in months:
+        table = ds.dataset(path, format='parquet', exclude_invalid_files=True) \
+            .to_table(filter=expr, columns=COLUMNS)
+        if not table.num_rows:
+            continue
+        table = table.sort_by([('timestamp', order), ('id', order)]).slice(0, limit - len(rows))
+        for r in table.to_pylist():
+            r['industry_id'] = industry_id
+            rows.append(_as_reading(r))
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def _as_reading(row):
+    row['timestamp'] = row['timestamp'].isoformat()
+    return row
+
+
+def latest(industry_id, limit, before=None):
+    """Newest archived readings for an industry, newest first, as reading dicts."""
+    last = before[0].strftime('%Y-%m') if before is not None else None
+    months = _months(industry_id, last=last, newest_first=True)
+    if not months or limit <= 0:
+        return []
+    _, ds, _ = _arrow()
+    return _first_rows(industry_id, months, _before(ds, before) if before is not None else None,
+                       'descending', limit)
+
+
+def in_range(industry_id, start, end, limit):
+    """Archived readings in [start, end), oldest first, as reading dicts."""
+    months = _months(industry_id, start.strftime('%Y-%m'), end.strftime('%Y-%m'))
+    if not months or limit <= 0:
+        return []
+    _, ds, _ = _arrow()
+    expr = (ds.field('timestamp') >= start) & (ds.field('timestamp') < end)
+    return _first_rows(industry_id, months, expr, 'ascending', limit)
+
+
+def iter_batches(industry_id=None, start=None, end=None, violations_only=False):
+    """Archived rows as lists of plain dicts, one list per Arrow record batch."""
+    dataset = _dataset()
+    if dataset is None:
+        return
+    for batch in dataset.to_batches(filter=_filter(industry_id, start, end,
+                                                   violations_only=violations_only),
+                                    columns=['industry_id'] + COLUMNS):
+        yield batch.to_pylist()
+
+
+def industry_ids():
+    """Industries that have archived readings, from the partition directories."""
+    path = _readings_path()
+    if not os.path.isdir(path):
+        return []
+    return sorted(int(d[len('industry_id='):]) for d in os.listdir(path) if d.startswith('industry_id='))
+
+
+def violation_counts():
+    """{industry_id: archived violations}, for rebuilding industry summaries."""
+    dataset = _dataset()
+    if dataset is None:
+        return {}
+    table = dataset.to_table(filter=_filter(violations_only=True), columns=['industry_id'])
+    counts = table.group_by('industry_id').aggregate([('industry_id', 'count')])
+    return dict(zip(counts['industry_id'].to_pylist(), counts['industry_id_count'].to_pylist()))
+
+
+# ── Scheduling ────────────────────────────────────────────────────────────────
+def start_retention(flask_app):
+    """Run compact() every ARCHIVE_INTERVAL_HOURS (off unless that is set)."""
+    hours = float(os.getenv('ARCHIVE_INTERVAL_HOURS', 0))
+    if hours <= 0:
+        return None
+
+    def _loop():
+        while True:
+            with flask_app.app_context():
+                try:
+                    n = compact()
+                    print(f'[ARCHIVE] Archived {n} readings.')
+                except Exception as e:
+                    db.session.rollback()
+                    print(f'[ARCHIVE] Compaction failed: {e}')
+            time.sleep(hours * 3600)
+
+    t = threading.Thread(target=_loop, name='archive-retention', daemon=True)
+    t.start()
+    return t
+
+
+if __name__ == '__main__':
+    from app import app
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'compact':
+        print('Usage: python archive.py compact [days]')
+        sys.exit(2)
+    with app.app_context():
+        n = compact(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+    print(f'[ARCHIVE] Archived {n} readings.')
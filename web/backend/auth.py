@@ -1,16 +1,18 @@
-import bcrypt
 import os
 from functools import wraps
 from flask import request, jsonify
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from runtime import offload
 
 
 def hash_password(plain: str) -> str:
-    return bcrypt.hashpw(plain.encode(), bcrypt.gensalt()).decode()
+    import bcrypt
+    return offload(bcrypt.hashpw, plain.encode(), bcrypt.gensalt()).decode()
 
 
 def check_password(plain: str, hashed: str) -> bool:
-    return bcrypt.checkpw(plain.encode(), hashed.encode())
+    import bcrypt
+    return offload(bcrypt.checkpw, plain.encode(), hashed.encode())
 
 
 def admin_required(fn):
@@ -0,0 +1,105 @@
+"""Shared helpers for the benchmark scripts. Run them from web/backend, e.g.
+`python -m bench.industries`."""
+import os
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+
+def build_app(database_url='sqlite://'):
+    """Import the Flask app against a throwaway database."""
+    os.environ['DATABASE_URL'] = database_url
+    from app import app
+    from models import db
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+@contextmanager
+def count_queries(engine):
+    """Counts statements executed on `engine` inside the block."""
+    counter = {'n': 0}
+
+    def _before(conn, cursor, statement, params, context, executemany):
+        counter['n'] += 1
+
+    event.listen(engine, 'before_cursor_execute', _before)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', _before)
+
+
+def populate(n_industries, readings_per_industry, seed=42):
+    """Bulk-create industries, limits and readings (inside an app context)."""
+    from models import db, Industry, SafeLimit, SensorReading
+    from seed import SAFE_LIMITS
+
+    rng = random.Random(seed)
+    db.session.execute(SafeLimit.__table__.insert(), [{
+        'industry_type': sl['type'], 'pm25': sl['pm25'], 'pm10': sl['pm10'],
+        'no2': sl['no2'], 'so2': sl['so2'], 'co2': sl['co2'],
+    } for sl in SAFE_LIMITS])
+    types = [sl['type'] for sl in SAFE_LIMITS]
+    db.session.execute(Industry.__table__.insert(), [{
+        'id': i + 1,
+        'name': f'Industry {i + 1}',
+        'industry_type': types[i % len(types)],
+        'location': 'Bench',
+        'contact_email': f'env{i + 1}@example.com',
+        'lat': rng.uniform(8, 35), 'lng': rng.uniform(68, 97),
+    } for i in range(n_industries)])
+
+    start = datetime.utcnow() - timedelta(days=30)
+    batch = []
+    for i in range(n_industries):
+        for k in range(readings_per_industry):
+            factor = rng.uniform(0.4, 1.45)
+            batch.append({
+                'industry_id': i + 1,
+                'pm25': 55 * factor, 'pm10': 95 * factor, 'no2': 75 * factor,
+                'so2': 75 * factor, 'co2': 950 * factor,
+                'temperature': 30.0, 'humidity': 50.0,
+                'gps_lat': 20.0, 'gps_lng': 78.0,
+                'timestamp': start + timedelta(minutes=k * 5, seconds=i),
+                'is_violation': factor > 1.0,
+            })
+            if len(batch) >= 50000:
+                db.session.execute(SensorReading.__table__.insert(), batch)
+                batch = []
+    if batch:
+        db.session.execute(SensorReading.__table__.insert(), batch)
+    db.session.commit()
+    # Core inserts bypass the ORM hooks that normally invalidate the registry
+    from limits import registry
+    registry.invalidate()
+
+
+def timed(fn, repeat):
+    """Runs fn `repeat` times and returns per-call latencies in ms."""
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def summarize(samples):
+    return {
+        'p50': round(statistics.median(samples), 3),
+        'p95': round(percentile(samples, 95), 3),
+        'p99': round(percentile(samples, 99), 3),
+    }
@@ -0,0 +1,84 @@
+"""
+Per-row vs. vectorised compliance scoring.
+
+Scores the same synthetic columnar batch with the original scalar helpers
+(routes._calc_compliance / simulation._is_violation, reproduced below) and
+with compliance.violation_mask / compliance_scores, and checks the results
+are identical.
+    python -m bench.compliance --rows 10000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from limits import LimitVector, POLLUTANTS
+
+LIMITS = [LimitVector('Steel Industry', 60.0, 100.0, 80.0, 80.0, 1000.0),
+          LimitVector('Thermal Plant', 50.0, 90.0, 70.0, 70.0, 900.0)]
+
+
+def _legacy_is_violation(reading, limits):
+    return (
+        reading['pm25'] > limits.pm25 or
+        reading['pm10'] > limits.pm10 or
+        reading['no2']  > limits.no2  or
+        reading['so2']  > limits.so2  or
+        reading['co2']  > limits.co2
+    )
+
+
+def _legacy_calc_compliance(reading, limits):
+    ratios = []
+    pairs = [(reading['pm25'], limits.pm25), (reading['pm10'], limits.pm10),
+             (reading['no2'], limits.no2), (reading['so2'], limits.so2),
+             (reading['co2'], limits.co2)]
+    for val, lim in pairs:
+        if val and lim:
+            ratios.append(min(val / lim, 2.0))
+    if not ratios:
+        return None
+    avg = sum(ratios) / len(ratios)
+    return max(0, round((2.0 - avg) / 2.0 * 100, 1))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--scalar-rows', type=int, default=None,
+                        help='rows for the per-row baseline (default: all); throughput is extrapolated')
+    args = parser.parse_args()
+
+    from compliance import violation_mask, compliance_scores
+
+    rng = np.random.default_rng(7)
+    n = args.rows
+    type_idx = rng.integers(0, len(LIMITS), n)
+    matrix = np.array([l.values for l in LIMITS])
+    limits = matrix[type_idx]
+    values = np.round(limits * rng.uniform(0.4, 1.45, (n, 1)) * rng.uniform(0.88, 1.12, (n, 5)), 2)
+
+    t0 = time.perf_counter()
+    mask = violation_mask(values, limits)
+    scores = compliance_scores(values, limits)
+    vec_s = time.perf_counter() - t0
+
+    m = min(n, args.scalar_rows or n)
+    rows = [dict(zip(POLLUTANTS, v)) for v in values[:m].tolist()]
+    lims = [LIMITS[i] for i in type_idx[:m].tolist()]
+    t0 = time.perf_counter()
+    legacy_mask = [_legacy_is_violation(r, l) for r, l in zip(rows, lims)]
+    legacy_scores = [_legacy_calc_compliance(r, l) for r, l in zip(rows, lims)]
+    scalar_s = time.perf_counter() - t0
+
+    same_mask = bool(np.array_equal(mask[:m], np.array(legacy_mask)))
+    same_scores = all(s == l for s, l in zip(scores[:m].tolist(), legacy_scores))
+    print(f'rows               : {n:,} (scalar baseline on {m:,})')
+    print(f'vectorised         : {vec_s:8.2f}s  ({n / vec_s:,.0f} rows/s)')
+    print(f'per-row (legacy)   : {scalar_s:8.2f}s  ({m / scalar_s:,.0f} rows/s)')
+    print(f'speed-up           : {(m / scalar_s and (n / vec_s) / (m / scalar_s)):8.1f}x')
+    print(f'identical results  : is_violation={same_mask} compliance={same_scores}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Fleet load test: N simulated drones against a throwaway database.
+    python -m bench.fleet --drones 500 --industries 200 --time-scale 5 --duration 30
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from bench.common import build_app, populate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--drones', type=int, default=500)
+    parser.add_argument('--industries', type=int, default=200)
+    parser.add_argument('--tick-hz', type=float, default=10)
+    parser.add_argument('--time-scale', type=float, default=5)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--scheduler', default='risk')
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = build_app(f'sqlite:///{path}')
+    from app import socketio
+    from models import db, Industry, SensorReading, SafeLimit
+    import simulation
+    from writer import start_writer
+    from fanout import start_fanout
+
+    with app.app_context():
+        populate(args.industries, 0)
+
+    start_fanout(socketio)
+    writer = start_writer(app)
+    simulation.socketio, simulation.app, simulation.db = socketio, app, db
+    simulation.Industry, simulation.SensorReading, simulation.SafeLimit = Industry, SensorReading, SafeLimit
+    from scheduler import make_scheduler
+    fleet = simulation.FleetSimulator(args.drones, args.tick_hz, args.time_scale,
+                                      scheduler=make_scheduler(args.scheduler))
+    t = threading.Thread(target=fleet.run, daemon=True)
+    t0 = time.perf_counter()
+    t.start()
+
+    max_depth = 0
+    while time.perf_counter() - t0 < args.duration:
+        time.sleep(0.5)
+        max_depth = max(max_depth, writer.depth)
+    fleet.stop()
+    t.join()
+    writer.stop()
+    elapsed = time.perf_counter() - t0
+
+    print(f'drones={args.drones} industries={args.industries} '
+          f'time_scale={args.time_scale} tick_hz={args.tick_hz} scheduler={args.scheduler}')
+    print(f'readings     : {fleet.readings} ({fleet.readings / elapsed:,.1f}/s)')
+    print(f'emits        : {fleet.emits} ({fleet.emits / elapsed:,.1f}/s)')
+    print(f'writer       : {writer.rows_written} rows in {writer.batches_written} batches, '
+          f'max queue depth {max_depth}')
+    print(f'max tick lag : {fleet.max_lag * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
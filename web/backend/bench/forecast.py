@@ -0,0 +1,73 @@
+"""
+Forecaster cost and accuracy: per-reading update time, what the state adds
+to a write batch, forecast latency against history size, and the error on a
+synthetic daily cycle.
+    python -m bench.forecast --days 30
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from bench.common import build_app, populate, count_queries, timed, summarize
+
+
+def _cycle(t, t0):
+    return 50 + 20 * math.sin(2 * math.pi * t.hour / 24) + 0.05 * (t - t0).total_seconds() / 3600
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--industries', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = build_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    from cache import response_cache
+    from forecast import Series
+    from models import db
+    from writer import persist
+
+    rng = random.Random(7)
+    t0 = datetime(2025, 1, 1)
+    samples = []
+    t = t0
+    while t < t0 + timedelta(days=args.days):
+        samples.append((t, _cycle(t, t0) + rng.gauss(0, 2)))
+        t += timedelta(minutes=5)
+    s = Series()
+    start = time.perf_counter()
+    for ts, value in samples:
+        s.add(ts, value)
+    per_reading = (time.perf_counter() - start) / len(samples) * 1e9
+    points = s.forecast()
+    mae = sum(abs(v - _cycle(ts, t0)) for ts, v, _, _ in points) / len(points)
+    print(f'Series.add             : {per_reading:7.0f} ns/reading ({len(samples)} readings)')
+    print(f'24h MAE, {args.days:>3} days      : {mae:7.2f} (noise sd 2.0, amplitude 20)')
+
+    with app.app_context():
+        populate(args.industries, 0)
+        rows = [{'industry_id': i % args.industries + 1, 'pm25': 40.0, 'pm10': 80.0, 'no2': 50.0,
+                 'so2': 50.0, 'co2': 800.0, 'timestamp': datetime.utcnow()} for i in range(500)]
+        with count_queries(db.engine) as n:
+            persist([dict(r) for r in rows])
+            db.session.commit()
+        batch = summarize(timed(lambda: (persist([dict(r) for r in rows]), db.session.commit()), 20))
+        print(f'persist 500 rows       : {batch["p50"]:7.2f} ms p50, {n["n"]} statements')
+        db.session.remove()
+
+    client = app.test_client()
+
+    def get():
+        response_cache.clear()
+        client.get('/api/forecast/1')
+    get()
+    print(f"/api/forecast/1 (miss) : {summarize(timed(get, args.repeat))['p50']:7.3f} ms p50")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+GET /api/industries latency vs. industry count.
+
+Compares the rollup-backed handler against the old per-industry N+1 loop.
+    python -m bench.industries --sizes 100 1000 5000 --readings 20
+"""
+import argparse
+
+from bench.common import build_app, count_queries, populate, timed, summarize
+
+
+def _legacy_industries():
+    """The pre-rollup handler body: three queries per industry."""
+    from models import Industry, SensorReading, SafeLimit
+    from compliance import compliance_score
+    out = []
+    for ind in Industry.query.all():
+        latest = (SensorReading.query.filter_by(industry_id=ind.id)
+                  .order_by(SensorReading.timestamp.desc()).first())
+        limits = SafeLimit.query.filter_by(industry_type=ind.industry_type).first()
+        out.append((compliance_score(latest, limits) if latest and limits else None,
+                    SensorReading.query.filter_by(industry_id=ind.id, is_violation=True).count()))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 500, 1000, 2000, 5000])
+    parser.add_argument('--readings', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    app = build_app()
+    from models import db
+    from summary import rebuild
+
+    print(f"{'industries':>10} {'queries':>8} {'p50 ms':>9} {'legacy q':>9} {'legacy ms':>10}")
+    for n in args.sizes:
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            populate(n, args.readings)
+            rebuild()
+            db.session.remove()
+
+        client = app.test_client()
+        with app.app_context(), count_queries(db.engine) as q:
+            client.get('/api/industries')
+        new = summarize(timed(lambda: client.get('/api/industries'), args.repeat))
+
+        legacy_q, legacy = '-', None
+        if not args.skip_legacy:
+            with app.app_context():
+                with count_queries(db.engine) as lq:
+                    _legacy_industries()
+                legacy_q = lq['n']
+                legacy = summarize(timed(_legacy_industries, args.repeat))
+                db.session.remove()
+        print(f"{n:>10} {q['n']:>8} {new['p50']:>9.1f} {legacy_q:>9} "
+              f"{(legacy['p50'] if legacy else float('nan')):>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
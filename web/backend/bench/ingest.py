@@ -0,0 +1,52 @@
+"""
+POST /api/readings/batch throughput.
+    python -m bench.ingest --batch 1000 --batches 20
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+from bench.common import build_app, populate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--batches', type=int, default=20)
+    parser.add_argument('--industries', type=int, default=100)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = build_app(f'sqlite:///{path}')
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        populate(args.industries, 0)
+        token = create_access_token(identity='bench')
+
+    rng = random.Random(1)
+    bodies = []
+    for _ in range(args.batches):
+        lines = [json.dumps({
+            'industry_id': rng.randint(1, args.industries),
+            'pm25': rng.uniform(20, 80), 'pm10': rng.uniform(40, 130),
+            'no2': rng.uniform(30, 100), 'so2': rng.uniform(30, 100),
+            'co2': rng.uniform(400, 1300), 'temperature': 31.5, 'humidity': 55.0,
+        }) for _ in range(args.batch)]
+        bodies.append('\n'.join(lines).encode())
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/x-ndjson'}
+    t0 = time.perf_counter()
+    for body in bodies:
+        resp = client.post('/api/readings/batch', data=body, headers=headers)
+        assert resp.status_code == 201, resp.get_json()
+    elapsed = time.perf_counter() - t0
+    total = args.batch * args.batches
+    print(f'{total} readings in {elapsed:.2f}s -> {total / elapsed:,.0f} readings/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Cost of the metrics instrumentation: the primitives, the per-request and
+per-statement hooks, what that adds to real routes, and a scrape.
+
+    python -m bench.metrics
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def _per_call_ns(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=500)
+    args = parser.parse_args()
+
+    from bench.common import build_app, populate, count_queries, timed, summarize
+    app = build_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    import metrics
+    from cache import response_cache
+    from models import db
+    from summary import rebuild
+
+    observe = _per_call_ns(lambda: metrics.SIM_LAG.observe(0.003), args.n)
+    inc = _per_call_ns(lambda: metrics.SOCKET_EMITS.inc('drone_update'), args.n)
+
+    class _Conn:
+        info = {}
+    conn = _Conn()
+
+    def statement():
+        metrics._before_cursor_execute(conn, None, None, None, None, False)
+        metrics._after_cursor_execute(conn, None, None, None, None, False)
+
+    per_statement = _per_call_ns(statement, args.n)
+    with app.test_request_context('/api/industries'):
+        from flask import request, Response
+        request.url_rule = next(app.url_map.iter_rules('api.get_industries'))
+        response = Response(status=200)
+
+        def hooks():
+            metrics._start_request()
+            metrics._finish_request(response)
+
+        per_request = _per_call_ns(hooks, args.n // 10)
+
+    print(f'Histogram.observe      : {observe:7.0f} ns')
+    print(f'Counter.inc            : {inc:7.0f} ns')
+    print(f'per SQL statement      : {per_statement:7.0f} ns')
+    print(f'per request (3 obs.)   : {per_request:7.0f} ns')
+
+    with app.app_context():
+        populate(50, 200)
+        rebuild()
+    client = app.test_client()
+    print(f"\n{'route':<36} {'queries':>7} {'p50 ms':>8} {'hooks µs':>9} {'share':>6}")
+    for url in ('/api/safe-limits/Steel%20Industry', '/api/industries', '/api/live/1',
+                '/api/history/1?limit=50'):
+        def get():
+            response_cache.clear()
+            client.get(url)
+        get()
+        with app.app_context():
+            with count_queries(db.engine) as n:
+                get()
+        p50 = summarize(timed(get, args.repeat))['p50']
+        cost = (per_request + n['n'] * per_statement) / 1000
+        print(f"{url:<36} {n['n']:>7} {p50:>8.3f} {cost:>9.1f} {cost / (p50 * 10):>5.1f}%")
+
+    for route in range(40):
+        for status in ('200', '304'):
+            metrics.REQUEST_SECONDS.observe(0.002, 'GET', f'/api/route{route}', status)
+    t0 = time.perf_counter()
+    body = metrics.render()
+    print(f'\nscrape: {(time.perf_counter() - t0) * 1000:.2f} ms for {len(body.splitlines())} lines')
+
+
+if __name__ == '__main__':
+    main()
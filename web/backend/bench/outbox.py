@@ -0,0 +1,72 @@
+"""
+Outbox dispatch against the in-process SMTP stand-in: pooled sessions
+versus a fresh connection per message (the old send path), with a share of
+transient failures to exercise retries.
+
+    python -m bench.outbox --notices 500 --fail 25
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from bench.common import build_app, populate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notices', type=int, default=500)
+    parser.add_argument('--fail', type=int, default=25, help='transient failures to inject')
+    parser.add_argument('--pool', type=int, default=2)
+    parser.add_argument('--batch', type=int, default=50)
+    args = parser.parse_args()
+
+    app = build_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    from email_service import connect_smtp, build_message
+    from models import db, EmailJob
+    from outbox import OutboxDispatcher, enqueue
+    from smtp_stub import SmtpStub
+
+    stub = SmtpStub().start()
+    settings = stub.settings()
+    data = [{'industry_id': i, 'reading_id': None, 'industry_name': f'Industry {i}',
+             'industry_type': 'Steel Industry', 'location': 'Bench', 'violations': [],
+             'action': 'Notice Issued', 'comment': ''} for i in range(1, 21)]
+
+    # Old path: connect, EHLO, send, quit for every notice
+    t0 = time.perf_counter()
+    for i in range(args.notices):
+        msg = build_message(f'env{i}@example.com', data[i % len(data)], settings['sender'])
+        with connect_smtp(settings) as server:
+            server.sendmail(settings['sender'], f'env{i}@example.com', msg.as_string())
+    direct = time.perf_counter() - t0
+    print(f'per-message connections : {args.notices / direct:8.1f} notices/s '
+          f'({stub.connections} connections)')
+
+    with app.app_context():
+        populate(20, 0)
+        for i in range(args.notices):
+            enqueue(f'env{i}@example.com', data[i % len(data)])
+        db.session.commit()
+
+    stub.messages.clear()
+    stub.connections = 0
+    stub.fail_next(args.fail)
+    dispatcher = OutboxDispatcher(app, batch_size=args.batch, pool_size=args.pool,
+                                  backoff_base=0.05, settings=settings)
+    t0 = time.perf_counter()
+    with app.app_context():
+        while EmailJob.query.filter(EmailJob.status.in_(('queued', 'sending'))).count():
+            if not dispatcher.dispatch_once():
+                time.sleep(0.02)
+        pooled = time.perf_counter() - t0
+        failed = EmailJob.query.filter_by(status='failed').count()
+    dispatcher.stop()
+    stub.stop()
+    print(f'outbox, pooled sessions : {args.notices / pooled:8.1f} notices/s '
+          f'({stub.connections} connections, {len(stub.messages)} delivered, '
+          f'{dispatcher.retried} retries, {failed} failed)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Notice PDF render throughput: the old per-call path (fresh stylesheet, in the
+calling thread) against the shared-style renderer, the process pool and the
+content cache, with concurrent callers.
+
+    python -m bench.pdf --notices 200 --distinct 50 --threads 8
+"""
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import email_service
+from email_service import PdfCache, generate_pdf_bytes, render_pdf
+
+
+def _notice(i, rng):
+    violations = [{'pollutant': p, 'value': round(rng.uniform(100, 200), 2), 'limit': 100.0}
+                  for p in ('PM2.5', 'PM10', 'NO2', 'SO2', 'CO2') if rng.random() < 0.6]
+    return {'industry_id': i, 'reading_id': 1000 + i, 'industry_name': f'Industry {i}',
+            'industry_type': 'Steel Industry', 'location': 'Bench', 'violations': violations,
+            'action': 'Notice Issued', 'comment': ''}
+
+
+def _run(label, fn, notices, threads):
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as ex:
+        sizes = list(ex.map(fn, notices))
+    elapsed = time.perf_counter() - t0
+    print(f'{label:<34} {len(notices) / elapsed:8.1f} notices/s   ({elapsed:.2f} s, '
+          f'{sum(sizes) // len(sizes)} B avg)')
+
+
+def _uncached(data):
+    email_service._STYLES = None  # what every call used to pay for
+    return len(generate_pdf_bytes(data))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notices', type=int, default=200)
+    parser.add_argument('--distinct', type=int, default=50, help='distinct notices among them')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent callers')
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    distinct = [_notice(i, rng) for i in range(args.distinct)]
+    notices = [distinct[rng.randrange(args.distinct)] for _ in range(args.notices)]
+
+    print(f'{args.notices} notices ({args.distinct} distinct), {args.threads} callers, '
+          f'{email_service.PDF_WORKERS} pool workers')
+    _run('per-call styles, in thread', _uncached, notices, args.threads)
+    _run('shared styles, in thread', lambda d: len(generate_pdf_bytes(d)), notices, args.threads)
+
+    email_service.pdf_cache = PdfCache(0)
+    render_pdf(distinct[0])  # start the pool outside the timing
+    _run('process pool, no cache', lambda d: len(render_pdf(d)), notices, args.threads)
+
+    email_service.pdf_cache = PdfCache(args.distinct)
+    _run('process pool + LRU cache', lambda d: len(render_pdf(d)), notices, args.threads)
+    print(f'cache: {email_service.pdf_cache.stats()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Socket fan-out capacity per async runtime.
+
+For each mode a server subprocess is started on a throwaway database, with a
+publisher pushing timestamped updates into the industry rooms. Websocket
+clients are added in steps; at each step every client's receive latency
+(publish -> client) is sampled and p50/p99 reported. A step "holds" when every
+client connected and p99 stayed under --max-p99-ms.
+
+    python -m bench.sockets --modes threading eventlet --steps 100 250 500 1000
+"""
+import runtime  # noqa: F401  (the --serve subprocess needs patching before anything else)
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench.common import percentile
+
+
+# ── Server side ───────────────────────────────────────────────────────────────
+def serve(port, industries, rate):
+    from bench.common import build_app, populate
+
+    app = build_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    from app import socketio
+    from fanout import start_fanout
+
+    with app.app_context():
+        populate(industries, 0)
+    fanout = start_fanout(socketio)
+
+    def _publish():
+        seq = 0
+        while True:
+            socketio.sleep(1.0 / rate)
+            seq += 1
+            for industry_id in range(1, industries + 1):
+                fanout.publish({'industry_id': industry_id, 'seq': seq, 'sent_at': time.time()})
+
+    socketio.start_background_task(_publish)
+    socketio.run(app, host='127.0.0.1', port=port, log_output=False, **runtime.run_kwargs())
+
+
+# ── Client side ───────────────────────────────────────────────────────────────
+class Client(threading.Thread):
+    """Minimal Engine.IO v4 / Socket.IO v5 websocket client."""
+
+    def __init__(self, url, industry_id, samples, lock):
+        super().__init__(daemon=True)
+        self.url, self.industry_id = url, industry_id
+        self.samples, self.lock = samples, lock
+        self.connected = threading.Event()
+        self.failed = False
+        self.recording = False
+        self._stop = False
+
+    def run(self):
+        import simple_websocket
+        try:
+            ws = simple_websocket.Client.connect(self.url)
+            ws.receive(timeout=10)  # Engine.IO open
+            ws.send('40')
+            ws.receive(timeout=10)  # Socket.IO connect ack
+            ws.send('42' + json.dumps(['subscribe', {'industry_id': self.industry_id}]))
+        except Exception:
+            self.failed = True
+            self.connected.set()
+            return
+        self.connected.set()
+        while not self._stop:
+            try:
+                msg = ws.receive(timeout=1)
+            except Exception:
+                self.failed = True
+                return
+            if msg is None:
+                continue
+            if msg == '2':
+                ws.send('3')
+            elif msg.startswith('42') and self.recording:
+                event, data = json.loads(msg[2:])[:2]
+                if event == 'drone_update' and 'sent_at' in data:
+                    latency = time.time() - data['sent_at']
+                    with self.lock:
+                        self.samples.append(latency)
+        ws.close()
+
+    def stop(self):
+        self._stop = True
+
+
+def measure(mode, steps, industries, rate, window, max_p99_ms, port):
+    env = {**os.environ, 'ASYNC_MODE': mode}
+    server = subprocess.Popen([sys.executable, '-m', 'bench.sockets', '--serve', '--port', str(port),
+                               '--industries', str(industries), '--rate', str(rate)],
+                              env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'ws://127.0.0.1:{port}/socket.io/?EIO=4&transport=websocket'
+    clients, samples, lock = [], [], threading.Lock()
+    results = []
+    try:
+        time.sleep(4)
+        for step in steps:
+            while len(clients) < step:
+                c = Client(url, len(clients) % industries + 1, samples, lock)
+                c.start()
+                clients.append(c)
+            for c in clients:
+                c.connected.wait(15)
+            time.sleep(1)
+            with lock:
+                samples.clear()
+            for c in clients:
+                c.recording = True
+            time.sleep(window)
+            for c in clients:
+                c.recording = False
+            with lock:
+                lat = sorted(samples)
+            failed = sum(c.failed for c in clients)
+            expected = step * rate * window
+            row = {
+                'mode': mode, 'clients': step, 'failed': failed,
+                'received_pct': round(100 * len(lat) / expected, 1) if expected else 0,
+                'p50_ms': round(percentile(lat, 50) * 1000, 1) if lat else None,
+                'p99_ms': round(percentile(lat, 99) * 1000, 1) if lat else None,
+            }
+            row['holds'] = bool(lat) and not failed and row['p99_ms'] <= max_p99_ms
+            results.append(row)
+            print(f"{mode:<10} {step:>6} clients  failed={failed:<4} recv={row['received_pct']:>5}%  "
+                  f"p50={row['p50_ms']} ms  p99={row['p99_ms']} ms  {'ok' if row['holds'] else 'OVER'}",
+                  flush=True)
+            if not row['holds']:
+                break
+    finally:
+        for c in clients:
+            c.stop()
+        server.terminate()
+        server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modes', nargs='+', default=['threading', 'eventlet'])
+    parser.add_argument('--steps', nargs='+', type=int, default=[50, 100, 250, 500, 1000])
+    parser.add_argument('--industries', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=5, help='updates per second per industry')
+    parser.add_argument('--window', type=float, default=5, help='seconds sampled per step')
+    parser.add_argument('--max-p99-ms', type=float, default=250)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.industries, args.rate)
+        return
+
+    summary = {}
+    for mode in args.modes:
+        rows = measure(mode, args.steps, args.industries, args.rate, args.window,
+                       args.max_p99_ms, args.port)
+        held = [r for r in rows if r['holds']]
+        summary[mode] = {'max_clients': held[-1]['clients'] if held else 0,
+                         'p99_ms_at_max': held[-1]['p99_ms'] if held else None}
+    print()
+    for mode, s in summary.items():
+        print(f"{mode:<10} supports {s['max_clients']} clients (p99 {s['p99_ms_at_max']} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""
+Spatial endpoints at scale: industries by radius / bbox, readings near a
+point over a time window, and violation tiles, against a full-scan baseline.
+    python -m bench.spatial --industries 50000 --readings 2000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from bench.common import build_app, populate, timed, summarize
+
+
+def _readings(n, industries, days, seed=5):
+    """Readings scattered ±0.005° around their industry, cells precomputed."""
+    import grid
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(0, len(industries), n)
+    lat = industries[ids, 1] + rng.uniform(-0.005, 0.005, n)
+    lng = industries[ids, 2] + rng.uniform(-0.005, 0.005, n)
+    row = np.minimum(np.floor((lat + 90) / grid.GRID_DEGREES), grid.ROWS - 1)
+    cell = (row * grid.COLS + np.floor((lng + 180) / grid.GRID_DEGREES) % grid.COLS).astype(np.int64)
+    start = datetime.utcnow() - timedelta(days=days)
+    offsets = np.sort(rng.uniform(0, days * 86400, n))
+    factor = rng.uniform(0.4, 1.45, n)
+    for i in range(n):
+        f = float(factor[i])
+        yield {'industry_id': int(industries[ids[i], 0]), 'pm25': 55 * f, 'pm10': 95 * f,
+               'no2': 75 * f, 'so2': 75 * f, 'co2': 950 * f,
+               'gps_lat': float(lat[i]), 'gps_lng': float(lng[i]), 'cell': int(cell[i]),
+               'timestamp': start + timedelta(seconds=float(offsets[i])), 'is_violation': f > 1.0}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--industries', type=int, default=50000)
+    parser.add_argument('--readings', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = build_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+    import grid
+    from cache import response_cache
+    from models import db, Industry, SensorReading
+    from rollups import rebuild as rebuild_rollups
+    from summary import rebuild as rebuild_summary
+
+    t0 = time.perf_counter()
+    with app.app_context():
+        populate(args.industries, 0)
+        industries = np.array(db.session.query(Industry.id, Industry.lat, Industry.lng).all())
+        batch = []
+        for row in _readings(args.readings, industries, args.days):
+            batch.append(row)
+            if len(batch) == 50000:
+                db.session.execute(SensorReading.__table__.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(SensorReading.__table__.insert(), batch)
+        db.session.commit()
+        rebuild_summary()
+        rebuild_rollups()
+        db.session.execute(db.text('ANALYZE'))
+        lat, lng = map(float, industries[0, 1:])
+    print(f'built {args.industries} industries, {args.readings} readings in {time.perf_counter() - t0:.0f} s')
+
+    now = datetime.utcnow()
+    day_ago = (now - timedelta(days=1)).isoformat()
+    z8 = tuple(int(v) for v in grid.tile_position(lat, lng, 8))
+    z12 = tuple(int(v) for v in grid.tile_position(lat, lng, 12))
+    urls = [
+        f'/api/geo/industries?lat={lat}&lng={lng}&radius_km=50',
+        f'/api/geo/industries?bbox={lng - 1},{lat - 1},{lng + 1},{lat + 1}',
+        '/api/geo/industries?bbox=68,8,97,35&limit=5000',
+        f'/api/geo/readings?lat={lat}&lng={lng}&radius_km=5&from={day_ago}',
+        '/api/geo/tiles/4/11/7',
+        f'/api/geo/tiles/8/{z8[0]}/{z8[1]}',
+        f'/api/geo/tiles/12/{z12[0]}/{z12[1]}?from={day_ago}',
+    ]
+    client = app.test_client()
+    print(f"\n{'route':<72} {'rows':>6} {'p50 ms':>8} {'p95 ms':>8}")
+    for url in urls:
+        def get():
+            response_cache.clear()
+            return client.get(url)
+        body = get().get_json()
+        rows = len(body) if isinstance(body, list) else body.get('industries')
+        stats = summarize(timed(get, args.repeat))
+        print(f"{url[:72]:<72} {rows:>6} {stats['p50']:>8.2f} {stats['p95']:>8.2f}")
+
+    with app.app_context():
+        def scan():
+            return [i for i in db.session.query(Industry.id, Industry.lat, Industry.lng).all()
+                    if grid.haversine_km(lat, lng, i.lat, i.lng) <= 50]
+        print(f"\nfull-scan radius baseline: {summarize(timed(scan, 10))['p50']:.2f} ms p50")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,502 @@
+"""
+Reproducible benchmark suite: seeded datasets, per-route latency, the
+simulation write path and Socket.IO fan-out, saved as a JSON baseline.
+
+    python -m bench.suite --size 10k                       # build (or reuse) + run
+    python -m bench.suite --size 1m --compare bench/baselines/1m-sqlite.json
+    python -m bench.suite --size 10m --database-url postgresql://localhost/aerosense_bench
+
+Datasets are generated from --seed with numpy and bulk-loaded with the
+sensor_readings indexes dropped, then the summaries and rollups are rebuilt.
+SQLite datasets are cached under instance/bench/ and each run works on a
+copy, so the write benchmarks never change the baseline data. Any other
+--database-url is rebuilt from scratch unless --reuse is given.
+
+Results go to bench/baselines/<size>-<dialect>.json (or --out). With
+--compare, every p95 and throughput figure is diffed against an earlier
+file and the exit status is 1 if any regressed by more than --threshold %.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bench.common import summarize
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_DIR = os.path.join(BACKEND_DIR, 'instance', 'bench')
+BASELINE_DIR = os.path.join(BACKEND_DIR, 'bench', 'baselines')
+
+# size -> (industries, readings per industry)
+DATASETS = {
+    '10k': (20, 500),
+    '1m': (200, 5000),
+    '10m': (1000, 10000),
+}
+EPOCH = datetime(2025, 1, 1)  # fixed, so every build of a size is identical
+INTERVAL = timedelta(minutes=5)
+LOAD_CHUNK = 100000
+COMMENTS_PER_INDUSTRY = 5
+
+
+# ── Dataset ───────────────────────────────────────────────────────────────────
+def _readings(n_industries, per_industry, types, limits, seed):
+    """Yields chunks of reading dicts in time order, all industries interleaved."""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    lim = np.array([limits[t] for t in types], dtype=np.float64)      # (industries, 5)
+    steps = max(1, LOAD_CHUNK // n_industries)
+    offsets = [timedelta(seconds=i) for i in range(n_industries)]
+    for k0 in range(0, per_industry, steps):
+        k1 = min(per_industry, k0 + steps)
+        shape = (k1 - k0, n_industries)
+        # Most scans sit below the limits, a long tail crosses them
+        factor = rng.gamma(9.0, 0.085, size=shape)
+        noise = rng.normal(1.0, 0.06, size=shape + (5,))
+        values = np.round(lim[None, :, :] * factor[:, :, None] * noise, 2)
+        violation = (values > lim[None, :, :]).any(axis=2)
+        temp = np.round(rng.normal(31, 4, size=shape), 1)
+        humidity = np.round(rng.uniform(30, 80, size=shape), 1)
+        jitter = rng.uniform(-0.005, 0.005, size=shape + (2,))
+        chunk = []
+        for k in range(k1 - k0):
+            base = EPOCH + INTERVAL * (k0 + k)
+            v, flag, t, h, j = (values[k].tolist(), violation[k].tolist(), temp[k].tolist(),
+                                humidity[k].tolist(), jitter[k].tolist())
+            for i in range(n_industries):
+                chunk.append({
+                    'industry_id': i + 1,
+                    'pm25': v[i][0], 'pm10': v[i][1], 'no2': v[i][2], 'so2': v[i][3], 'co2': v[i][4],
+                    'temperature': t[i], 'humidity': h[i],
+                    'gps_lat': 20.0 + j[i][0], 'gps_lng': 78.0 + j[i][1],
+                    'timestamp': base + offsets[i],
+                    'is_violation': flag[i],
+                })
+        yield chunk
+
+
+def build_dataset(size, seed):
+    """Drop everything and load the `size` dataset (inside an app context)."""
+    import random
+
+    from auth import hash_password
+    from migrations import upgrade
+    from models import db, User, Industry, SafeLimit, SensorReading, AdminComment
+    from seed import SAFE_LIMITS
+    from limits import POLLUTANTS, registry as limit_registry
+    from summary import rebuild as rebuild_summaries
+    from rollups import rebuild as rebuild_rollups
+    from cache import response_cache
+
+    n_industries, per_industry = DATASETS[size]
+    t0 = time.perf_counter()
+    db.drop_all()
+    upgrade()
+
+    rng = random.Random(seed)
+    types = [sl['type'] for sl in SAFE_LIMITS]
+    db.session.add(User(username='admin', password_hash=hash_password('admin123'), role='admin'))
+    db.session.execute(SafeLimit.__table__.insert(), [
+        {'industry_type': sl['type'], **{p: sl[p] for p in POLLUTANTS}} for sl in SAFE_LIMITS])
+    db.session.execute(Industry.__table__.insert(), [{
+        'id': i + 1,
+        'name': f'Industry {i + 1}',
+        'industry_type': types[i % len(types)],
+        'location': f'Bench site {i + 1}',
+        'contact_email': f'env{i + 1}@example.com',
+        'lat': rng.uniform(8, 35), 'lng': rng.uniform(68, 97),
+    } for i in range(n_industries)])
+    db.session.commit()
+
+    # Load without the secondary indexes and build them once at the end
+    table = SensorReading.__table__
+    with db.engine.begin() as conn:
+        for index in table.indexes:
+            index.drop(conn, checkfirst=True)
+    limits = {sl['type']: [sl[p] for p in POLLUTANTS] for sl in SAFE_LIMITS}
+    industry_types = [types[i % len(types)] for i in range(n_industries)]
+    loaded = 0
+    for chunk in _readings(n_industries, per_industry, industry_types, limits, seed):
+        with db.engine.begin() as conn:
+            conn.execute(table.insert(), chunk)
+        loaded += len(chunk)
+        print(f'\r[BENCH] Loaded {loaded:,} / {n_industries * per_industry:,} readings', end='',
+              flush=True)
+    print()
+    with db.engine.begin() as conn:
+        for index in table.indexes:
+            index.create(conn)
+
+    last = EPOCH + INTERVAL * per_industry
+    db.session.execute(AdminComment.__table__.insert(), [{
+        'industry_id': i + 1, 'reading_id': None, 'officer': 'admin', 'action': 'Notice Issued',
+        'comment': f'Bench comment {k + 1}', 'created_at': last - timedelta(days=k),
+    } for i in range(n_industries) for k in range(COMMENTS_PER_INDUSTRY)])
+    db.session.commit()
+
+    rebuild_summaries()
+    rebuild_rollups()
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('ANALYZE')
+    limit_registry.invalidate()
+    response_cache.clear()
+    print(f'[BENCH] Built {size} dataset in {time.perf_counter() - t0:.1f}s')
+
+
+def _dataset_ready(size):
+    from models import db, SensorReading
+    n_industries, per_industry = DATASETS[size]
+    try:
+        return db.session.query(SensorReading.id).count() >= n_industries * per_industry
+    except Exception:
+        db.session.rollback()
+        return False
+
+
+def prepare(size, seed, database_url=None, reuse=False, rebuild=False):
+    """Import the app against a dataset of `size`, building it if needed. Returns (app, url)."""
+    pristine = None
+    if database_url is None:
+        os.makedirs(DATASET_DIR, exist_ok=True)
+        pristine = os.path.join(DATASET_DIR, f'{size}-seed{seed}.db')
+        work = os.path.join(tempfile.mkdtemp(), f'{size}.db')
+        if os.path.exists(pristine) and not rebuild:
+            shutil.copyfile(pristine, work)
+            reuse = True
+        database_url = f'sqlite:///{work}'
+
+    os.environ['DATABASE_URL'] = database_url
+    from app import app
+    from models import db
+
+    from migrations import pending, upgrade
+
+    with app.app_context():
+        if rebuild or not (reuse and _dataset_ready(size)):
+            build_dataset(size, seed)
+            changed = True
+        else:
+            # A cached dataset may predate later migrations
+            changed = bool(pending())
+            upgrade()
+        if pristine and changed:
+            db.session.remove()
+            db.engine.dispose()
+            shutil.copyfile(database_url[len('sqlite:///'):], pristine)
+    return app, database_url
+
+
+# ── Routes ────────────────────────────────────────────────────────────────────
+def _cases(n_industries, per_industry):
+    """(name, method, url, body, cached) with {id} filled in per request."""
+    last = EPOCH + INTERVAL * per_industry
+    day = f"from={(last - timedelta(days=1)).isoformat()}&to={last.isoformat()}"
+    week = f"from={(last - timedelta(days=7)).isoformat()}&to={last.isoformat()}"
+    hour = f"from={(last - timedelta(hours=2)).isoformat()}&to={last.isoformat()}"
+    return [
+        ('GET /industries', 'GET', '/api/industries', None, True),
+        ('GET /industries/<id>', 'GET', '/api/industries/{id}', None, True),
+        ('GET /live/<id>', 'GET', '/api/live/{id}', None, True),
+        ('GET /history/<id>', 'GET', '/api/history/{id}?limit=50', None, True),
+        ('GET /history/<id>?cursor', 'GET', '/api/history/{id}?limit=50&cursor={cursor}', None, True),
+        ('GET /history/<id>?raw', 'GET', f'/api/history/{{id}}?{hour}&resolution=raw', None, True),
+        ('GET /history/<id>?hour', 'GET', f'/api/history/{{id}}?{day}&resolution=hour', None, True),
+        ('GET /history/<id>?day', 'GET', f'/api/history/{{id}}?{week}&resolution=day', None, True),
+        ('GET /safe-limits/<type>', 'GET', '/api/safe-limits/Steel%20Industry', None, True),
+        ('GET /violations', 'GET', '/api/violations?limit=100', None, True),
+        ('GET /violations?cursor', 'GET', '/api/violations?limit=100&cursor={vcursor}', None, True),
+        ('GET /comments/<id>', 'GET', '/api/comments/{id}', None, True),
+        ('GET /export/readings', 'GET', '/api/export/readings?industry_id={id}&format=ndjson', None, False),
+        ('GET /pdf/<id>', 'GET', '/api/pdf/{id}', None, False),
+        ('POST /readings/batch', 'POST', '/api/readings/batch', 'batch', False),
+        ('POST /comment', 'POST', '/api/comment', 'comment', False),
+        ('POST /send-notice', 'POST', '/api/send-notice', 'notice', False),
+        ('POST /login', 'POST', '/api/login', 'login', False),
+    ]
+
+
+def _body(kind, industry_id, seq):
+    if kind == 'batch':
+        ts = datetime.utcnow()
+        return {'readings': [{'industry_id': industry_id, 'pm25': 40.0 + i % 30, 'pm10': 80.0,
+                              'no2': 50.0, 'so2': 50.0, 'co2': 800.0,
+                              'timestamp': (ts + timedelta(milliseconds=i)).isoformat()}
+                             for i in range(100)]}
+    if kind == 'comment':
+        return {'industry_id': industry_id, 'comment': f'bench {seq}', 'action': 'Notice Issued'}
+    if kind == 'notice':
+        return {'industry_id': industry_id, 'action': 'Notice Issued'}
+    return {'username': 'admin', 'password': 'admin123'}
+
+
+def bench_routes(app, size, repeat, seed):
+    import random
+
+    from flask_jwt_extended import create_access_token
+    from cache import response_cache
+
+    n_industries, per_industry = DATASETS[size]
+    rng = random.Random(seed)
+    client = app.test_client()
+    with app.app_context():
+        auth = {'Authorization': f"Bearer {create_access_token(identity='admin')}"}
+    first_page = {}
+
+    def cursor_for(url):
+        if url not in first_page:
+            first_page[url] = client.get(url, headers=auth).headers.get('X-Next-Cursor', '')
+        return first_page[url]
+
+    results = {}
+    for name, method, template, body, cached in _cases(n_industries, per_industry):
+        # bcrypt and PDF rendering are deliberately slow; sample them less
+        n = max(5, repeat // 10) if name in ('POST /login', 'GET /pdf/<id>', 'GET /export/readings') else repeat
+        ids = [rng.randint(1, n_industries) for _ in range(n)]
+        urls = [template.format(
+            id=i,
+            cursor=cursor_for(f'/api/history/{i}?limit=50') if '{cursor}' in template else '',
+            vcursor=cursor_for('/api/violations?limit=100') if '{vcursor}' in template else '')
+            for i in ids]
+
+        def call(k, headers=auth):
+            if method == 'GET':
+                return client.get(urls[k], headers=headers)
+            return client.post(urls[k], json=_body(body, ids[k], k), headers=headers)
+
+        call(0)  # warm-up: first-use costs (PDF pool start, bcrypt import) are not the route's
+        samples, errors = [], 0
+        for k in range(n):
+            response_cache.clear()
+            t0 = time.perf_counter()
+            resp = call(k)
+            if method == 'GET':
+                resp.get_data()  # drain streamed bodies
+            samples.append((time.perf_counter() - t0) * 1000)
+            errors += resp.status_code >= 400
+        results[name] = _stats(samples, errors)
+
+        if cached:
+            samples, errors = [], 0
+            for k in range(n):
+                etag = call(k).headers.get('ETag')
+                t0 = time.perf_counter()
+                resp = call(k, {**auth, 'If-None-Match': etag})
+                samples.append((time.perf_counter() - t0) * 1000)
+                errors += resp.status_code != 304
+            results[f'{name} (304)'] = _stats(samples, errors)
+        print(f"  {name:<34} p50={results[name]['p50']:>9.2f} ms  p95={results[name]['p95']:>9.2f} ms"
+              f"  {results[name]['rps']:>9.1f} req/s  errors={results[name]['errors']}", flush=True)
+    return results
+
+
+def _stats(samples, errors=0):
+    out = summarize(samples)
+    out['rps'] = round(1000 * len(samples) / sum(samples), 1) if sum(samples) else None
+    out['n'] = len(samples)
+    out['errors'] = errors
+    return out
+
+
+# ── Simulation write path ─────────────────────────────────────────────────────
+def bench_writes(app, size, readings, producers, seed):
+    """
+    Rows built the way the drone simulator builds them, submitted to the
+    group-commit writer from `producers` threads and published to the fan-out
+    once committed. Latency is submit -> committed.
+    """
+    import random
+
+    from app import socketio
+    from compliance import is_violation
+    from fanout import start_fanout
+    from limits import registry as limit_registry
+    from models import Industry
+    from simulation import _base_reading
+    from writer import start_writer
+
+    random.seed(seed)  # _base_reading draws from the module-level generator
+    fanout = start_fanout(socketio)
+    writer = start_writer(app)
+    with app.app_context():
+        sites = [(i.id, i.industry_type, i.lat, i.lng) for i in Industry.query.order_by(Industry.id)]
+        limits = {t: limit_registry.get(t) for _, t, _, _ in sites}
+    latencies, lock = [], threading.Lock()
+    per_producer = readings // producers
+
+    def produce(p):
+        rng = random.Random(seed + p)
+        pending = []
+        for _ in range(per_producer):
+            industry_id, industry_type, lat, lng = sites[rng.randrange(len(sites))]
+            data = _base_reading(limits[industry_type])
+            payload = {'industry_id': industry_id, 'is_violation': is_violation(data, limits[industry_type]),
+                       **data}
+            row = {'gps_lat': lat + rng.uniform(-0.005, 0.005),
+                   'gps_lng': lng + rng.uniform(-0.005, 0.005), **payload}
+            submitted = time.perf_counter()
+
+            def _written(fut, submitted=submitted, payload=payload):
+                done = time.perf_counter()
+                payload['reading_id'] = fut.result()
+                fanout.publish(payload)
+                with lock:
+                    latencies.append((done - submitted) * 1000)
+
+            fut = writer.submit(row)
+            fut.add_done_callback(_written)
+            pending.append(fut)
+        for fut in pending:
+            fut.result()
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=produce, args=(p,)) for p in range(producers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    writer.stop()
+    while len(latencies) < per_producer * producers:
+        time.sleep(0.01)
+
+    out = summarize(latencies)
+    out.update({'rows_per_s': round(per_producer * producers / elapsed, 1),
+                'n': per_producer * producers, 'producers': producers,
+                'batches': writer.batches_written})
+    print(f"  write path: {out['rows_per_s']:,.0f} readings/s  commit p50={out['p50']} ms  "
+          f"p95={out['p95']} ms  p99={out['p99']} ms  ({out['batches']} batches)", flush=True)
+    return out
+
+
+# ── Socket.IO fan-out ─────────────────────────────────────────────────────────
+def bench_sockets(modes, steps, window, port):
+    from bench.sockets import measure
+
+    results = {}
+    for mode in modes:
+        rows = measure(mode, steps, industries=10, rate=5, window=window, max_p99_ms=250, port=port)
+        results[mode] = {str(r['clients']): {k: r[k] for k in ('p50_ms', 'p99_ms', 'received_pct',
+                                                              'failed', 'holds')}
+                         for r in rows}
+    return results
+
+
+# ── Baselines ─────────────────────────────────────────────────────────────────
+def _metrics(result):
+    """Flatten a result into {name: (value, higher_is_better)} for comparison."""
+    out = {}
+    for name, r in result.get('routes', {}).items():
+        out[f'{name} p95 ms'] = (r['p95'], False)
+        out[f'{name} req/s'] = (r['rps'], True)
+    if result.get('writes'):
+        out['write path p95 ms'] = (result['writes']['p95'], False)
+        out['write path readings/s'] = (result['writes']['rows_per_s'], True)
+    for mode, steps in result.get('sockets', {}).items():
+        for clients, r in steps.items():
+            out[f'sockets {mode} {clients} clients p99 ms'] = (r['p99_ms'], False)
+    return out
+
+
+def compare(current, baseline, threshold):
+    """Print per-metric changes; returns the names that regressed past `threshold` %."""
+    base, cur = _metrics(baseline), _metrics(current)
+    regressed = []
+    for key in ('size', 'dialect', 'async_mode'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"[BENCH] Warning: baseline {key} is {baseline['meta'].get(key)!r}, "
+                  f"this run is {current['meta'].get(key)!r}")
+    print(f"\n{'metric':<52} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, (old, higher_is_better) in base.items():
+        new = cur.get(name, (None,))[0]
+        if not old or new is None:
+            continue
+        change = (new - old) / old * 100
+        worse = -change if higher_is_better else change
+        flag = ''
+        if worse > threshold:
+            regressed.append(name)
+            flag = '  REGRESSED'
+        print(f'{name:<52} {old:>10.2f} {new:>10.2f} {change:>+7.1f}%{flag}')
+    return regressed
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', choices=DATASETS, default='10k')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database-url', help='default: a cached SQLite file under instance/bench/')
+    parser.add_argument('--reuse', action='store_true', help='keep an already-loaded --database-url')
+    parser.add_argument('--rebuild', action='store_true', help='regenerate the dataset')
+    parser.add_argument('--repeat', type=int, default=200, help='requests per route')
+    parser.add_argument('--writes', type=int, default=20000, help='readings for the write path')
+    parser.add_argument('--producers', type=int, default=8)
+    parser.add_argument('--socket-modes', nargs='*', default=['threading'])
+    parser.add_argument('--socket-steps', nargs='+', type=int, default=[50, 200])
+    parser.add_argument('--socket-window', type=float, default=3)
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--skip', nargs='*', default=[], choices=['routes', 'writes', 'sockets'])
+    parser.add_argument('--out', help='default: bench/baselines/<size>-<dialect>.json')
+    parser.add_argument('--compare', help='earlier result file to diff against')
+    parser.add_argument('--threshold', type=float, default=20.0, help='regression threshold, %%')
+    args = parser.parse_args()
+
+    app, url = prepare(args.size, args.seed, args.database_url, args.reuse, args.rebuild)
+    from models import db
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    n_industries, per_industry = DATASETS[args.size]
+    result = {
+        'meta': {
+            'size': args.size, 'seed': args.seed, 'dialect': dialect,
+            'industries': n_industries, 'readings': n_industries * per_industry,
+            'revision': _git_revision(), 'created_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'cpus': os.cpu_count(), 'async_mode': os.getenv('ASYNC_MODE', 'threading'),
+            'repeat': args.repeat,
+        },
+    }
+
+    print(f'[BENCH] {args.size} ({n_industries * per_industry:,} readings, {dialect})')
+    if 'routes' not in args.skip:
+        result['routes'] = bench_routes(app, args.size, args.repeat, args.seed)
+    if 'writes' not in args.skip:
+        result['writes'] = bench_writes(app, args.size, args.writes, args.producers, args.seed)
+    if 'sockets' not in args.skip and args.socket_modes:
+        result['sockets'] = bench_sockets(args.socket_modes, args.socket_steps,
+                                          args.socket_window, args.port)
+
+    out = args.out or os.path.join(BASELINE_DIR, f'{args.size}-{dialect}.json')
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'[BENCH] Results written to {out}')
+
+    if baseline is not None:
+        regressed = compare(result, baseline, args.threshold)
+        if regressed:
+            print(f'\n{len(regressed)} metric(s) regressed by more than {args.threshold:g}%')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Write throughput: one commit per reading vs. the group-commit ReadingWriter.
+    python -m bench.writer --readings 5000 --producers 8
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from bench.common import build_app, populate
+
+
+def _row(i, n_industries):
+    return {'industry_id': i % n_industries + 1, 'pm25': 40.0, 'pm10': 80.0,
+            'no2': 50.0, 'so2': 50.0, 'co2': 800.0, 'temperature': 30.0,
+            'humidity': 50.0, 'gps_lat': 20.0, 'gps_lng': 78.0, 'is_violation': i % 7 == 0}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--readings', type=int, default=5000)
+    parser.add_argument('--producers', type=int, default=8)
+    parser.add_argument('--industries', type=int, default=50)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = build_app(f'sqlite:///{path}')
+    from models import db
+    from writer import ReadingWriter, persist
+
+    with app.app_context():
+        populate(args.industries, 0)
+
+        t0 = time.perf_counter()
+        for i in range(args.readings):
+            persist([_row(i, args.industries)])
+            db.session.commit()
+        per_row = args.readings / (time.perf_counter() - t0)
+        db.session.remove()
+
+    w = ReadingWriter(app).start()
+    per_thread = args.readings // args.producers
+
+    def produce(offset):
+        futures = [w.submit(_row(offset + i, args.industries)) for i in range(per_thread)]
+        for f in futures:
+            f.result()
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=produce, args=(p * per_thread,)) for p in range(args.producers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    grouped = per_thread * args.producers / (time.perf_counter() - t0)
+    w.stop()
+
+    print(f'per-row commit : {per_row:10.0f} readings/s')
+    print(f'group commit   : {grouped:10.0f} readings/s  ({w.batches_written} batches)')
+
+
+if __name__ == '__main__':
+    main()
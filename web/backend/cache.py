@@ -0,0 +1,181 @@
+"""
+Write-invalidated response cache for the api blueprint's read endpoints.
+
+Every cached view names the scopes its response depends on: 'industry:<id>'
+for one industry's detail, live reading, history and comments, 'industries'
+for the list, plus 'violations' and 'limits'. Each scope has a generation
+counter; writers mark the scopes they touch on the session and the counters
+are bumped once that transaction commits, so a response can never be cached
+under a generation whose data it does not contain. A view's ETag is the
+process epoch plus its scopes' generations, which makes If-None-Match a
+dictionary lookup and lets unchanged polls return 304 without touching the
+database.
+
+Generations live in process memory, so a write is only seen by the process
+that committed it: run one app process per database. RESPONSE_CACHE_ENTRIES
+bounds the stored bodies (0 keeps only the validators).
+"""
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import request, make_response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from metrics import Callback
+from models import Industry, SafeLimit, AdminComment
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._epoch = uuid.uuid4().hex[:8]
+        self._generation = 0          # bumped by clear(): invalidates every scope
+        self._scopes = {}             # scope -> generation
+        self._modified = {}           # scope -> last bump (UTC, whole seconds)
+        self._started = self._now()
+        self._entries = OrderedDict()  # (path, tag) -> (body, status, headers)
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def _now():
+        return datetime.now(timezone.utc).replace(microsecond=0)
+
+    # ── Invalidation ──────────────────────────────────────────────────────────
+    def bump(self, *scopes):
+        now = self._now()
+        with self._lock:
+            for scope in scopes:
+                self._scopes[scope] = self._scopes.get(scope, 0) + 1
+                self._modified[scope] = now
+
+    def clear(self):
+        """Invalidate everything (bulk rewrites: rescoring, archiving)."""
+        with self._lock:
+            self._generation += 1
+            self._started = self._now()
+            self._entries.clear()
+
+    # ── Validators ────────────────────────────────────────────────────────────
+    def tag(self, scopes):
+        gens = '.'.join(str(self._scopes.get(s, 0)) for s in scopes)
+        return f'{self._epoch}-{self._generation}-{gens}'
+
+    def last_modified(self, scopes):
+        return max([self._started] + [self._modified[s] for s in scopes if s in self._modified])
+
+    # ── Entries ───────────────────────────────────────────────────────────────
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry
+
+    def put(self, key, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'not_modified': self.not_modified,
+                'entries': len(self._entries), 'scopes': len(self._scopes)}
+
+
+response_cache = ResponseCache(int(os.getenv('RESPONSE_CACHE_ENTRIES', 1024)))
+Callback('aerosense_response_cache_requests_total', 'Cached-view requests by result',
+         lambda: {('hit',): response_cache.hits, ('miss',): response_cache.misses,
+                  ('not_modified',): response_cache.not_modified},
+         kind='counter', labels=('result',))
+
+
+def invalidate_on_commit(session, *scopes):
+    """Bump `scopes` once `session`'s current transaction commits."""
+    session.info.setdefault('cache_scopes', set()).update(scopes)
+
+
+# ── View decorator ────────────────────────────────────────────────────────────
+def cached(scopes):
+    """
+    Cache a GET view's 200 responses under its scopes' generations and answer
+    If-None-Match / If-Modified-Since with 304. `scopes` is a tuple, or a
+    callable taking the view's kwargs and returning one.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            view_scopes = scopes(**kwargs) if callable(scopes) else scopes
+            path = request.full_path
+            tag = response_cache.tag(view_scopes)
+            etag = hashlib.sha1(f'{tag}|{path}'.encode()).hexdigest()[:20]
+            last_modified = response_cache.last_modified(view_scopes)
+            # Dates have one-second resolution: another write can still land in
+            # the current second, so a date from it is neither trusted nor sent
+            settled = last_modified < response_cache._now()
+
+            if request.if_none_match:
+                fresh = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                fresh = settled and since is not None and since >= last_modified
+            if fresh:
+                response_cache.not_modified += 1
+                resp = make_response('', 304)
+            else:
+                entry = response_cache.get((path, tag))
+                if entry is not None:
+                    body, status, headers = entry
+                    resp = make_response(body, status, headers)
+                else:
+                    resp = make_response(view(*args, **kwargs))
+                    if resp.status_code != 200:
+                        return resp
+                    response_cache.put((path, tag), (
+                        resp.get_data(), resp.status_code,
+                        [(k, v) for k, v in resp.headers.items() if k != 'Content-Length']))
+            resp.set_etag(etag)
+            if settled:
+                resp.last_modified = last_modified
+            resp.headers['Cache-Control'] = 'no-cache'
+            return resp
+        return wrapper
+    return decorator
+
+
+# ── Hooks ─────────────────────────────────────────────────────────────────────
+@event.listens_for(Session, 'before_flush')
+def _track_changes(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, SafeLimit):
+            invalidate_on_commit(session, 'limits')
+        elif isinstance(obj, AdminComment):
+            invalidate_on_commit(session, f'industry:{obj.industry_id}')
+        elif isinstance(obj, Industry):
+            invalidate_on_commit(session, 'industries', f'industry:{obj.id}')
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_on_commit(session):
+    scopes = session.info.pop('cache_scopes', None)
+    if scopes:
+        response_cache.bump(*scopes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop('cache_scopes', None)
+
@@ -0,0 +1,158 @@
+"""
+Compliance and violation scoring.
+
+The scalar functions serve request handlers and the simulator; the array
+functions score columnar batches (one row per reading, one column per
+pollutant in POLLUTANTS order, NaN for missing values) and give the same
+answers as the scalar ones, down to the rounding of compliance scores.
+
+    python compliance.py rescore [industry_type]   # rewrite is_violation in bulk
+"""
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+from sqlalchemy import select
+
+from cache import response_cache
+from limits import POLLUTANTS, registry as limit_registry
+from models import db, Industry, SensorReading
+from summary import rebuild as rebuild_summaries
+from rollups import rebuild as rebuild_rollups
+
+MAX_RATIO = 2.0
+UPDATE_CHUNK = 10000  # ids per UPDATE ... IN (), under SQLite's variable limit
+
+
+def _values(reading):
+    if isinstance(reading, Mapping):
+        return [reading.get(p) for p in POLLUTANTS]
+    return [getattr(reading, p) for p in POLLUTANTS]
+
+
+# ── Scalar ────────────────────────────────────────────────────────────────────
+def is_violation(reading, limits):
+    """True if any pollutant of `reading` (dict or row) exceeds its limit."""
+    for val, lim in zip(_values(reading), limits.values):
+        if val is not None and val > lim:
+            return True
+    return False
+
+
+def compliance_score(reading, limits):
+    """Returns 0-100 score where 100 = fully compliant."""
+    if not reading or not limits:
+        return None
+    ratios = []
+    for val, lim in zip(_values(reading), limits.values):
+        if val and lim:
+            ratios.append(min(val / lim, MAX_RATIO))
+    if not ratios:
+        return None
+    avg = sum(ratios) / len(ratios)
+    score = max(0, round((MAX_RATIO - avg) / MAX_RATIO * 100, 1))
+    return score
+
+
+# ── Vectorised ────────────────────────────────────────────────────────────────
+def limit_rows(industry_types):
+    """Per-reading limit matrix for an iterable of industry types."""
+    type_index, matrix = limit_registry.matrix()
+    missing = len(matrix) - 1
+    idx = np.fromiter((type_index.get(t, missing) for t in industry_types), dtype=np.intp)
+    return matrix[idx]
+
+
+def violation_mask(values, limits):
+    """Boolean array: any pollutant above its limit (NaN never violates)."""
+    return (values > limits).any(axis=1)
+
+
+def _round1(x):
+    """Vectorised round(x, 1) that matches Python's correctly rounded result."""
+    scaled = x * 10
+    out = np.rint(scaled) / 10
+    # Within a hair of a .x5 tie the multiplication may have moved x across
+    # it; defer those few elements to Python's exact rounding.
+    frac = np.abs(scaled - np.floor(scaled) - 0.5)
+    near_tie = np.flatnonzero(frac < 1e-6)
+    for i in near_tie:
+        out.flat[i] = round(float(x.flat[i]), 1)
+    return out
+
+
+def compliance_scores(values, limits):
+    """Float array of 0-100 scores; NaN where `compliance_score` returns None."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        usable = ~np.isnan(values) & (values != 0) & (limits != 0) & ~np.isinf(limits)
+        ratios = np.where(usable, np.minimum(values / limits, MAX_RATIO), 0.0)
+    # Left-to-right column sum reproduces Python's sum() bit for bit
+    total = ratios[:, 0].copy()
+    for col in range(1, ratios.shape[1]):
+        total += ratios[:, col]
+    count = usable.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg = total / count
+        scores = np.maximum(0, _round1((MAX_RATIO - avg) / MAX_RATIO * 100))
+    scores[count == 0] = np.nan
+    return scores
+
+
+# ── Bulk rescoring ────────────────────────────────────────────────────────────
+def rescore(industry_type=None, chunk_size=100000):
+    """
+    Recompute is_violation for every stored reading (optionally one industry
+    type) against the current limits. Walks the table in id order, scores
+    each chunk as arrays and only writes rows whose flag changed.
+    """
+    table = SensorReading.__table__
+    cols = [table.c.id, Industry.industry_type, table.c.is_violation] + [table.c[p] for p in POLLUTANTS]
+    scanned = changed = 0
+    last_id = 0
+    while True:
+        stmt = (select(*cols)
+                .join(Industry, Industry.id == table.c.industry_id)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(chunk_size))
+        if industry_type:
+            stmt = stmt.where(Industry.industry_type == industry_type)
+        rows = db.session.execute(stmt).all()
+        if not rows:
+            break
+
+        ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        current = np.fromiter((bool(r[2]) for r in rows), dtype=bool, count=len(rows))
+        values = np.array([[np.nan if v is None else v for v in r[3:]] for r in rows],
+                          dtype=np.float64)
+        mask = violation_mask(values, limit_rows(r[1] for r in rows))
+
+        diff = mask != current
+        for flag in (True, False):
+            flip = ids[diff & (mask == flag)].tolist()
+            for start in range(0, len(flip), UPDATE_CHUNK):
+                db.session.execute(table.update()
+                                   .where(table.c.id.in_(flip[start:start + UPDATE_CHUNK]))
+                                   .values(is_violation=flag))
+        db.session.commit()
+
+        scanned += len(rows)
+        changed += int(diff.sum())
+        last_id = int(ids[-1])
+
+    if changed:
+        rebuild_summaries()
+        rebuild_rollups()
+        response_cache.clear()
+    return {'scanned': scanned, 'changed': changed}
+
+
+if __name__ == '__main__':
+    from app import app
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'rescore':
+        print('Usage: python compliance.py rescore [industry_type]')
+        sys.exit(2)
+    with app.app_context():
+        stats = rescore(sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"[COMPLIANCE] Rescored {stats['scanned']} readings, {stats['changed']} changed.")
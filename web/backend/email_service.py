@@ -1,29 +1,78 @@
-import smtplib
+import atexit
+import hashlib
 import os
 import json
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.application import MIMEApplication
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.units import inch
 import io
 
+from runtime import ASYNC_MODE
+from metrics import Callback, PDF_RENDER_SECONDS
+
+
+# ── PDF rendering ────────────────────────────────────────────────────────────
+# Rendered notices are cached by content. Cache misses are rendered on a
+# bounded process pool (PDF_WORKERS, 0 = render in the calling thread) so a
+# burst of notices does not tie up request threads with ReportLab work.
+# Under eventlet child processes cannot be started from the patched
+# stdlib; renders run in the calling thread, which runtime.offload() has
+# already moved off the event loop.
+#
+# ReportLab, smtplib and email.mime are imported on first use: most
+# processes importing this module (the API, workers, CLIs) never render a
+# notice, and ReportLab alone is most of the import cost.
+PDF_CACHE_SIZE = int(os.getenv('PDF_CACHE_SIZE', 256))
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+if ASYNC_MODE != 'threading':
+    PDF_WORKERS = 0
+PDF_MAX_PENDING = int(os.getenv('PDF_MAX_PENDING', 64))
+
+_STYLES = None
+
+
+def _styles():
+    """Paragraph and table styles, built once per process."""
+    global _STYLES
+    if _STYLES is None:
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import TableStyle
+        base = getSampleStyleSheet()
+        _STYLES = {
+            'title': ParagraphStyle('Title', parent=base['Title'], fontSize=20,
+                                    textColor=colors.HexColor('#001f3f')),
+            'header': ParagraphStyle('Header', parent=base['Heading2'], fontSize=13,
+                                     textColor=colors.HexColor('#003366')),
+            'normal': base['Normal'],
+            'table': TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#001f3f')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.HexColor('#f0f4f8'), colors.white]),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#001f3f')),
+            ]),
+        }
+    return _STYLES
+
 
 def generate_pdf_bytes(data: dict) -> bytes:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import inch
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.8 * inch)
-    styles = getSampleStyleSheet()
+    styles = _styles()
     elements = []
 
-    title_style = ParagraphStyle('Title', parent=styles['Title'], fontSize=20,
-                                 textColor=colors.HexColor('#001f3f'))
-    header_style = ParagraphStyle('Header', parent=styles['Heading2'], fontSize=13,
-                                  textColor=colors.HexColor('#003366'))
-    normal_style = styles['Normal']
+    title_style = styles['title']
+    header_style = styles['header']
+    normal_style = styles['normal']
 
     elements.append(Paragraph("POLLUTION CONTROL BOARD", title_style))
     elements.append(Paragraph("OFFICIAL NOTICE OF VIOLATION", header_style))
@@ -43,15 +92,7 @@ def generate_pdf_bytes(data: dict) -> bytes:
                            f"{v['limit']} µg/m³", f"+{excess}%"])
 
     t = Table(table_data, colWidths=[1.5 * inch, 1.8 * inch, 1.8 * inch, 1.2 * inch])
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#001f3f')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.HexColor('#f0f4f8'), colors.white]),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('BOX', (0, 0), (-1, -1), 1, colors.HexColor('#001f3f')),
-    ]))
+    t.setStyle(styles['table'])
     elements.append(t)
     elements.append(Spacer(1, 0.2 * inch))
     elements.append(Paragraph(f"<b>Action Taken:</b> {data.get('action', 'Notice Issued')}", normal_style))
@@ -70,6 +111,105 @@ def generate_pdf_bytes(data: dict) -> bytes:
     return buffer.read()
 
 
+class PdfCache:
+    """LRU of rendered notices keyed by a digest of their content."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(data):
+        raw = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            pdf = self._entries.get(key)
+            if pdf is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pdf
+
+    def put(self, key, pdf):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = pdf
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                'bytes': sum(len(p) for p in self._entries.values())}
+
+
+pdf_cache = PdfCache(PDF_CACHE_SIZE)
+Callback('aerosense_pdf_cache_lookups_total', 'Notice PDF cache lookups by result',
+         lambda: {('hit',): pdf_cache.hits, ('miss',): pdf_cache.misses},
+         kind='counter', labels=('result',))
+_pool = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PDF_MAX_PENDING)
+_inflight = {}  # content key -> Future of a render in progress
+
+
+def _pdf_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: never fork the multi-threaded server process itself
+            ctx = multiprocessing.get_context('forkserver')
+            ctx.set_forkserver_preload(['email_service', 'reportlab.platypus'])
+            _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=ctx)
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def render_pdf(data: dict) -> bytes:
+    """
+    Notice PDF for `data`, served from the cache when the same content was
+    rendered before. Callers put everything that identifies the notice
+    (industry, latest reading id, action, comment) into `data`; the date
+    printed on a cached notice is the one it was first rendered with.
+    """
+    key = PdfCache.key(data)
+    pdf = pdf_cache.get(key)
+    if pdf is not None:
+        return pdf
+
+    # Concurrent requests for the same notice share one render
+    with _pool_lock:
+        shared = _inflight.get(key)
+        if shared is None:
+            _inflight[key] = Future()
+    if shared is not None:
+        return shared.result()
+
+    try:
+        with PDF_RENDER_SECONDS.time():
+            if PDF_WORKERS <= 0:
+                pdf = generate_pdf_bytes(data)
+            else:
+                with _pending:
+                    pdf = _pdf_pool().submit(generate_pdf_bytes, data).result()
+        pdf_cache.put(key, pdf)
+        _inflight[key].set_result(pdf)
+        return pdf
+    except Exception as e:
+        _inflight[key].set_exception(e)
+        raise
+    finally:
+        with _pool_lock:
+            del _inflight[key]
+
+
 def _build_html(data: dict) -> str:
     violations_html = "".join([
         f"<tr><td style='padding:8px;border:1px solid #ccc'>{v['pollutant']}</td>"
@@ -126,43 +266,84 @@ def _demo_log(to_email: str, data: dict):
     print("=" * 60 + "\n")
 
 
-def send_notice_email(to_email: str, data: dict):
-    """
-    Returns (success: bool, mode: str)
-    mode = 'smtp' | 'demo'
-    """
-    smtp_host = os.getenv('SMTP_HOST', '')
-    smtp_port = int(os.getenv('SMTP_PORT', 587))
+def smtp_settings():
+    """SMTP_* settings, or None when SMTP is not configured (demo mode)."""
     smtp_user = os.getenv('SMTP_USER', '')
     smtp_pass = os.getenv('SMTP_PASS', '')
-    smtp_from = os.getenv('SMTP_FROM', smtp_user)
+    settings = {
+        'host': os.getenv('SMTP_HOST', ''),
+        'port': int(os.getenv('SMTP_PORT', 587)),
+        'user': smtp_user,
+        'password': smtp_pass,
+        'sender': os.getenv('SMTP_FROM', smtp_user),
+        'starttls': os.getenv('SMTP_STARTTLS', '1') not in ('0', 'false', 'no'),
+    }
+    if smtp_user == 'your-email@gmail.com':
+        return None
+    if smtp_user and smtp_pass:
+        return settings
+    # Unauthenticated relay (e.g. a local stand-in) only on explicit opt-in:
+    # a bare SMTP_HOST used to mean demo mode and must not start sending mail
+    relay = os.getenv('SMTP_RELAY', '0').lower() not in ('0', 'false', 'no', '')
+    return settings if relay and settings['host'] and not smtp_user else None
 
-    # ── Demo mode if SMTP not configured ────────────────────
-    if not smtp_user or not smtp_pass or smtp_user == 'your-email@gmail.com':
-        _demo_log(to_email, data)
-        return True, 'demo'
 
-    # ── Real SMTP send ───────────────────────────────────────
+def connect_smtp(settings):
+    """A ready-to-send SMTP session: EHLO, optional STARTTLS and login."""
+    import smtplib
+
+    server = smtplib.SMTP(settings['host'], settings['port'], timeout=10)
+    server.ehlo()
+    if settings['starttls']:
+        server.starttls()
+        server.ehlo()
+    if settings['user']:
+        server.login(settings['user'], settings['password'])
+    return server
+
+
+def build_message(to_email: str, data: dict, sender: str):
+    """The notice as a MIMEMultipart: HTML body plus the PDF attachment."""
+    from email.mime.application import MIMEApplication
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+
     msg = MIMEMultipart('alternative')
     msg['Subject'] = f"⚠ POLLUTION VIOLATION NOTICE – {data.get('industry_name')}"
-    msg['From'] = smtp_from
+    msg['From'] = sender
     msg['To'] = to_email
     msg.attach(MIMEText(_build_html(data), 'html'))
 
     try:
-        pdf_bytes = generate_pdf_bytes(data)
+        pdf_bytes = render_pdf(data)
         pdf_part = MIMEApplication(pdf_bytes, Name='violation_notice.pdf')
         pdf_part['Content-Disposition'] = 'attachment; filename="violation_notice.pdf"'
         msg.attach(pdf_part)
     except Exception as e:
         print(f"[PDF] Error: {e}")
+    return msg
 
+
+def send_notice_email(to_email: str, data: dict):
+    """
+    Returns (success: bool, mode: str)
+    mode = 'smtp' | 'demo'
+
+    Sends synchronously on a fresh connection; the API queues notices
+    through outbox.py instead.
+    """
+    settings = smtp_settings()
+
+    # ── Demo mode if SMTP not configured ────────────────────
+    if settings is None:
+        _demo_log(to_email, data)
+        return True, 'demo'
+
+    # ── Real SMTP send ───────────────────────────────────────
+    msg = build_message(to_email, data, settings['sender'])
     try:
-        with smtplib.SMTP(smtp_host, smtp_port, timeout=10) as server:
-            server.ehlo()
-            server.starttls()
-            server.login(smtp_user, smtp_pass)
-            server.sendmail(smtp_from, to_email, msg.as_string())
+        with connect_smtp(settings) as server:
+            server.sendmail(settings['sender'], to_email, msg.as_string())
         return True, 'smtp'
     except Exception as e:
         print(f"[EMAIL] Send failed: {e}")
@@ -0,0 +1,186 @@
+"""
+Violation notices, singly and in bulk.
+
+`notice_data` is the one place a notice's content is assembled; the single
+send-notice and PDF routes use it, and so does the bulk enforcement run,
+which notices every industry whose latest reading is a violation
+(industries without a contact email are skipped and listed in the run):
+
+  1. one joined query selects the violating industries with their latest
+     readings, and violation lists are built in the same pass;
+  2. notice PDFs are rendered in parallel (they land in the PDF cache, so
+     the outbox dispatcher attaches them without rendering again);
+  3. outbox jobs and AdminComments are inserted in bulk in one transaction;
+  4. progress goes out as `enforcement_progress` Socket.IO events.
+"""
+import itertools
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+
+from cache import invalidate_on_commit
+from email_service import render_pdf, PDF_WORKERS
+from limits import registry as limit_registry
+from metrics import SOCKET_EMITS
+from models import db, Industry, SensorReading, IndustrySummary, AdminComment, EmailJob
+from outbox import delivery_mode, get_dispatcher
+
+POLLUTANT_LABELS = [('pm25', 'PM2.5'), ('pm10', 'PM10'), ('no2', 'NO2'),
+                    ('so2', 'SO2'), ('co2', 'CO2')]
+PROGRESS_EVERY = 10  # emit progress at most every N industries per phase
+RUNS_KEPT = int(os.getenv('ENFORCEMENT_RUNS_KEPT', 100))  # finished runs kept for status polls
+
+_run_ids = itertools.count(1)
+_runs_lock = threading.Lock()
+runs = {}
+
+
+def notice_violations(reading, limits):
+    """Pollutants of `reading` above `limits`, in notice/PDF format."""
+    if not reading or not limits:
+        return []
+    violations = []
+    for field, name in POLLUTANT_LABELS:
+        val, lim = getattr(reading, field), getattr(limits, field)
+        if val and val > lim:
+            violations.append({'pollutant': name, 'value': val, 'limit': lim})
+    return violations
+
+
+def notice_data(ind, latest, limits, action='Notice Issued', comment=''):
+    return {
+        'industry_id': ind.id,
+        'reading_id': latest.id if latest else None,
+        'industry_name': ind.name,
+        'industry_type': ind.industry_type,
+        'location': ind.location or 'N/A',
+        'violations': notice_violations(latest, limits),
+        'action': action,
+        'comment': comment,
+    }
+
+
+def violating_industries(industry_type=None):
+    """[(industry, latest_reading)] for industries whose latest reading violates."""
+    query = (db.session.query(Industry, SensorReading)
+             .join(IndustrySummary, IndustrySummary.industry_id == Industry.id)
+             .join(SensorReading, SensorReading.id == IndustrySummary.latest_reading_id)
+             .filter(SensorReading.is_violation == db.true())
+             .order_by(Industry.id))
+    if industry_type:
+        query = query.filter(Industry.industry_type == industry_type)
+    return query.all()
+
+
+# ── Bulk run ──────────────────────────────────────────────────────────────────
+class EnforcementRun:
+    def __init__(self, app, socketio, officer, action='Notice Issued', comment='',
+                 industry_type=None):
+        self.id = next(_run_ids)
+        self.app = app
+        self.socketio = socketio
+        self.officer = officer
+        self.action = action
+        self.comment = comment
+        self.industry_type = industry_type
+        self.status = 'queued'
+        self.phase = None
+        self.total = 0
+        self.done = 0
+        self.job_ids = []
+        self.skipped_no_email = []
+        self.error = None
+        self.started_at = datetime.utcnow()
+        self.finished_at = None
+
+    def as_dict(self):
+        return {'run_id': self.id, 'status': self.status, 'phase': self.phase,
+                'total': self.total, 'done': self.done, 'jobs': len(self.job_ids),
+                'skipped_no_email': self.skipped_no_email, 'error': self.error, 'started_at': self.started_at.isoformat(),
+                'finished_at': self.finished_at.isoformat() if self.finished_at else None}
+
+    def _progress(self, phase, done, force=False):
+        self.phase, self.done = phase, done
+        if self.socketio and (force or done % PROGRESS_EVERY == 0 or done == self.total):
+            self.socketio.emit('enforcement_progress', self.as_dict())
+            SOCKET_EMITS.inc('enforcement_progress')
+
+    def start(self):
+        with _runs_lock:
+            runs[self.id] = self
+            # Drop the oldest finished runs; running ones are always kept
+            finished = [i for i, r in runs.items() if r.finished_at is not None]
+            for i in finished[:max(0, len(runs) - RUNS_KEPT)]:
+                del runs[i]
+        threading.Thread(target=self._run, name=f'enforcement-{self.id}', daemon=True).start()
+        return self
+
+    def _run(self):
+        with self.app.app_context():
+            try:
+                self.status = 'running'
+                self.execute()
+                self.status = 'done'
+            except Exception as e:
+                db.session.rollback()
+                self.status, self.error = 'failed', str(e)
+                print(f'[ENFORCEMENT] Run {self.id} failed: {e}')
+            finally:
+                self.finished_at = datetime.utcnow()
+                self._progress(self.phase, self.done, force=True)
+                db.session.remove()
+
+    def execute(self):
+        # 1. Select and build
+        targets = violating_industries(self.industry_type)
+        limits = limit_registry.all()
+        # Without an address nothing is sent, so no notice is recorded either
+        self.skipped_no_email = [ind.id for ind, _ in targets if not ind.contact_email]
+        notices = [(ind, latest, notice_data(ind, latest, limits.get(ind.industry_type),
+                                             self.action, self.comment))
+                   for ind, latest in targets if ind.contact_email]
+        self.total = len(notices)
+        self._progress('selected', 0, force=True)
+
+        # 2. Render PDFs in parallel
+        workers = max(1, PDF_WORKERS) * 2
+        with ThreadPoolExecutor(workers) as ex:
+            for i, _ in enumerate(ex.map(lambda n: render_pdf(n[2]), notices), 1):
+                self._progress('rendering', i)
+
+        # 3. Outbox jobs and comments in one transaction
+        now = datetime.utcnow()
+        mode = delivery_mode()
+        jobs = [{'to_email': ind.contact_email, 'payload': json.dumps(data), 'status': 'queued',
+                 'mode': mode, 'attempts': 0, 'next_attempt_at': now, 'last_error': None,
+                 'created_at': now, 'sent_at': None}
+                for ind, latest, data in notices]
+        if jobs:
+            self.job_ids = db.session.scalars(
+                EmailJob.__table__.insert().returning(EmailJob.id, sort_by_parameter_order=True),
+                jobs,
+            ).all()
+        if notices:
+            db.session.execute(AdminComment.__table__.insert(), [
+                {'industry_id': ind.id, 'reading_id': latest.id, 'officer': self.officer,
+                 'action': self.action, 'created_at': now,
+                 'comment': self.comment or f'{self.action} (bulk enforcement run #{self.id})'}
+                for ind, latest, data in notices])
+            invalidate_on_commit(db.session, *{f'industry:{ind.id}' for ind, _, _ in notices})
+        db.session.commit()
+        self._progress('queued', self.total, force=True)
+
+        dispatcher = get_dispatcher()
+        if dispatcher:
+            dispatcher.wake()
+
+
+def start_run(officer, action='Notice Issued', comment='', industry_type=None):
+    """Start a bulk run in the background from inside a request; returns it."""
+    return EnforcementRun(current_app._get_current_object(),
+                          current_app.extensions.get('socketio'),
+                          officer, action, comment, industry_type).start()
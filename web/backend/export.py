@@ -0,0 +1,92 @@
+"""
+Streaming exports of sensor_readings.
+
+Rows are read through a server-side cursor in `yield_per` partitions and
+written out as they arrive, so memory stays flat however large the export.
+Archived readings are streamed first, one Arrow record batch at a time.
+"""
+import csv
+import io
+import json
+
+from sqlalchemy import select
+
+import archive
+from models import db, SensorReading, Industry
+
+EXPORT_COLUMNS = ['id', 'industry_id', 'industry_name', 'timestamp', 'pm25', 'pm10', 'no2',
+                  'so2', 'co2', 'temperature', 'humidity', 'gps_lat', 'gps_lng', 'is_violation']
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+PARTITION_ROWS = 5000
+
+
+def export_statement(industry_id=None, start=None, end=None, violations_only=False):
+    table = SensorReading.__table__
+    stmt = (select(table.c.id, table.c.industry_id, Industry.name.label('industry_name'),
+                   table.c.timestamp, table.c.pm25, table.c.pm10, table.c.no2, table.c.so2,
+                   table.c.co2, table.c.temperature, table.c.humidity, table.c.gps_lat,
+                   table.c.gps_lng, table.c.is_violation)
+            .join(Industry, Industry.id == table.c.industry_id)
+            .order_by(table.c.id))
+    if industry_id is not None:
+        stmt = stmt.where(table.c.industry_id == industry_id)
+    if start is not None:
+        stmt = stmt.where(table.c.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.timestamp < end)
+    if violations_only:
+        stmt = stmt.where(table.c.is_violation == db.true())
+    return stmt
+
+
+def archived_partitions(industry_id=None, start=None, end=None, violations_only=False):
+    """Archived rows in export shape, one list per record batch."""
+    names = None
+    for batch in archive.iter_batches(industry_id, start, end, violations_only):
+        if names is None:
+            names = dict(db.session.execute(select(Industry.id, Industry.name)).all())
+        for d in batch:
+            d['industry_name'] = names.get(d['industry_id'])
+            d['timestamp'] = d['timestamp'].isoformat()
+        yield [{c: d[c] for c in EXPORT_COLUMNS} for d in batch]
+
+
+def _rows(stmt):
+    result = db.session.execute(
+        stmt.execution_options(stream_results=True, yield_per=PARTITION_ROWS))
+    try:
+        for partition in result.partitions():
+            yield [_plain(row) for row in partition]
+    finally:
+        result.close()
+
+
+def _plain(row):
+    d = dict(row._mapping)
+    d['timestamp'] = d['timestamp'].isoformat() if d['timestamp'] else None
+    d['is_violation'] = bool(d['is_violation'])
+    return d
+
+
+def _partitions(stmt, archived):
+    yield from archived
+    yield from _rows(stmt)
+
+
+def stream(stmt, fmt, archived=()):
+    """Generator of encoded chunks (one per partition) for a Flask Response."""
+    if fmt == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(EXPORT_COLUMNS)
+        for partition in _partitions(stmt, archived):
+            for d in partition:
+                writer.writerow([d[c] for c in EXPORT_COLUMNS])
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()
+    else:
+        for partition in _partitions(stmt, archived):
+            yield ''.join(json.dumps(d) + '\n' for d in partition)
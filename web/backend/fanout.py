@@ -0,0 +1,144 @@
+"""
+Per-industry Socket.IO fan-out.
+
+Clients `subscribe` to an industry and join its room. The subscription reply
+carries everything static about the industry (name, type, limits) plus a
+snapshot of the latest update; after that each `drone_update` only carries
+the fields that changed since the previous update for that industry, and
+clients merge it into their copy.
+
+Deltas compose by dict update, which makes slow clients cheap: a client
+whose Engine.IO send queue is longer than FANOUT_SLOW_QUEUE is skipped by
+the room broadcast and its pending deltas are merged into one, sent once its
+queue has drained.
+"""
+import os
+import threading
+
+from metrics import Callback, SOCKET_EMITS
+
+DRONE_UPDATE = 'drone_update'
+STATIC_FIELDS = ('industry_name', 'industry_type', 'limits')
+_MISSING = object()
+
+_fanout = None
+
+
+def room_for(industry_id):
+    return f'industry:{industry_id}'
+
+
+class Fanout:
+    def __init__(self, socketio, slow_queue=8, flush_interval=0.1):
+        self.socketio = socketio
+        self.slow_queue = slow_queue
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._state = {}    # industry_id -> merged latest update
+        self._pending = {}  # sid -> {industry_id: coalesced delta}
+        self._started = False
+        self.published = 0
+        self.coalesced = 0
+
+    # ── Subscriptions ─────────────────────────────────────────────────────────
+    def subscribe(self, sid, industry, limits):
+        from flask_socketio import join_room
+        with self._lock:
+            join_room(room_for(industry.id), sid=sid)
+            snapshot = self._state.get(industry.id)
+        return {
+            'industry_id': industry.id,
+            'industry_name': industry.name,
+            'industry_type': industry.industry_type,
+            'limits': limits,
+            'snapshot': dict(snapshot) if snapshot else None,
+        }
+
+    def unsubscribe(self, sid, industry_id):
+        from flask_socketio import leave_room
+        with self._lock:
+            leave_room(room_for(industry_id), sid=sid)
+            pending = self._pending.get(sid)
+            if pending:
+                pending.pop(industry_id, None)
+
+    def forget(self, sid):
+        """Drop coalesced state for a disconnected client."""
+        with self._lock:
+            self._pending.pop(sid, None)
+
+    # ── Publishing ────────────────────────────────────────────────────────────
+    def publish(self, update):
+        """Send `update` (a full drone_update payload) to its industry room as a delta."""
+        industry_id = update['industry_id']
+        fields = {k: v for k, v in update.items() if k not in STATIC_FIELDS}
+        room = room_for(industry_id)
+        with self._lock:
+            previous = self._state.get(industry_id, {})
+            delta = {k: v for k, v in fields.items() if previous.get(k, _MISSING) != v}
+            # Fields the new update lacks are cleared, so client state equals `fields`
+            delta.update((k, None) for k in previous.keys() - fields.keys())
+            delta['industry_id'] = industry_id
+            self._state[industry_id] = fields
+
+            slow = []
+            for sid, eio_sid in self.socketio.server.manager.get_participants('/', room):
+                if sid in self._pending or self._backlog(eio_sid) > self.slow_queue:
+                    self._pending.setdefault(sid, {}).setdefault(industry_id, {}).update(delta)
+                    slow.append(sid)
+                    self.coalesced += 1
+            # Emitting under the lock keeps deltas for an industry in order
+            self.socketio.emit(DRONE_UPDATE, delta, to=room, skip_sid=slow or None)
+            SOCKET_EMITS.inc(DRONE_UPDATE)
+            self.published += 1
+
+    def _backlog(self, eio_sid):
+        sock = self.socketio.server.eio.sockets.get(eio_sid)
+        return sock.queue.qsize() if sock is not None else 0
+
+    def _flush(self):
+        with self._lock:
+            for sid, deltas in list(self._pending.items()):
+                eio_sid = self.socketio.server.manager.eio_sid_from_sid(sid, '/')
+                if eio_sid is None:
+                    del self._pending[sid]
+                elif self._backlog(eio_sid) <= self.slow_queue:
+                    for delta in self._pending.pop(sid).values():
+                        self.socketio.emit(DRONE_UPDATE, delta, to=sid)
+                        SOCKET_EMITS.inc(DRONE_UPDATE)
+
+    def _run(self):
+        while True:
+            self.socketio.sleep(self.flush_interval)
+            try:
+                self._flush()
+            except Exception as e:
+                print(f'[FANOUT] Flush failed: {e}')
+
+    def start(self):
+        if not self._started:
+            self._started = True
+            self.socketio.start_background_task(self._run)
+        return self
+
+    def stats(self):
+        return {'published': self.published, 'coalesced': self.coalesced,
+                'pending_clients': len(self._pending), 'industries': len(self._state)}
+
+
+def start_fanout(socketio):
+    global _fanout
+    _fanout = Fanout(socketio,
+                     slow_queue=int(os.getenv('FANOUT_SLOW_QUEUE', 8)),
+                     flush_interval=float(os.getenv('FANOUT_FLUSH_MS', 100)) / 1000)
+    return _fanout.start()
+
+
+def get_fanout():
+    return _fanout
+
+
+Callback('aerosense_fanout_coalesced_total', 'Deltas held back for slow clients and merged',
+         lambda: _fanout.coalesced if _fanout else 0, kind='counter')
+Callback('aerosense_fanout_slow_clients', 'Clients with merged deltas waiting to flush',
+         lambda: len(_fanout._pending) if _fanout else 0)
@@ -0,0 +1,274 @@
+"""
+24-hour emission forecasts from online Holt-Winters state.
+
+Each (industry, pollutant) keeps a damped-trend additive Holt-Winters model
+over hourly means with a 24-slot daily season. The write path folds every
+persisted reading into its series in O(1): readings accumulate into the open
+hour, and when an hour closes its mean updates level, trend and season. The
+state is a few floats plus 24 packed seasonal terms in forecast_states, so
+a forecast reads five rows and never touches sensor_readings.
+
+Risk levels compare the forecast against the industry type's SafeLimit.
+"""
+import math
+import os
+import struct
+from datetime import timedelta
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+
+from limits import POLLUTANTS
+from models import db, Industry, ForecastState, ReadingRollup
+from rollups import bucket_start
+
+SEASON = 24          # hourly slots per day
+HORIZON = 24         # hours forecast
+ALPHA = 0.2          # level
+BETA = 0.05          # trend
+GAMMA = 0.2          # season
+PHI = 0.95           # trend damping, keeps 24-step extrapolation sane
+VARIANCE_DECAY = 0.1
+WARMUP_DAYS = int(os.getenv('FORECAST_WARMUP_DAYS', 14))
+
+HOUR = timedelta(hours=1)
+_SEASON_FORMAT = struct.Struct(f'<{SEASON}d')
+_COLUMNS = ('level', 'trend', 'variance', 'season', 'hours', 'bucket', 'bucket_sum', 'bucket_n')
+
+
+def _damped(h):
+    """Sum of PHI^1..PHI^h: how many trend steps an h-hour horizon carries."""
+    return PHI * (1 - PHI ** h) / (1 - PHI)
+
+
+class Series:
+    __slots__ = ('level', 'trend', 'variance', 'season', 'hours', 'bucket', 'bucket_sum', 'bucket_n')
+
+    def __init__(self):
+        self.level = None
+        self.trend = 0.0
+        self.variance = 0.0
+        self.season = [0.0] * SEASON
+        self.hours = 0
+        self.bucket = None
+        self.bucket_sum = 0.0
+        self.bucket_n = 0
+
+    @classmethod
+    def from_row(cls, row):
+        s = cls()
+        for name in _COLUMNS:
+            setattr(s, name, row[name])
+        s.season = list(_SEASON_FORMAT.unpack(row['season']))
+        return s
+
+    def to_row(self, industry_id, pollutant):
+        row = {name: getattr(self, name) for name in _COLUMNS}
+        row.update(industry_id=industry_id, pollutant=pollutant,
+                   season=_SEASON_FORMAT.pack(*self.season))
+        return row
+
+    # ── Updates ───────────────────────────────────────────────────────────────
+    def add(self, ts, value, n=1):
+        """
+        Fold `n` readings summing to `value` taken in the hour of `ts`. Returns
+        False for readings older than the open hour, which the model cannot revise.
+        """
+        hour = bucket_start(ts, 'hour')
+        if self.bucket is None:
+            self.bucket = hour
+        elif hour > self.bucket:
+            self._close()
+            self._skip(round((hour - self.bucket) / HOUR) - 1)
+            self.bucket, self.bucket_sum, self.bucket_n = hour, 0.0, 0
+        elif hour < self.bucket:
+            return False
+        self.bucket_sum += value
+        self.bucket_n += n
+        return True
+
+    def _close(self):
+        if not self.bucket_n:
+            return
+        y = self.bucket_sum / self.bucket_n
+        slot = self.bucket.hour
+        if self.hours < SEASON:
+            # First day: level is the running mean and each slot its offset from
+            # it, re-centred once the day is complete
+            self.level = y if self.level is None else self.level + (y - self.level) / (self.hours + 1)
+            self.season[slot] = y - self.level
+            if self.hours == SEASON - 1:
+                mean = sum(self.season) / SEASON
+                self.season = [v - mean for v in self.season]
+        else:
+            s = self.season[slot]
+            err = y - (self.level + PHI * self.trend + s)
+            self.variance = err * err if self.hours == SEASON else \
+                (1 - VARIANCE_DECAY) * self.variance + VARIANCE_DECAY * err * err
+            previous = self.level
+            self.level = ALPHA * (y - s) + (1 - ALPHA) * (previous + PHI * self.trend)
+            self.trend = BETA * (self.level - previous) + (1 - BETA) * PHI * self.trend
+            self.season[slot] = GAMMA * (y - self.level) + (1 - GAMMA) * s
+        self.hours += 1
+
+    def _skip(self, hours):
+        """Carry level and trend across `hours` with no readings."""
+        if hours > 0 and self.level is not None:
+            self.level += self.trend * _damped(hours)
+            self.trend *= PHI ** hours
+
+    # ── Forecast ──────────────────────────────────────────────────────────────
+    def forecast(self, horizon=HORIZON):
+        """[(hour, value, lower, upper)] for the `horizon` hours after the open one."""
+        level = self.level
+        if level is None:
+            if not self.bucket_n:
+                return []
+            level = self.bucket_sum / self.bucket_n  # first hour: flat at its running mean
+        sigma = math.sqrt(self.variance)
+        points = []
+        for h in range(1, horizon + 1):
+            ts = self.bucket + h * HOUR
+            # level is as of the last closed hour, one step behind the open bucket
+            value = level + self.trend * _damped(h + 1) + self.season[ts.hour]
+            spread = 1.96 * sigma * math.sqrt(1 + (h - 1) * ALPHA * ALPHA)
+            points.append((ts, max(value, 0.0), max(value - spread, 0.0), max(value + spread, 0.0)))
+        return points
+
+
+# ── Write side ────────────────────────────────────────────────────────────────
+def _load(keys):
+    """{(industry_id, pollutant): Series} for the stored keys, locked for update."""
+    if not keys:
+        return {}
+    table = ForecastState.__table__
+    rows = db.session.execute(
+        select(table)
+        .where(tuple_(table.c.industry_id, table.c.pollutant).in_(list(keys)))
+        .with_for_update()
+    ).mappings()
+    return {(r['industry_id'], r['pollutant']): Series.from_row(r) for r in rows}
+
+
+def _upsert_statement(dialect_name):
+    table = ForecastState.__table__
+    if dialect_name == 'postgresql':
+        stmt = postgresql.insert(table)
+    elif dialect_name == 'sqlite':
+        stmt = sqlite.insert(table)
+    else:
+        raise NotImplementedError(f'Forecasts need SQLite or PostgreSQL, not {dialect_name}')
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.industry_id, table.c.pollutant],
+        set_={name: stmt.excluded[name] for name in _COLUMNS},
+    )
+
+
+def _save(states):
+    if states:
+        db.session.execute(_upsert_statement(db.engine.dialect.name),
+                           [s.to_row(*key) for key, s in states.items()])
+
+
+def apply_readings(rows):
+    """Fold freshly inserted reading dicts into the forecast state (caller commits)."""
+    keys = {(r['industry_id'], p) for r in rows for p in POLLUTANTS if r.get(p) is not None}
+    if not keys:
+        return
+    states = _load(keys)
+    for key in keys - states.keys():
+        states[key] = Series()
+    for r in sorted(rows, key=lambda r: r['timestamp']):
+        for p in POLLUTANTS:
+            value = r.get(p)
+            if value is not None:
+                states[(r['industry_id'], p)].add(r['timestamp'], value)
+    _save(states)
+
+
+def rebuild(chunk_size=500):
+    """
+    Recompute every series from the hourly rollups of the last WARMUP_DAYS,
+    one chunk of industries per transaction. The newest bucket stays open so
+    live readings keep accumulating into it.
+    """
+    db.session.execute(ForecastState.__table__.delete())
+    db.session.commit()
+    latest = db.session.scalar(select(db.func.max(ReadingRollup.bucket))
+                               .where(ReadingRollup.resolution == 'hour'))
+    if latest is None:
+        return
+    since = latest - timedelta(days=WARMUP_DAYS)
+    industry_ids = db.session.scalars(select(Industry.id).order_by(Industry.id)).all()
+    for i in range(0, len(industry_ids), chunk_size):
+        chunk = industry_ids[i:i + chunk_size]
+        buckets = db.session.execute(
+            select(ReadingRollup)
+            .where(ReadingRollup.industry_id.in_(chunk),
+                   ReadingRollup.resolution == 'hour',
+                   ReadingRollup.bucket >= since)
+            .order_by(ReadingRollup.industry_id, ReadingRollup.bucket)
+        ).scalars()
+        states = {}
+        for b in buckets:
+            for p in POLLUTANTS:
+                n = getattr(b, f'{p}_n')
+                if n:
+                    states.setdefault((b.industry_id, p), Series()).add(b.bucket, getattr(b, f'{p}_sum'), n)
+        _save(states)
+        db.session.commit()
+
+
+# ── Read side ─────────────────────────────────────────────────────────────────
+def _risk(points, limit):
+    """'high' if the forecast crosses the limit, 'medium' if it comes within 80% or its band does."""
+    if limit is None or not points:
+        return None
+    peak = max(v for _, v, _, _ in points)
+    if peak >= limit:
+        return 'high'
+    if peak >= 0.8 * limit or max(u for _, _, _, u in points) >= limit:
+        return 'medium'
+    return 'low'
+
+
+RISK_ORDER = (None, 'low', 'medium', 'high')
+
+
+def industry_forecast(industry, limits, horizon=HORIZON):
+    """Forecast dict for every pollutant of `industry` that has state."""
+    table = ForecastState.__table__
+    rows = db.session.execute(select(table).where(table.c.industry_id == industry.id)).mappings()
+    series = {r['pollutant']: Series.from_row(r) for r in rows}
+
+    pollutants, overall, as_of = {}, None, None
+    for p in POLLUTANTS:
+        s = series.get(p)
+        points = s.forecast(horizon) if s else []
+        if not points:
+            continue
+        limit = getattr(limits, p) if limits else None
+        risk = _risk(points, limit)
+        peak = max(points, key=lambda pt: pt[1])
+        pollutants[p] = {
+            'limit': limit,
+            'risk_level': risk,
+            'hours_observed': s.hours,
+            'peak': round(peak[1], 2),
+            'peak_at': peak[0].isoformat(),
+            'hours_over_limit': sum(1 for pt in points if limit is not None and pt[1] >= limit),
+            'points': [{'timestamp': ts.isoformat(), 'value': round(v, 2),
+                        'lower': round(lo, 2), 'upper': round(hi, 2)}
+                       for ts, v, lo, hi in points],
+        }
+        if RISK_ORDER.index(risk) > RISK_ORDER.index(overall):
+            overall = risk
+        as_of = max(as_of, s.bucket) if as_of else s.bucket
+    return {
+        'industry_id': industry.id,
+        'industry_type': industry.industry_type,
+        'as_of': as_of.isoformat() if as_of else None,
+        'horizon_hours': horizon,
+        'risk_level': overall,
+        'pollutants': pollutants,
+    }
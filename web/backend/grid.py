@@ -0,0 +1,90 @@
+"""
+Fixed lat/lng grid used as the spatial index.
+
+The globe is cut into GRID_DEGREES cells numbered row-major from the south
+west corner, so a cell is one integer and the cells of a latitude band are
+a contiguous range. Industries and readings store their cell in an indexed
+column; a radius or bounding box becomes a handful of cell ranges (or an
+IN-list) that the database answers from the index, and exact distances are
+checked on the few candidates. Pure math, no database access.
+"""
+import math
+
+# Stored in the cell columns: changing it needs migration 0008's backfill re-run
+GRID_DEGREES = 0.05   # ~5.5 km at the equator
+ROWS = int(math.ceil(180 / GRID_DEGREES))
+COLS = int(math.ceil(360 / GRID_DEGREES))
+EARTH_RADIUS_KM = 6371.0088
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def _row(lat):
+    return min(max(int(math.floor((lat + 90) / GRID_DEGREES)), 0), ROWS - 1)
+
+
+def _col(lng):
+    return int(math.floor((lng + 180) / GRID_DEGREES)) % COLS
+
+
+def cell_of(lat, lng):
+    """Grid cell of a point, or None when either coordinate is missing."""
+    if lat is None or lng is None:
+        return None
+    return _row(lat) * COLS + _col(lng)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bbox_around(lat, lng, radius_km):
+    """(min_lat, min_lng, max_lat, max_lng) enclosing the circle."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    coslat = math.cos(math.radians(lat))
+    dlng = 180.0 if coslat < 1e-6 else min(180.0, dlat / coslat)
+    return max(lat - dlat, -90.0), max(lng - dlng, -180.0), min(lat + dlat, 90.0), min(lng + dlng, 180.0)
+
+
+def cell_ranges(min_lat, min_lng, max_lat, max_lng):
+    """[(first_cell, last_cell)] covering the box, one contiguous range per grid row."""
+    lo_col, hi_col = _col(min_lng), _col(max_lng) if max_lng < 180 else COLS - 1
+    return [(row * COLS + lo_col, row * COLS + hi_col)
+            for row in range(_row(min_lat), _row(max_lat) + 1)]
+
+
+def cells(ranges):
+    return [c for lo, hi in ranges for c in range(lo, hi + 1)]
+
+
+def cell_count(ranges):
+    return sum(hi - lo + 1 for lo, hi in ranges)
+
+
+# ── Map tiles ─────────────────────────────────────────────────────────────────
+def tile_bbox(z, x, y):
+    """(min_lat, min_lng, max_lat, max_lng) of a Web Mercator (slippy map) tile."""
+    n = 2 ** z
+
+    def lat(yy):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * yy / n))))
+
+    return lat(y + 1), x / n * 360 - 180, lat(y), (x + 1) / n * 360 - 180
+
+
+def tile_position(lat, lng, z):
+    """Fractional (x, y) tile coordinates of a point at zoom `z`."""
+    n = 2 ** z
+    lat = min(max(lat, -MAX_MERCATOR_LAT), MAX_MERCATOR_LAT)
+    rad = math.radians(lat)
+    return (lng + 180) / 360 * n, (1 - math.asinh(math.tan(rad)) / math.pi) / 2 * n
+
+
+def tile_positions(lat, lng, z):
+    """tile_position over NumPy arrays."""
+    import numpy as np
+    n = 2 ** z
+    rad = np.radians(np.clip(lat, -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    return (lng + 180) / 360 * n, (1 - np.arcsinh(np.tan(rad)) / math.pi) / 2 * n
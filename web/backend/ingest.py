@@ -0,0 +1,177 @@
+"""
+Bulk reading ingestion for real drones.
+
+A batch is NDJSON (one reading object per line) or a JSON array, optionally
+gzip-encoded. The whole batch is validated up front, violations are scored
+with one NumPy comparison against the SafeLimit vectors, and the rows go to
+the database through the same bulk write path as the group-commit writer.
+"""
+import json
+import math
+import os
+import zlib
+
+import numpy as np
+
+from models import db, Industry
+from limits import POLLUTANTS, registry as limit_registry
+from compliance import violation_mask, limit_rows
+from writer import persist
+from queries import parse_timestamp
+
+OPTIONAL_FIELDS = ('temperature', 'humidity', 'gps_lat', 'gps_lng')
+MAX_BATCH = 50000
+MAX_BATCH_BYTES = int(os.getenv('INGEST_MAX_BYTES', 32 * 1024 * 1024))   # after gunzip
+MAX_ERRORS = 50
+
+
+class BatchTooLarge(ValueError):
+    pass
+
+
+def _is_id(value):
+    # JSON true/false decode to bools, which are ints to isinstance()
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+# ── Parsing ───────────────────────────────────────────────────────────────────
+def parse_batch(body, content_type='', content_encoding=''):
+    """
+    Decode a request body into a list of reading objects. Raises
+    BatchTooLarge when the body, or what it inflates to, is over
+    MAX_BATCH_BYTES.
+    """
+    if len(body) > MAX_BATCH_BYTES:
+        raise BatchTooLarge(f'Batch exceeds {MAX_BATCH_BYTES} bytes')
+    if content_encoding == 'gzip':
+        inflate = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        try:
+            body = inflate.decompress(body, MAX_BATCH_BYTES + 1)
+        except zlib.error as e:
+            raise ValueError(f'Bad gzip data: {e}')
+        if len(body) > MAX_BATCH_BYTES:
+            raise BatchTooLarge(f'Batch exceeds {MAX_BATCH_BYTES} bytes uncompressed')
+    text = body.decode('utf-8')
+    if 'ndjson' in content_type or 'jsonlines' in content_type:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get('readings', [])
+    if not isinstance(data, list):
+        raise ValueError('Expected a JSON array of readings')
+    return data
+
+
+def _number(value):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError('must be a number')
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError('must be finite')
+    return value
+
+
+def validate(records, known_industries):
+    """
+    Returns (rows, errors). `rows` are insert-ready dicts; `errors` lists
+    {'index', 'error'} for the first MAX_ERRORS bad records.
+    """
+    rows, errors = [], []
+    for i, rec in enumerate(records):
+        try:
+            if not isinstance(rec, dict):
+                raise ValueError('reading must be an object')
+            industry_id = rec.get('industry_id')
+            if not _is_id(industry_id) or industry_id not in known_industries:
+                raise ValueError(f'unknown industry_id {industry_id!r}')
+            row = {'industry_id': industry_id}
+            for field in POLLUTANTS + OPTIONAL_FIELDS:
+                try:
+                    row[field] = _number(rec.get(field))
+                except ValueError as e:
+                    raise ValueError(f'{field} {e}')
+            for field in POLLUTANTS:
+                if row[field] is not None and row[field] < 0:
+                    raise ValueError(f'{field} must be non-negative')
+            if rec.get('timestamp'):
+                row['timestamp'] = parse_timestamp(rec['timestamp'])
+            rows.append(row)
+        except (ValueError, TypeError) as e:
+            if len(errors) < MAX_ERRORS:
+                errors.append({'index': i, 'error': str(e)})
+            else:
+                break
+    return rows, errors
+
+
+# ── Scoring ───────────────────────────────────────────────────────────────────
+def score_violations(rows, industry_types):
+    """Vectorised `is_violation` for a batch: any pollutant above its limit."""
+    values = np.array([[r[p] if r[p] is not None else np.nan for p in POLLUTANTS] for r in rows],
+                      dtype=np.float64).reshape(len(rows), len(POLLUTANTS))
+    return violation_mask(values, limit_rows(industry_types[r['industry_id']] for r in rows))
+
+
+# ── Entry point ───────────────────────────────────────────────────────────────
+def ingest(records):
+    """
+    Validate, score and insert a batch. Returns (result, payloads, errors):
+    the response body, one aggregated drone_update payload per industry, and
+    validation errors. Nothing is written when errors is non-empty.
+    """
+    ids = [rec.get('industry_id') for rec in records if isinstance(rec, dict)]
+    industries = {i: (name, itype) for i, name, itype in db.session.query(
+        Industry.id, Industry.name, Industry.industry_type).filter(
+        Industry.id.in_({i for i in ids if _is_id(i)})).all()}
+
+    rows, errors = validate(records, industries)
+    if errors:
+        return None, [], errors
+    if not rows:
+        return {'accepted': 0, 'violations': 0}, [], []
+
+    mask = score_violations(rows, {i: t for i, (_, t) in industries.items()})
+    for row, violation in zip(rows, mask.tolist()):
+        row['is_violation'] = violation
+
+    persist(rows)
+    db.session.commit()
+
+    result = {
+        'accepted': len(rows),
+        'violations': int(mask.sum()),
+        'first_id': rows[0]['id'],
+        'last_id': rows[-1]['id'],
+    }
+    return result, _update_payloads(rows, industries), []
+
+
+def _update_payloads(rows, industries):
+    per_industry = {}
+    for row in rows:
+        agg = per_industry.setdefault(row['industry_id'], {'count': 0, 'violations': 0, 'latest': row})
+        agg['count'] += 1
+        agg['violations'] += row['is_violation']
+        if row['timestamp'] >= agg['latest']['timestamp']:
+            agg['latest'] = row
+
+    payloads = []
+    for industry_id, agg in per_industry.items():
+        name, itype = industries[industry_id]
+        latest = agg['latest']
+        lim = limit_registry.get(itype)
+        payloads.append({
+            'reading_id': latest['id'],
+            'industry_id': industry_id,
+            'industry_name': name,
+            'industry_type': itype,
+            'state': 'uploading',
+            'timestamp': latest['timestamp'].isoformat(),
+            'is_violation': latest['is_violation'],
+            'limits': {p: getattr(lim, p) for p in POLLUTANTS} if lim else None,
+            'batch': {'count': agg['count'], 'violations': agg['violations']},
+            **{f: latest[f] for f in POLLUTANTS + ('temperature', 'humidity')},
+        })
+    return payloads
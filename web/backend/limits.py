@@ -0,0 +1,118 @@
+"""
+Process-wide SafeLimit registry.
+
+There are only a handful of limit rows, so they are loaded once into
+immutable per-type vectors and served from memory. Any ORM commit that
+inserts, updates or deletes a SafeLimit drops the cache; a TTL bounds how
+long another process can serve stale limits after a change it did not see.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, SafeLimit
+
+POLLUTANTS = ('pm25', 'pm10', 'no2', 'so2', 'co2')
+
+
+class LimitVector(namedtuple('LimitVector', ('industry_type',) + POLLUTANTS)):
+    __slots__ = ()
+
+    @property
+    def values(self):
+        return self[1:]
+
+    def as_dict(self):
+        return self._asdict()
+
+
+class LimitRegistry:
+    def __init__(self, ttl=300.0):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._by_type = None
+        self._matrix = None
+        self._loaded_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _snapshot(self):
+        by_type = self._by_type
+        if by_type is not None and time.monotonic() - self._loaded_at < self.ttl:
+            self.hits += 1
+            return by_type
+        with self._lock:
+            if self._by_type is None or time.monotonic() - self._loaded_at >= self.ttl:
+                self.misses += 1
+                self._load()
+            else:
+                self.hits += 1
+            return self._by_type
+
+    def _load(self):
+        by_type = {}
+        rows = db.session.execute(
+            db.select(SafeLimit.industry_type, *[getattr(SafeLimit, p) for p in POLLUTANTS])
+            .order_by(SafeLimit.id)
+        ).all()
+        for row in rows:
+            by_type.setdefault(row[0], LimitVector(*row))
+        types = sorted(by_type)
+        # Trailing +inf row: readings of types without limits never violate
+        matrix = np.array([by_type[t].values for t in types] + [[np.inf] * len(POLLUTANTS)],
+                          dtype=np.float64)
+        self._matrix = ({t: i for i, t in enumerate(types)}, matrix)
+        self._by_type = by_type
+        self._loaded_at = time.monotonic()
+
+    # ── Lookups ───────────────────────────────────────────────────────────────
+    def get(self, industry_type):
+        """LimitVector for a type, or None when no SafeLimit row exists."""
+        return self._snapshot().get(industry_type)
+
+    def all(self):
+        return dict(self._snapshot())
+
+    def matrix(self):
+        """(type -> row index, float64 matrix of limits). Unknown types map to the last row."""
+        self._snapshot()
+        return self._matrix
+
+    def invalidate(self):
+        with self._lock:
+            self._by_type = None
+            self.invalidations += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'invalidations': self.invalidations,
+                'types': len(self._by_type or {})}
+
+
+registry = LimitRegistry(ttl=float(os.getenv('LIMITS_TTL_SECONDS', 300)))
+
+
+# ── Invalidation ──────────────────────────────────────────────────────────────
+@event.listens_for(Session, 'before_flush')
+def _track_limit_changes(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, SafeLimit):
+            session.info['safe_limits_changed'] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    if session.info.pop('safe_limits_changed', False):
+        registry.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_on_rollback(session):
+    session.info.pop('safe_limits_changed', None)
@@ -0,0 +1,250 @@
+"""
+Prometheus metrics, served as text from GET /metrics.
+
+A small in-process registry (counters, gauges, histograms, and callback
+metrics read at scrape time) rather than a client library: the hot paths
+only bump a list slot under an uncontended lock, and everything derived
+from existing state (queue depth, cache hit counts) costs nothing until a
+scrape. `python -m bench.metrics` measures the overhead.
+
+init_app() adds per-request latency and SQL count/duration histograms for
+every Flask route; the subsystems record their own timings through the
+module-level metrics below. Set METRICS_ENABLED=0 to skip the request
+hooks and the endpoint.
+"""
+import bisect
+import os
+import threading
+import time
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+_metrics = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt_labels(names, values, extra=''):
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _fmt_value(v):
+    if v == float('inf'):
+        return '+Inf'
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, tuple(labels)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            values = dict(self._values)
+        for key, v in sorted(values.items()):
+            lines.append(f'{self.name}{_fmt_labels(self.labels, key)} {_fmt_value(v)}')
+        return lines
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float('inf'),), series):
+                cumulative += n
+                le = 'le="' + _fmt_value(bound) + '"'
+                lines.append(f'{self.name}_bucket{_fmt_labels(self.labels, key, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_fmt_labels(self.labels, key)} {_fmt_value(series[-1])}')
+            lines.append(f'{self.name}_count{_fmt_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 't0')
+
+    def __init__(self, histogram, labels):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.t0, *self.labels)
+
+
+class Callback(_Metric):
+    """Read at scrape time: `fn` returns a number or {label values tuple: number}."""
+
+    def __init__(self, name, help, fn, kind='gauge', labels=()):
+        super().__init__(name, help, labels)
+        self.kind, self.fn = kind, fn
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        lines = self._header()
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for key, v in sorted(items):
+            if v is not None:
+                lines.append(f'{self.name}{_fmt_labels(self.labels, key)} {_fmt_value(v)}')
+        return lines
+
+
+def render():
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+# ── Metrics ───────────────────────────────────────────────────────────────────
+REQUEST_SECONDS = Histogram('aerosense_http_request_duration_seconds',
+                            'HTTP request latency by route', ('method', 'route', 'status'))
+REQUEST_QUERIES = Histogram('aerosense_http_request_sql_queries',
+                            'SQL statements executed per HTTP request', ('route',), COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = Histogram('aerosense_http_request_sql_duration_seconds',
+                                'Time spent in SQL per HTTP request', ('route',))
+SQL_QUERIES = Counter('aerosense_sql_queries_total', 'SQL statements executed, all threads')
+SQL_SECONDS = Counter('aerosense_sql_duration_seconds_total', 'Time spent in SQL, all threads')
+
+SOCKET_CLIENTS = Gauge('aerosense_socketio_connected_clients', 'Connected Socket.IO clients')
+SOCKET_EMITS = Counter('aerosense_socketio_emits_total', 'Socket.IO emits by event', ('event',))
+
+SIM_LAG = Histogram('aerosense_simulation_lag_seconds',
+                    'How late drone steps ran after they were due',
+                    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+SIM_DROPPED = Counter('aerosense_simulation_dropped_readings_total',
+                      'Simulated readings dropped because the writer queue stayed full')
+WRITER_FLUSH_SECONDS = Histogram('aerosense_writer_flush_duration_seconds',
+                                 'Group-commit writer batch insert + commit time')
+WRITER_BATCH_ROWS = Histogram('aerosense_writer_batch_rows', 'Readings per writer batch',
+                              buckets=(1, 5, 10, 50, 100, 250, 500, 1000))
+PDF_RENDER_SECONDS = Histogram('aerosense_pdf_render_seconds',
+                               'Notice PDF render time (cache misses only)')
+EMAIL_SEND_SECONDS = Histogram('aerosense_email_send_seconds', 'Outbox time per message',
+                               ('mode', 'outcome'))
+EMAIL_JOBS = Counter('aerosense_email_jobs_total', 'Outbox jobs by outcome', ('outcome',))
+
+
+# ── Flask wiring ──────────────────────────────────────────────────────────────
+_request = threading.local()
+_flask_request = None  # flask.request, bound by init_app (flask stays out of PDF workers)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_t0', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_t0'].pop()
+    SQL_QUERIES.inc()
+    SQL_SECONDS.inc(amount=elapsed)
+    if getattr(_request, 'active', False):
+        _request.queries += 1
+        _request.sql += elapsed
+
+
+def _start_request():
+    _request.active = True
+    _request.queries = 0
+    _request.sql = 0.0
+    _request.t0 = time.perf_counter()
+
+
+def _finish_request(response):
+    request = _flask_request
+    if getattr(_request, 'active', False):
+        _request.active = False
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - _request.t0,
+                                request.method, route, str(response.status_code))
+        REQUEST_QUERIES.observe(_request.queries, route)
+        REQUEST_SQL_SECONDS.observe(_request.sql, route)
+    return response
+
+
+def _reset_request(exc):
+    _request.active = False
+
+
+def init_app(app):
+    if os.getenv('METRICS_ENABLED', '1') == '0':
+        return
+    global _flask_request
+    from flask import Response, request
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    _flask_request = request
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_reset_request)
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return Response(render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,227 @@
+"""
+Versioned schema migrations on top of models.py.
+
+`db.create_all()` only creates missing tables; it never adds indexes or
+backfills to a database that already exists. Each migration here runs once,
+is recorded in schema_migrations, and is written to be safe to re-run against
+SQLite and PostgreSQL databases created by older versions of the app.
+
+    python migrations.py upgrade   # apply pending migrations
+    python migrations.py status    # list applied / pending versions
+    python migrations.py check     # EXPLAIN the hot routes, fail on full scans
+"""
+import json
+import sys
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import Integer, bindparam, cast, func, inspect, select, text
+from sqlalchemy.schema import CreateIndex
+
+from models import (db, Industry, SensorReading, ReadingRollup, EmailJob, ForecastState,
+                    AnomalyState, Anomaly, SchemaMigration)
+
+Migration = namedtuple('Migration', 'version description apply transactional')
+
+PG_LOCK_KEY = 7301  # advisory lock serialising concurrent upgrades
+
+
+# ── Helpers ───────────────────────────────────────────────────────────────────
+def _create_index(conn, index):
+    """CREATE INDEX IF NOT EXISTS; CONCURRENTLY on PostgreSQL so writers keep going."""
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+    if conn.dialect.name == 'postgresql':
+        ddl = ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+    conn.exec_driver_sql(ddl)
+
+
+def _indexes(table, *names):
+    """
+    The named indexes of `table`. Migrations name the indexes they own
+    rather than iterating the table's metadata, which also holds indexes
+    that later migrations add on columns an older schema does not have yet.
+    """
+    by_name = {ix.name: ix for ix in table.indexes}
+    return [by_name[n] for n in names]
+
+
+# ── Migrations ────────────────────────────────────────────────────────────────
+def _baseline(conn):
+    db.metadata.create_all(conn)
+
+
+def _industry_summaries(conn):
+    # rebuild() commits through the session, hence non-transactional below
+    from summary import rebuild
+    rebuild()
+
+
+def _sensor_reading_indexes(conn):
+    for index in _indexes(SensorReading.__table__, 'ix_sensor_readings_industry_ts',
+                          'ix_sensor_readings_violation_ts', 'ix_sensor_readings_industry_violation'):
+        _create_index(conn, index)
+
+
+def _reading_rollups(conn):
+    ReadingRollup.__table__.create(conn, checkfirst=True)
+    from rollups import rebuild
+    rebuild()
+
+
+def _email_outbox(conn):
+    EmailJob.__table__.create(conn, checkfirst=True)
+
+
+def _forecast_states(conn):
+    ForecastState.__table__.create(conn, checkfirst=True)
+    from forecast import rebuild
+    rebuild()
+
+
+def _anomalies(conn):
+    AnomalyState.__table__.create(conn, checkfirst=True)
+    Anomaly.__table__.create(conn, checkfirst=True)
+
+
+def _grid_cells(conn):
+    # Cell columns for the spatial index, backfilled in id chunks so a large
+    # sensor_readings table is never locked in one transaction
+    from grid import GRID_DEGREES, ROWS, COLS, cell_of
+    for table, lat, lng in ((Industry.__table__, 'lat', 'lng'),
+                            (SensorReading.__table__, 'gps_lat', 'gps_lng')):
+        if 'cell' not in {c['name'] for c in inspect(conn).get_columns(table.name)}:
+            conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN cell INTEGER')
+
+    rows = conn.execute(select(Industry.id, Industry.lat, Industry.lng).where(Industry.cell.is_(None))).all()
+    if rows:
+        conn.execute(Industry.__table__.update().where(Industry.id == bindparam('b_id'))
+                     .values(cell=bindparam('b_cell')),
+                     [{'b_id': i, 'b_cell': cell_of(lat, lng)} for i, lat, lng in rows])
+
+    t = SensorReading.__table__
+    if conn.dialect.name == 'postgresql':
+        row = func.least(func.floor((t.c.gps_lat + 90) / GRID_DEGREES), ROWS - 1)
+        col = func.mod(func.floor((t.c.gps_lng + 180) / GRID_DEGREES), COLS)
+        cell = cast(row * COLS + col, Integer)
+    else:
+        # Both offsets are non-negative, so truncation is floor
+        row = func.min(cast((t.c.gps_lat + 90) / GRID_DEGREES, Integer), ROWS - 1)
+        col = cast((t.c.gps_lng + 180) / GRID_DEGREES, Integer) % COLS
+        cell = row * COLS + col
+    max_id = conn.execute(select(func.max(t.c.id))).scalar() or 0
+    for lo in range(0, max_id, 100000):
+        conn.execute(t.update()
+                     .where(t.c.id > lo, t.c.id <= lo + 100000, t.c.cell.is_(None),
+                            t.c.gps_lat.isnot(None), t.c.gps_lng.isnot(None))
+                     .values(cell=cell))
+    for index in (*_indexes(Industry.__table__, 'ix_industries_cell'),
+                  *_indexes(t, 'ix_sensor_readings_cell_ts')):
+        _create_index(conn, index)
+
+
+MIGRATIONS = [
+    Migration('0001_baseline', 'create missing tables', _baseline, True),
+    Migration('0002_industry_summaries', 'backfill industry rollup', _industry_summaries, False),
+    Migration('0003_sensor_reading_indexes', 'time-series and violation indexes',
+              _sensor_reading_indexes, False),
+    Migration('0004_reading_rollups', 'minute/hour/day rollups', _reading_rollups, False),
+    Migration('0005_email_outbox', 'notice email outbox', _email_outbox, True),
+    Migration('0006_forecast_states', 'forecast state from hourly rollups', _forecast_states, False),
+    Migration('0007_anomalies', 'anomaly detector state and flags', _anomalies, True),
+    Migration('0008_grid_cells', 'spatial grid cells and indexes', _grid_cells, False),
+]
+
+
+# ── Runner ────────────────────────────────────────────────────────────────────
+def applied_versions():
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    return {m.version for m in SchemaMigration.query.all()}
+
+
+def pending():
+    done = applied_versions()
+    return [m for m in MIGRATIONS if m.version not in done]
+
+
+def upgrade():
+    """Apply pending migrations in order. Must run inside an app context."""
+    lock = db.engine.connect() if db.engine.dialect.name == 'postgresql' else None
+    if lock is not None:
+        lock.execute(text('SELECT pg_advisory_lock(:k)'), {'k': PG_LOCK_KEY})
+    try:
+        for m in pending():
+            if m.transactional:
+                with db.engine.begin() as conn:
+                    m.apply(conn)
+            else:
+                with db.engine.connect() as conn:
+                    m.apply(conn.execution_options(isolation_level='AUTOCOMMIT'))
+            db.session.add(SchemaMigration(version=m.version, applied_at=datetime.utcnow()))
+            db.session.commit()
+            print(f'[MIGRATE] Applied {m.version} ({m.description})')
+    finally:
+        if lock is not None:
+            lock.execute(text('SELECT pg_advisory_unlock(:k)'), {'k': PG_LOCK_KEY})
+            lock.close()
+
+
+# ── Query-plan check ──────────────────────────────────────────────────────────
+def _sqlite_plan(conn, sql):
+    rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + sql).all()
+    details = [r[-1] for r in rows]
+    ok = all(('USING' in d) for d in details if 'sensor_readings' in d) \
+        and not any('TEMP B-TREE' in d for d in details)
+    return ok, details
+
+
+def _pg_plan(conn, sql):
+    conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = conn.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + sql).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes, stack = [], [plan[0]['Plan']]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.get('Plans', []))
+    details = [f"{n['Node Type']} {n.get('Index Name', n.get('Relation Name', ''))}".strip()
+               for n in nodes]
+    ok = not any(n['Node Type'] == 'Seq Scan' and n.get('Relation Name') == 'sensor_readings'
+                 for n in nodes) and not any(n['Node Type'] == 'Sort' for n in nodes)
+    return ok, details
+
+
+def check_query_plans():
+    """Returns [(route, ok, plan lines)] for every entry in queries.HOT_QUERIES."""
+    from queries import HOT_QUERIES
+    explain = _pg_plan if db.engine.dialect.name == 'postgresql' else _sqlite_plan
+    results = []
+    with db.engine.begin() as conn:
+        for route, build in HOT_QUERIES:
+            sql = str(build().statement.compile(dialect=conn.dialect,
+                                                compile_kwargs={'literal_binds': True}))
+            ok, details = explain(conn, sql)
+            results.append((route, ok, details))
+    return results
+
+
+if __name__ == '__main__':
+    from app import app
+
+    cmd = sys.argv[1] if len(sys.argv) > 1 else 'upgrade'
+    with app.app_context():
+        if cmd == 'upgrade':
+            upgrade()
+        elif cmd == 'status':
+            done = applied_versions()
+            for m in MIGRATIONS:
+                print(f"{'applied' if m.version in done else 'pending':>8}  {m.version}  {m.description}")
+        elif cmd == 'check':
+            failed = False
+            for route, ok, details in check_query_plans():
+                failed |= not ok
+                print(f"{'OK ' if ok else 'FAIL'} {route:<22} {' | '.join(details)}")
+            sys.exit(1 if failed else 0)
+        else:
+            print(f'Unknown command: {cmd}')
+            sys.exit(2)
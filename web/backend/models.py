@@ -1,9 +1,20 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 from datetime import datetime
 
+from grid import cell_of
+
 db = SQLAlchemy()
 
 
+def _cell_default(lat_column, lng_column):
+    """Column default computing the grid cell from the row's coordinates (Core inserts too)."""
+    def default(context):
+        params = context.get_current_parameters()
+        return cell_of(params.get(lat_column), params.get(lng_column))
+    return default
+
+
 class User(db.Model):
     __tablename__ = 'users'
     id = db.Column(db.Integer, primary_key=True)
@@ -22,10 +33,16 @@ class Industry(db.Model):
     contact_email = db.Column(db.String(120))
     lat = db.Column(db.Float, default=20.5937)
     lng = db.Column(db.Float, default=78.9629)
+    cell = db.Column(db.Integer, default=_cell_default('lat', 'lng'), index=True)   # grid.cell_of(lat, lng)
     readings = db.relationship('SensorReading', backref='industry', lazy=True)
     comments = db.relationship('AdminComment', backref='industry', lazy=True)
 
 
+@event.listens_for(Industry, 'before_update')
+def _move_industry_cell(mapper, connection, target):
+    target.cell = cell_of(target.lat, target.lng)
+
+
 class SafeLimit(db.Model):
     __tablename__ = 'safe_limits'
     id = db.Column(db.Integer, primary_key=True)
@@ -50,10 +67,24 @@ class SensorReading(db.Model):
     humidity = db.Column(db.Float)
     gps_lat = db.Column(db.Float)
     gps_lng = db.Column(db.Float)
+    cell = db.Column(db.Integer, default=_cell_default('gps_lat', 'gps_lng'))   # grid.cell_of(gps)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     is_violation = db.Column(db.Boolean, default=False)
 
 
+# Time-series access paths: per-industry latest/history scans, readings by
+# grid cell, and the violation feed. The partial indexes only cover
+# violating rows.
+db.Index('ix_sensor_readings_industry_ts', SensorReading.industry_id, SensorReading.timestamp)
+db.Index('ix_sensor_readings_violation_ts', SensorReading.timestamp,
+         sqlite_where=SensorReading.is_violation == db.true(),
+         postgresql_where=SensorReading.is_violation == db.true())
+db.Index('ix_sensor_readings_cell_ts', SensorReading.cell, SensorReading.timestamp)
+db.Index('ix_sensor_readings_industry_violation', SensorReading.industry_id,
+         sqlite_where=SensorReading.is_violation == db.true(),
+         postgresql_where=SensorReading.is_violation == db.true())
+
+
 class AdminComment(db.Model):
     __tablename__ = 'admin_comments'
     id = db.Column(db.Integer, primary_key=True)
@@ -63,3 +94,111 @@ class AdminComment(db.Model):
     action = db.Column(db.String(80))   # Notice Issued, Fine Imposed, Closed
     officer = db.Column(db.String(120))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class IndustrySummary(db.Model):
+    """Per-industry rollup maintained by the reading write path."""
+    __tablename__ = 'industry_summaries'
+    industry_id = db.Column(db.Integer, db.ForeignKey('industries.id'), primary_key=True)
+    latest_reading_id = db.Column(db.Integer, db.ForeignKey('sensor_readings.id'), nullable=True)
+    last_reading_at = db.Column(db.DateTime)
+    violations_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ReadingRollup(db.Model):
+    """Per-industry minute/hour/day aggregates of sensor_readings."""
+    __tablename__ = 'reading_rollups'
+    industry_id = db.Column(db.Integer, db.ForeignKey('industries.id'), primary_key=True)
+    resolution = db.Column(db.String(8), primary_key=True)   # minute, hour, day
+    bucket = db.Column(db.DateTime, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    violations = db.Column(db.Integer, nullable=False, default=0)
+    pm25_min = db.Column(db.Float)
+    pm25_max = db.Column(db.Float)
+    pm25_sum = db.Column(db.Float)
+    pm25_n = db.Column(db.Integer)
+    pm10_min = db.Column(db.Float)
+    pm10_max = db.Column(db.Float)
+    pm10_sum = db.Column(db.Float)
+    pm10_n = db.Column(db.Integer)
+    no2_min = db.Column(db.Float)
+    no2_max = db.Column(db.Float)
+    no2_sum = db.Column(db.Float)
+    no2_n = db.Column(db.Integer)
+    so2_min = db.Column(db.Float)
+    so2_max = db.Column(db.Float)
+    so2_sum = db.Column(db.Float)
+    so2_n = db.Column(db.Integer)
+    co2_min = db.Column(db.Float)
+    co2_max = db.Column(db.Float)
+    co2_sum = db.Column(db.Float)
+    co2_n = db.Column(db.Integer)
+
+
+class ForecastState(db.Model):
+    """Online Holt-Winters state for one industry pollutant, hourly with daily seasonality."""
+    __tablename__ = 'forecast_states'
+    industry_id = db.Column(db.Integer, db.ForeignKey('industries.id'), primary_key=True)
+    pollutant = db.Column(db.String(8), primary_key=True)
+    level = db.Column(db.Float)
+    trend = db.Column(db.Float, nullable=False, default=0.0)
+    variance = db.Column(db.Float, nullable=False, default=0.0)
+    season = db.Column(db.LargeBinary, nullable=False)   # 24 little-endian float64s
+    hours = db.Column(db.Integer, nullable=False, default=0)   # closed hourly buckets seen
+    bucket = db.Column(db.DateTime)                       # the hour still accumulating
+    bucket_sum = db.Column(db.Float, nullable=False, default=0.0)
+    bucket_n = db.Column(db.Integer, nullable=False, default=0)
+
+
+class AnomalyState(db.Model):
+    """Exponentially weighted mean/variance for one industry pollutant."""
+    __tablename__ = 'anomaly_states'
+    industry_id = db.Column(db.Integer, db.ForeignKey('industries.id'), primary_key=True)
+    pollutant = db.Column(db.String(8), primary_key=True)
+    n = db.Column(db.Integer, nullable=False, default=0)
+    mean = db.Column(db.Float, nullable=False, default=0.0)
+    variance = db.Column(db.Float, nullable=False, default=0.0)
+    last = db.Column(db.Float)
+    repeats = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Anomaly(db.Model):
+    """A reading value the streaming detector flagged."""
+    __tablename__ = 'anomalies'
+    id = db.Column(db.Integer, primary_key=True)
+    reading_id = db.Column(db.Integer, nullable=False)  # no FK: readings get archived
+    industry_id = db.Column(db.Integer, db.ForeignKey('industries.id'), nullable=False)
+    pollutant = db.Column(db.String(8), nullable=False)
+    kind = db.Column(db.String(8), nullable=False)      # spike, drop, stuck
+    value = db.Column(db.Float, nullable=False)
+    expected = db.Column(db.Float)
+    score = db.Column(db.Float)
+    timestamp = db.Column(db.DateTime, nullable=False)
+
+
+db.Index('ix_anomalies_ts', Anomaly.timestamp, Anomaly.id)
+db.Index('ix_anomalies_industry_ts', Anomaly.industry_id, Anomaly.timestamp)
+
+
+class EmailJob(db.Model):
+    """Outbox row for a notice email, sent by the background dispatcher."""
+    __tablename__ = 'email_outbox'
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(200), nullable=False)
+    payload = db.Column(db.Text, nullable=False)   # JSON notice data
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, sending, sent, failed
+    mode = db.Column(db.String(8))                  # smtp, demo
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+
+db.Index('ix_email_outbox_due', EmailJob.status, EmailJob.next_attempt_at)
+
+
+class SchemaMigration(db.Model):
+    __tablename__ = 'schema_migrations'
+    version = db.Column(db.String(80), primary_key=True)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,265 @@
+"""
+Notice email outbox.
+
+`/api/send-notice` only inserts an EmailJob row; a background dispatcher
+claims due jobs in batches and sends them over a small pool of
+authenticated SMTP sessions that stay open between batches. A failed send
+is retried with exponential backoff until OUTBOX_MAX_ATTEMPTS, then the job
+is marked failed. Jobs left in `sending` by a crash are re-queued on start,
+so delivery is at-least-once.
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from models import db, EmailJob
+from email_service import smtp_settings, connect_smtp, build_message, _demo_log
+from metrics import EMAIL_JOBS, EMAIL_SEND_SECONDS
+
+dispatcher = None
+
+
+# ── Producer side ─────────────────────────────────────────────────────────────
+def delivery_mode():
+    settings = dispatcher.settings if dispatcher else smtp_settings()
+    return 'smtp' if settings else 'demo'
+
+
+def enqueue(to_email, data):
+    """Add a notice to the outbox (caller commits) and return the job."""
+    job = EmailJob(to_email=to_email, payload=json.dumps(data), mode=delivery_mode(),
+                   status='queued', next_attempt_at=datetime.utcnow())
+    db.session.add(job)
+    return job
+
+
+def job_dict(job):
+    return {
+        'id': job.id,
+        'to_email': job.to_email,
+        'status': job.status,
+        'mode': job.mode,
+        'attempts': job.attempts,
+        'last_error': job.last_error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'next_attempt_at': job.next_attempt_at.isoformat() if job.next_attempt_at else None,
+        'sent_at': job.sent_at.isoformat() if job.sent_at else None,
+    }
+
+
+# ── SMTP session pool ─────────────────────────────────────────────────────────
+class SmtpPool:
+    """Up to `size` open, logged-in SMTP sessions reused across batches."""
+
+    def __init__(self, settings, size=2, max_idle=60.0):
+        self.settings = settings
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue(maxsize=size)
+        self.opened = 0
+
+    def acquire(self):
+        import smtplib
+
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                self.opened += 1
+                return connect_smtp(self.settings)
+            if time.monotonic() - last_used < self.max_idle:
+                try:
+                    if server.noop()[0] == 250:
+                        return server
+                except smtplib.SMTPException:
+                    pass
+            self.discard(server)
+
+    def release(self, server):
+        try:
+            self._idle.put_nowait((server, time.monotonic()))
+        except queue.Full:
+            self.discard(server)
+
+    @staticmethod
+    def discard(server):
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                self.discard(self._idle.get_nowait()[0])
+            except queue.Empty:
+                return
+
+
+# ── Dispatcher ────────────────────────────────────────────────────────────────
+class OutboxDispatcher:
+    def __init__(self, app, batch_size=20, poll_interval=2.0, pool_size=2,
+                 max_attempts=5, backoff_base=10.0, settings=None):
+        self.app = app
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.pool_size = pool_size
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.settings = settings if settings is not None else smtp_settings()
+        self.pool = SmtpPool(self.settings, pool_size) if self.settings else None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self):
+        with self.app.app_context():
+            # Anything a previous process was sending when it died goes again
+            db.session.execute(update(EmailJob).where(EmailJob.status == 'sending')
+                               .values(status='queued'))
+            db.session.commit()
+            db.session.remove()
+        self._thread = threading.Thread(target=self._run, name='email-outbox', daemon=True)
+        self._thread.start()
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+        if self.pool:
+            self.pool.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    sent = self.dispatch_once()
+                    db.session.remove()
+            except Exception as e:
+                print(f'[OUTBOX] Dispatch failed: {e}')
+                sent = 0
+            if sent < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def _claim(self):
+        ids = db.session.scalars(
+            select(EmailJob.id)
+            .where(EmailJob.status == 'queued', EmailJob.next_attempt_at <= datetime.utcnow())
+            .order_by(EmailJob.id)
+            .limit(self.batch_size)
+        ).all()
+        if not ids:
+            return []
+        # Only rows still queued are ours if another dispatcher got there first
+        claimed = db.session.scalars(
+            update(EmailJob)
+            .where(EmailJob.id.in_(ids), EmailJob.status == 'queued')
+            .values(status='sending')
+            .returning(EmailJob.id)
+        ).all()
+        db.session.commit()
+        return db.session.scalars(select(EmailJob).where(EmailJob.id.in_(claimed))
+                                  .order_by(EmailJob.id)).all()
+
+    def dispatch_once(self):
+        """Claim and send one batch; returns how many jobs were claimed."""
+        jobs = self._claim()
+        if not jobs:
+            return 0
+        work = [(job.id, job.to_email, json.loads(job.payload)) for job in jobs]
+        chunks = [work[i::self.pool_size] for i in range(self.pool_size) if work[i::self.pool_size]]
+        with ThreadPoolExecutor(len(chunks)) as ex:
+            outcomes = [o for chunk in ex.map(self._send_chunk, chunks) for o in chunk]
+
+        now = datetime.utcnow()
+        by_id = {job.id: job for job in jobs}
+        for job_id, error in outcomes:
+            job = by_id[job_id]
+            job.attempts += 1
+            job.mode = 'smtp' if self.pool else 'demo'
+            if error is None:
+                job.status, job.sent_at, job.last_error = 'sent', now, None
+                self.sent += 1
+            elif job.attempts >= self.max_attempts:
+                job.status, job.last_error = 'failed', error
+                self.failed += 1
+            else:
+                delay = self.backoff_base * 2 ** (job.attempts - 1) * random.uniform(0.8, 1.2)
+                job.status, job.last_error = 'queued', error
+                job.next_attempt_at = now + timedelta(seconds=delay)
+                self.retried += 1
+            EMAIL_JOBS.inc(job.status if job.status != 'queued' else 'retried')
+        db.session.commit()
+        return len(jobs)
+
+    def _send_chunk(self, chunk):
+        """Send a chunk over one pooled session: [(job_id, error or None)]."""
+        import smtplib
+
+        outcomes = []
+        server = None
+        for job_id, to_email, data in chunk:
+            t0 = time.perf_counter()
+            if self.pool is None:
+                _demo_log(to_email, data)
+                outcomes.append((job_id, None))
+                EMAIL_SEND_SECONDS.observe(time.perf_counter() - t0, 'demo', 'sent')
+                continue
+            try:
+                if server is None:
+                    server = self.pool.acquire()
+                msg = build_message(to_email, data, self.settings['sender'])
+                server.sendmail(self.settings['sender'], to_email, msg.as_string())
+                outcomes.append((job_id, None))
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError,
+                    smtplib.SMTPSenderRefused) as e:
+                # The session is still usable; only this message failed
+                outcomes.append((job_id, f'{type(e).__name__}: {e}'))
+            except Exception as e:
+                outcomes.append((job_id, f'{type(e).__name__}: {e}'))
+                if server is not None:
+                    self.pool.discard(server)
+                    server = None
+            EMAIL_SEND_SECONDS.observe(time.perf_counter() - t0, 'smtp',
+                                       'sent' if outcomes[-1][1] is None else 'error')
+        if server is not None:
+            self.pool.release(server)
+        return outcomes
+
+    def stats(self):
+        return {'sent': self.sent, 'retried': self.retried, 'failed': self.failed,
+                'smtp_sessions_opened': self.pool.opened if self.pool else 0}
+
+
+def start_dispatcher(app):
+    global dispatcher
+    dispatcher = OutboxDispatcher(
+        app,
+        batch_size=int(os.getenv('OUTBOX_BATCH_SIZE', 20)),
+        poll_interval=float(os.getenv('OUTBOX_POLL_SECONDS', 2)),
+        pool_size=int(os.getenv('OUTBOX_SMTP_POOL', 2)),
+        max_attempts=int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5)),
+        backoff_base=float(os.getenv('OUTBOX_BACKOFF_SECONDS', 10)),
+    ).start()
+    atexit.register(dispatcher.stop)
+    return dispatcher
+
+
+def get_dispatcher():
+    return dispatcher
@@ -0,0 +1,258 @@
+"""
+Per-request SQL profiler and N+1 detector.
+
+With QUERY_PROFILE=1 every statement a request executes is recorded from
+SQLAlchemy's cursor events. Statements are reduced to their shape (literals
+and IN-lists collapsed), and a shape repeated QUERY_REPEAT_THRESHOLD times
+in one request is reported as an N+1 candidate. Each profiled response gets
+X-Query-Count and a Server-Timing entry, and anything with repeats or over
+budget is logged as [QUERIES].
+
+QUERY_BUDGETS caps the statements per endpoint. Over budget is logged, or
+raised as QueryBudgetExceeded with QUERY_BUDGET_STRICT=1 (or app.testing),
+so a regression fails the request that introduced it.
+
+    python profiler.py check     # GET every api route on the configured DB,
+                                 # exit 1 on a budget or N+1 failure
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Statements per request, by endpoint. Response-cache hits run none; these
+# are the cost of a miss.
+QUERY_BUDGETS = {
+    'api.login': 1,
+    'api.get_industries': 2,
+    'api.get_industry': 3,
+    'api.get_live': 3,
+    'api.get_history': 1,
+    'api.get_forecast': 2,
+    'api.ingest_readings': 13,
+    'api.get_industries_nearby': 1,
+    'api.get_readings_nearby': 2,
+    'api.get_violation_tile': 2,
+    'api.get_limit_cache_stats': 0,
+    'api.get_safe_limits': 1,
+    'api.get_violations': 2,
+    'api.get_anomalies': 1,
+    'api.export_readings': 1,
+    'api.add_comment': 2,
+    'api.get_comments': 1,
+    'api.send_notice': 4,
+    'api.get_notice_status': 1,
+    'api.start_enforcement_run': 0,
+    'api.get_enforcement_run': 0,
+    'api.download_pdf': 3,
+}
+REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', 3))
+
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|:\w+|'[^']*'|-?\d+(?:\.\d+)?)"
+_LIST = re.compile(r'\(\s*' + _PLACEHOLDER + r'(?:\s*,\s*' + _PLACEHOLDER + r')+\s*\)')
+_LITERAL = re.compile(r"'[^']*'|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r'\s+')
+
+_state = threading.local()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def shape(statement):
+    """The statement with literals and value lists collapsed, for grouping."""
+    s = _LIST.sub('(…)', statement)
+    s = _LITERAL.sub('?', s)
+    return _SPACE.sub(' ', s).strip()
+
+
+class QueryLog:
+    def __init__(self):
+        self.statements = []  # (sql, seconds, batched)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    @property
+    def seconds(self):
+        return sum(s for _, s, _ in self.statements)
+
+    def repeated(self, threshold=None):
+        """[(count, shape)] for shapes run at least `threshold` times, most first."""
+        threshold = threshold or REPEAT_THRESHOLD
+        # Multi-row INSERT batches repeat by design; a row-at-a-time insert does not
+        shapes = Counter(shape(sql) for sql, _, batched in self.statements if not batched)
+        return [(n, s) for s, n in shapes.most_common() if n >= threshold]
+
+    def summary(self, budget=None):
+        return {
+            'queries': self.count,
+            'sql_ms': round(self.seconds * 1000, 2),
+            'budget': budget,
+            'repeated': [{'count': n, 'statement': s[:200]} for n, s in self.repeated()],
+        }
+
+
+# ── Engine hooks ──────────────────────────────────────────────────────────────
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if getattr(_state, 'logs', None):
+        conn.info.setdefault('profiler_t0', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    logs = getattr(_state, 'logs', None)
+    if logs and conn.info.get('profiler_t0'):
+        entry = (statement, time.perf_counter() - conn.info['profiler_t0'].pop(),
+                 executemany and '), (' in statement)
+        for log in logs:
+            log.statements.append(entry)
+
+
+_hooked = False
+
+
+def _hook_engine():
+    global _hooked
+    if not _hooked:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        _hooked = True
+
+
+@contextmanager
+def record():
+    """Collect the statements this thread executes inside the block into a QueryLog."""
+    _hook_engine()
+    log = QueryLog()
+    if getattr(_state, 'logs', None) is None:
+        _state.logs = []
+    _state.logs.append(log)
+    try:
+        yield log
+    finally:
+        _state.logs.remove(log)
+
+
+@contextmanager
+def assert_max_queries(n, allow_repeats=False):
+    """Raise QueryBudgetExceeded if the block runs more than `n` statements (or an N+1)."""
+    with record() as log:
+        yield log
+    problems = []
+    if log.count > n:
+        problems.append(f'{log.count} queries, budget {n}')
+    if not allow_repeats and log.repeated():
+        problems.append('repeated: ' + '; '.join(f'{c}x {s[:120]}' for c, s in log.repeated()))
+    if problems:
+        raise QueryBudgetExceeded(', '.join(problems))
+
+
+# ── Flask wiring ──────────────────────────────────────────────────────────────
+def init_app(app):
+    if os.getenv('QUERY_PROFILE', '0') != '1':
+        return
+    from flask import g, request
+
+    strict = os.getenv('QUERY_BUDGET_STRICT', '0') == '1'
+
+    @app.before_request
+    def _start_profile():
+        g.query_log_cm = record()
+        g.query_log = g.query_log_cm.__enter__()
+
+    @app.after_request
+    def _finish_profile(response):
+        cm = g.pop('query_log_cm', None)
+        if cm is None:
+            return response
+        cm.__exit__(None, None, None)
+        log = g.pop('query_log')
+        budget = QUERY_BUDGETS.get(request.endpoint)
+        summary = log.summary(budget)
+        response.headers['X-Query-Count'] = str(log.count)
+        response.headers.add('Server-Timing', f'db;dur={summary["sql_ms"]};desc="{log.count} queries"')
+        over = budget is not None and log.count > budget
+        if over or summary['repeated']:
+            repeats = '; '.join(f"{r['count']}x {r['statement'][:120]}" for r in summary['repeated'])
+            print(f"[QUERIES] {request.method} {request.path}: {log.count} queries "
+                  f"({summary['sql_ms']} ms, budget {budget})" + (f' N+1: {repeats}' if repeats else ''))
+        if over and (strict or app.testing):
+            raise QueryBudgetExceeded(f'{request.endpoint}: {log.count} queries, budget {budget}')
+        return response
+
+    @app.teardown_request
+    def _drop_profile(exc):
+        cm = g.pop('query_log_cm', None)
+        if cm is not None:
+            cm.__exit__(None, None, None)
+
+    print('[PROFILER] Per-request SQL profiling on')
+
+
+# ── Budget check ──────────────────────────────────────────────────────────────
+def check_budgets(app):
+    """
+    [(endpoint, url, queries, budget, repeated)] for the api GET routes, each
+    measured on its second call (warm limit registry, empty response cache).
+    """
+    from flask_jwt_extended import create_access_token
+    from cache import response_cache
+    from models import db, Industry
+
+    with app.app_context():
+        auth = {'Authorization': f"Bearer {create_access_token(identity='admin')}"}
+        ind = Industry.query.order_by(Industry.id).first()
+        ind = (ind.id, ind.industry_type) if ind else None
+        db.session.remove()
+    if ind is None:
+        return []
+    ind_id, ind_type = ind
+    urls = [
+        ('api.get_industries', '/api/industries'),
+        ('api.get_industry', f'/api/industries/{ind_id}'),
+        ('api.get_live', f'/api/live/{ind_id}'),
+        ('api.get_history', f'/api/history/{ind_id}?limit=50'),
+        ('api.get_history', f'/api/history/{ind_id}?resolution=hour'),
+        ('api.get_forecast', f'/api/forecast/{ind_id}'),
+        ('api.get_industries_nearby', '/api/geo/industries?lat=22&lng=80&radius_km=500'),
+        ('api.get_readings_nearby', '/api/geo/readings?lat=21.2&lng=81.4&radius_km=10'),
+        ('api.get_violation_tile', '/api/geo/tiles/4/11/7'),
+        ('api.get_safe_limits', f'/api/safe-limits/{ind_type}'),
+        ('api.get_violations', '/api/violations?limit=100'),
+        ('api.get_anomalies', f'/api/anomalies?industry_id={ind_id}'),
+        ('api.get_comments', f'/api/comments/{ind_id}'),
+        ('api.export_readings', f'/api/export/readings?industry_id={ind_id}&format=ndjson'),
+        ('api.download_pdf', f'/api/pdf/{ind_id}'),
+    ]
+    client = app.test_client()
+    results = []
+    for endpoint, url in urls:
+        client.get(url, headers=auth).get_data()
+        response_cache.clear()
+        with record() as log:
+            client.get(url, headers=auth).get_data()
+        results.append((endpoint, url, log.count, QUERY_BUDGETS.get(endpoint), log.repeated()))
+    return results
+
+
+if __name__ == '__main__':
+    from app import app
+
+    if len(sys.argv) < 2 or sys.argv[1] != 'check':
+        print('Usage: python profiler.py check')
+        sys.exit(2)
+    failed = False
+    for endpoint, url, count, budget, repeated in check_budgets(app):
+        ok = (budget is None or count <= budget) and not repeated
+        failed |= not ok
+        print(f"{'OK' if ok else 'FAIL':<4} {count:>3}/{budget if budget is not None else '-':<3} {url}")
+        for n, s in repeated:
+            print(f'          N+1 candidate, {n}x: {s[:160]}')
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,90 @@
+"""
+Hot read paths on sensor_readings. Routes build their queries here so that
+`migrations.py check` can EXPLAIN exactly what production runs.
+"""
+import base64
+from datetime import datetime, timezone
+
+from sqlalchemy import tuple_
+
+from models import db, Industry, SensorReading
+
+
+def parse_timestamp(value):
+    """ISO-8601 string -> naive UTC datetime (the storage convention)."""
+    ts = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+# ── Keyset cursors ────────────────────────────────────────────────────────────
+def encode_cursor(reading):
+    """
+    Opaque cursor pointing just past `reading` (an API reading dict) in
+    (timestamp, id) DESC order.
+    """
+    raw = f"{reading['timestamp']}|{reading['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) from encode_cursor's output; raises ValueError if malformed."""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        ts, reading_id = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        return datetime.fromisoformat(ts), int(reading_id)
+    except (ValueError, TypeError):
+        # Bad base64, bad UTF-8, wrong field count, bad timestamp or id; the
+        # details are Python's own wording, not something to return to clients
+        raise ValueError('invalid cursor') from None
+
+
+def _before(query, cursor):
+    if cursor is None:
+        return query
+    return query.filter(tuple_(SensorReading.timestamp, SensorReading.id) < tuple_(*cursor))
+
+
+# ── Hot queries ───────────────────────────────────────────────────────────────
+def latest_reading_query(industry_id):
+    return (SensorReading.query
+            .filter_by(industry_id=industry_id)
+            .order_by(SensorReading.timestamp.desc()))
+
+
+def history_query(industry_id, limit, before=None):
+    return (_before(SensorReading.query.filter_by(industry_id=industry_id), before)
+            .order_by(SensorReading.timestamp.desc(), SensorReading.id.desc())
+            .limit(limit))
+
+
+def history_range_query(industry_id, start, end, limit):
+    return (SensorReading.query
+            .filter(SensorReading.industry_id == industry_id,
+                    SensorReading.timestamp >= start,
+                    SensorReading.timestamp < end)
+            .order_by(SensorReading.timestamp)
+            .limit(limit))
+
+
+def violations_query(limit, before=None):
+    """(reading, industry name, industry type) rows, newest violation first."""
+    query = (db.session.query(SensorReading, Industry.name, Industry.industry_type)
+             .join(Industry, Industry.id == SensorReading.industry_id)
+             .filter(SensorReading.is_violation == db.true()))
+    return (_before(query, before)
+            .order_by(SensorReading.timestamp.desc(), SensorReading.id.desc())
+            .limit(limit))
+
+
+# (route, query factory) pairs checked by `python migrations.py check`
+HOT_QUERIES = [
+    ('/live/<id>', lambda: latest_reading_query(1).limit(1)),
+    ('/history/<id>', lambda: history_query(1, 50)),
+    ('/history/<id>?cursor', lambda: history_query(1, 50, (datetime(2024, 1, 1), 1000))),
+    ('/violations', lambda: violations_query(100)),
+    ('/violations?cursor', lambda: violations_query(100, (datetime(2024, 1, 1), 1000))),
+    ('/send-notice', lambda: latest_reading_query(1).limit(1)),
+    ('/pdf/<id>', lambda: latest_reading_query(1).limit(1)),
+]
@@ -0,0 +1,166 @@
+"""
+Minute / hour / day rollups of sensor_readings.
+
+Every batch the write path persists is folded into reading_rollups with one
+upsert per touched bucket, so range charts read a few hundred pre-aggregated
+rows instead of scanning raw readings.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from limits import POLLUTANTS
+import archive
+from models import db, SensorReading, ReadingRollup
+from queries import parse_timestamp
+
+RESOLUTIONS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+MAX_POINTS = 500  # `resolution=auto` picks the finest level under this
+
+
+def bucket_start(ts, resolution):
+    if resolution == 'minute':
+        return ts.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def pick_resolution(start, end):
+    span = (end - start).total_seconds()
+    for name, step in RESOLUTIONS.items():
+        if span / step.total_seconds() <= MAX_POINTS:
+            return name
+    return 'day'
+
+
+# ── Write side ────────────────────────────────────────────────────────────────
+def _aggregate(rows, resolutions=RESOLUTIONS):
+    """Collapse reading dicts into {(industry_id, resolution, bucket): stats}."""
+    buckets = {}
+    for r in rows:
+        ts = r['timestamp']
+        for resolution in resolutions:
+            key = (r['industry_id'], resolution, bucket_start(ts, resolution))
+            agg = buckets.get(key)
+            if agg is None:
+                agg = buckets[key] = {'industry_id': key[0], 'resolution': resolution,
+                                      'bucket': key[2], 'count': 0, 'violations': 0}
+                for p in POLLUTANTS:
+                    agg[f'{p}_min'] = agg[f'{p}_max'] = None
+                    agg[f'{p}_sum'] = 0.0
+                    agg[f'{p}_n'] = 0
+            agg['count'] += 1
+            if r.get('is_violation'):
+                agg['violations'] += 1
+            for p in POLLUTANTS:
+                val = r.get(p)
+                if val is None:
+                    continue
+                agg[f'{p}_sum'] += val
+                agg[f'{p}_n'] += 1
+                lo, hi = agg[f'{p}_min'], agg[f'{p}_max']
+                if lo is None or val < lo:
+                    agg[f'{p}_min'] = val
+                if hi is None or val > hi:
+                    agg[f'{p}_max'] = val
+    return buckets
+
+
+def _upsert_statement(dialect_name):
+    table = ReadingRollup.__table__
+    if dialect_name == 'postgresql':
+        stmt, least, greatest = postgresql.insert(table), func.least, func.greatest
+    elif dialect_name == 'sqlite':
+        stmt, least, greatest = sqlite.insert(table), func.min, func.max
+    else:
+        raise NotImplementedError(f'Rollups need SQLite or PostgreSQL, not {dialect_name}')
+    new = stmt.excluded
+
+    def _merge(fn, col):
+        # NULL-safe: a bucket with no values for a pollutant must not erase the other side
+        return fn(func.coalesce(table.c[col], new[col]), func.coalesce(new[col], table.c[col]))
+
+    updates = {'count': table.c.count + new.count,
+               'violations': table.c.violations + new.violations}
+    for p in POLLUTANTS:
+        updates[f'{p}_min'] = _merge(least, f'{p}_min')
+        updates[f'{p}_max'] = _merge(greatest, f'{p}_max')
+        updates[f'{p}_sum'] = func.coalesce(table.c[f'{p}_sum'], 0) + new[f'{p}_sum']
+        updates[f'{p}_n'] = func.coalesce(table.c[f'{p}_n'], 0) + new[f'{p}_n']
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.industry_id, table.c.resolution, table.c.bucket],
+        set_=updates,
+    )
+
+
+def apply_readings(rows, resolutions=RESOLUTIONS):
+    """Fold freshly inserted reading dicts into the rollups (caller commits)."""
+    buckets = _aggregate(rows, resolutions)
+    if buckets:
+        stmt = _upsert_statement(db.engine.dialect.name)
+        db.session.execute(stmt, list(buckets.values()))
+
+
+def rebuild(chunk_size=50000):
+    """Recompute every rollup from sensor_readings, streaming in id order."""
+    db.session.execute(ReadingRollup.__table__.delete())
+    table = SensorReading.__table__
+    cols = [table.c.id, table.c.industry_id, table.c.timestamp, table.c.is_violation] + \
+           [table.c[p] for p in POLLUTANTS]
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            select(*cols).where(table.c.id > last_id).order_by(table.c.id).limit(chunk_size)
+        ).mappings().all()
+        if not rows:
+            break
+        apply_readings(rows)
+        db.session.commit()
+        last_id = rows[-1]['id']
+    # Archived readings keep their hour/day buckets; minute detail is not retained
+    for batch in archive.iter_batches():
+        apply_readings(batch, ('hour', 'day'))
+        db.session.commit()
+    db.session.commit()
+
+
+# ── Read side ─────────────────────────────────────────────────────────────────
+def series(industry_id, start, end, resolution):
+    """Rollup buckets in [start, end) as chart points (mean values + min/max)."""
+    rows = (ReadingRollup.query
+            .filter(ReadingRollup.industry_id == industry_id,
+                    ReadingRollup.resolution == resolution,
+                    ReadingRollup.bucket >= bucket_start(start, resolution),
+                    ReadingRollup.bucket < end)
+            .order_by(ReadingRollup.bucket)
+            .all())
+    points = []
+    for r in rows:
+        point = {
+            'timestamp': r.bucket.isoformat(),
+            'resolution': resolution,
+            'count': r.count,
+            'violations': r.violations,
+            'is_violation': r.violations > 0,
+            'min': {}, 'max': {},
+        }
+        for p in POLLUTANTS:
+            n = getattr(r, f'{p}_n')
+            point[p] = round(getattr(r, f'{p}_sum') / n, 2) if n else None
+            point['min'][p] = getattr(r, f'{p}_min')
+            point['max'][p] = getattr(r, f'{p}_max')
+        points.append(point)
+    return points
+
+
+def parse_range(args, now=None):
+    """(start, end) from `from`/`to` query args; defaults to the last 24 hours."""
+    end = parse_timestamp(args['to']) if args.get('to') else (now or datetime.utcnow())
+    start = parse_timestamp(args['from']) if args.get('from') else end - timedelta(days=1)
+    return start, end
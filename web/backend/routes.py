@@ -1,13 +1,33 @@
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, request, jsonify, send_file, Response, stream_with_context
 from flask_jwt_extended import create_access_token, get_jwt_identity
-from models import db, User, Industry, SensorReading, SafeLimit, AdminComment
+from models import db, User, Industry, SensorReading, AdminComment, EmailJob
 from auth import check_password, admin_required
-from email_service import send_notice_email, generate_pdf_bytes
+from email_service import render_pdf
+from outbox import enqueue, job_dict, get_dispatcher
+from enforcement import notice_data, start_run as start_enforcement, runs as enforcement_runs
+from summary import industry_rows
+from limits import registry as limit_registry
+from queries import (latest_reading_query, history_query, history_range_query, violations_query,
+                     encode_cursor, decode_cursor, parse_timestamp)
+from export import FORMATS, archived_partitions, export_statement, stream as stream_export
+from rollups import RESOLUTIONS, parse_range, pick_resolution, series as rollup_series
+from ingest import parse_batch, ingest, BatchTooLarge, MAX_BATCH, MAX_BATCH_BYTES
+from compliance import compliance_score as compliance_score_of
+from forecast import industry_forecast
+from anomaly import recent as recent_anomalies
+import spatial
+from fanout import get_fanout
+from runtime import offload
+from cache import cached
+import archive
 import io
 from datetime import datetime
 
 api = Blueprint('api', __name__)
 
+MAX_RAW_HISTORY = 5000
+MAX_PAGE = 1000
+
 
 # ── Auth ────────────────────────────────────────────────────────────────────
 @api.route('/login', methods=['POST'])
@@ -22,18 +42,13 @@ def login():
 
 # ── Industries ───────────────────────────────────────────────────────────────
 @api.route('/industries', methods=['GET'])
+@cached(('industries', 'limits'))
 def get_industries():
-    industries = Industry.query.all()
+    limits_map = limit_registry.all()
     result = []
-    for ind in industries:
-        latest = (SensorReading.query
-                  .filter_by(industry_id=ind.id)
-                  .order_by(SensorReading.timestamp.desc())
-                  .first())
-        limits = SafeLimit.query.filter_by(industry_type=ind.industry_type).first()
-
-        compliance_score = _calc_compliance(latest, limits) if latest and limits else None
-        violations_count = SensorReading.query.filter_by(industry_id=ind.id, is_violation=True).count()
+    for ind, latest, violations_count in industry_rows():
+        limits = limits_map.get(ind.industry_type)
+        compliance_score = compliance_score_of(latest, limits) if latest and limits else None
 
         result.append({
             'id': ind.id,
@@ -51,13 +66,11 @@ def get_industries():
 
 
 @api.route('/industries/<int:industry_id>', methods=['GET'])
+@cached(lambda industry_id: (f'industry:{industry_id}', 'limits'))
 def get_industry(industry_id):
     ind = Industry.query.get_or_404(industry_id)
-    limits = SafeLimit.query.filter_by(industry_type=ind.industry_type).first()
-    latest = (SensorReading.query
-              .filter_by(industry_id=ind.id)
-              .order_by(SensorReading.timestamp.desc())
-              .first())
+    limits = limit_registry.get(ind.industry_type)
+    latest = latest_reading_query(ind.id).first()
     return jsonify({
         'id': ind.id,
         'name': ind.name,
@@ -71,15 +84,13 @@ def get_industry(industry_id):
 
 # ── Live reading ─────────────────────────────────────────────────────────────
 @api.route('/live/<int:industry_id>', methods=['GET'])
+@cached(lambda industry_id: (f'industry:{industry_id}', 'limits'))
 def get_live(industry_id):
-    latest = (SensorReading.query
-              .filter_by(industry_id=industry_id)
-              .order_by(SensorReading.timestamp.desc())
-              .first())
+    latest = latest_reading_query(industry_id).first()
     if not latest:
         return jsonify({'error': 'No readings yet'}), 404
     ind = Industry.query.get(industry_id)
-    limits = SafeLimit.query.filter_by(industry_type=ind.industry_type).first()
+    limits = limit_registry.get(ind.industry_type)
     data = _reading_dict(latest)
     data['limits'] = _limits_dict(limits) if limits else None
     return jsonify(data)
@@ -87,20 +98,169 @@ def get_live(industry_id):
 
 # ── History ──────────────────────────────────────────────────────────────────
 @api.route('/history/<int:industry_id>', methods=['GET'])
+@cached(lambda industry_id: (f'industry:{industry_id}',))
 def get_history(industry_id):
     limit = request.args.get('limit', 50, type=int)
-    readings = (SensorReading.query
-                .filter_by(industry_id=industry_id)
-                .order_by(SensorReading.timestamp.desc())
-                .limit(limit).all())
-    readings.reverse()
-    return jsonify([_reading_dict(r) for r in readings])
+    args = request.args
+    if not any(k in args for k in ('from', 'to', 'resolution')):
+        try:
+            before = decode_cursor(args['cursor']) if args.get('cursor') else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        limit = max(1, min(limit, MAX_PAGE))
+        readings = history_query(industry_id, limit, before).all()
+        page = [_reading_dict(r) for r in readings]
+        if len(page) < limit:
+            # Hot table exhausted: continue into the cold archive
+            edge = (readings[-1].timestamp, readings[-1].id) if readings else before
+            page += archive.latest(industry_id, limit - len(page), edge)
+        return _with_next_cursor(jsonify(page[::-1]), page, limit)
+
+    try:
+        start, end = parse_range(args)
+    except ValueError:
+        return jsonify({'error': 'from/to must be ISO-8601 timestamps'}), 400
+    if start >= end:
+        return jsonify({'error': '`from` must be before `to`'}), 400
+
+    resolution = args.get('resolution', 'auto')
+    if resolution == 'auto':
+        resolution = pick_resolution(start, end)
+    if resolution == 'raw':
+        limit = min(limit, MAX_RAW_HISTORY)
+        page = archive.in_range(industry_id, start, end, limit)
+        page += [_reading_dict(r) for r in history_range_query(industry_id, start, end, limit)]
+        page.sort(key=lambda d: (d['timestamp'], d['id']))
+        return jsonify(page[:limit])
+    if resolution not in RESOLUTIONS:
+        return jsonify({'error': f"resolution must be one of raw, auto, {', '.join(RESOLUTIONS)}"}), 400
+    return jsonify(rollup_series(industry_id, start, end, resolution))
+
+
+# ── Forecast ─────────────────────────────────────────────────────────────────
+@api.route('/forecast/<int:industry_id>', methods=['GET'])
+@cached(lambda industry_id: (f'industry:{industry_id}', 'limits'))
+def get_forecast(industry_id):
+    ind = Industry.query.get_or_404(industry_id)
+    return jsonify(industry_forecast(ind, limit_registry.get(ind.industry_type)))
+
+
+# ── Spatial ──────────────────────────────────────────────────────────────────
+MAX_GEO_RESULTS = 5000
+
+
+def _geo_args(*names):
+    """Float query args by name; raises ValueError naming the first missing or bad one."""
+    values = []
+    for name in names:
+        value = request.args.get(name, type=float)
+        if value is None:
+            raise ValueError(f'`{name}` must be a number')
+        values.append(value)
+    return values
+
+
+def _point_args(default_radius):
+    lat, lng = _geo_args('lat', 'lng')
+    radius_km = request.args.get('radius_km', default_radius, type=float)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or not 0 < radius_km <= 1000:
+        raise ValueError('lat/lng out of range or radius_km not in (0, 1000]')
+    return lat, lng, radius_km
+
+
+@api.route('/geo/industries', methods=['GET'])
+@cached(('industries',))
+def get_industries_nearby():
+    limit = max(1, min(request.args.get('limit', 500, type=int), MAX_GEO_RESULTS))
+    try:
+        if 'bbox' in request.args:
+            min_lng, min_lat, max_lng, max_lat = (float(v) for v in request.args['bbox'].split(','))
+            if min_lng > max_lng or min_lat > max_lat:
+                raise ValueError('bbox is min_lng,min_lat,max_lng,max_lat')
+            found = [(ind, None) for ind in spatial.industries_in_bbox(min_lat, min_lng, max_lat, max_lng, limit)]
+        else:
+            found = spatial.industries_near(*_point_args(50.0), limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify([{
+        'id': ind.id,
+        'name': ind.name,
+        'industry_type': ind.industry_type,
+        'lat': ind.lat,
+        'lng': ind.lng,
+        **({'distance_km': round(d, 3)} if d is not None else {}),
+    } for ind, d in found])
+
+
+@api.route('/geo/readings', methods=['GET'])
+@cached(('industries',))
+def get_readings_nearby():
+    limit = max(1, min(request.args.get('limit', 500, type=int), MAX_RAW_HISTORY))
+    try:
+        lat, lng, radius_km = _point_args(5.0)
+        start, end = parse_range(request.args)
+        found = spatial.readings_near(lat, lng, radius_km, start, end, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify([{**_reading_dict(r), 'distance_km': round(d, 3)} for r, d in found])
+
+
+@api.route('/geo/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+@cached(('industries', 'violations'))
+def get_violation_tile(z, x, y):
+    if not (0 <= z <= spatial.MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({'error': 'No such tile'}), 404
+    start = end = None
+    if 'from' in request.args or 'to' in request.args:
+        try:
+            start, end = parse_range(request.args)
+        except ValueError:
+            return jsonify({'error': 'from/to must be ISO-8601 timestamps'}), 400
+    return jsonify(spatial.violation_tile(z, x, y, start, end))
+
+
+# ── Batch ingestion ──────────────────────────────────────────────────────────
+@api.route('/readings/batch', methods=['POST'])
+@admin_required
+def ingest_readings():
+    # Refuse oversized bodies before reading them; without a Content-Length
+    # read one byte past the limit so parse_batch can refuse it
+    if request.content_length is not None and request.content_length > MAX_BATCH_BYTES:
+        return jsonify({'error': f'Batch exceeds {MAX_BATCH_BYTES} bytes'}), 413
+    body = request.get_data() if request.content_length is not None \
+        else request.stream.read(MAX_BATCH_BYTES + 1)
+    try:
+        records = parse_batch(body, request.content_type or '',
+                              request.headers.get('Content-Encoding', ''))
+    except BatchTooLarge as e:
+        return jsonify({'error': str(e)}), 413
+    except (ValueError, OSError) as e:
+        return jsonify({'error': f'Malformed batch: {e}'}), 400
+    if len(records) > MAX_BATCH:
+        return jsonify({'error': f'Batch exceeds {MAX_BATCH} readings'}), 413
+
+    result, payloads, errors = ingest(records)
+    if errors:
+        return jsonify({'error': 'Invalid readings', 'details': errors}), 400
+
+    fanout = get_fanout()
+    if fanout:
+        for payload in payloads:
+            fanout.publish(payload)
+    return jsonify(result), 201
 
 
 # ── Safe Limits ──────────────────────────────────────────────────────────────
+@api.route('/safe-limits/cache-stats', methods=['GET'])
+@admin_required
+def get_limit_cache_stats():
+    return jsonify(limit_registry.stats())
+
+
 @api.route('/safe-limits/<string:industry_type>', methods=['GET'])
+@cached(('limits',))
 def get_safe_limits(industry_type):
-    limits = SafeLimit.query.filter_by(industry_type=industry_type).first()
+    limits = limit_registry.get(industry_type)
     if not limits:
         return jsonify({'error': 'Not found'}), 404
     return jsonify(_limits_dict(limits))
@@ -109,21 +269,57 @@ def get_safe_limits(industry_type):
 # ── Violations ───────────────────────────────────────────────────────────────
 @api.route('/violations', methods=['GET'])
 @admin_required
+@cached(('violations', 'limits'))
 def get_violations():
-    readings = (SensorReading.query
-                .filter_by(is_violation=True)
-                .order_by(SensorReading.timestamp.desc())
-                .limit(100).all())
+    limit = max(1, min(request.args.get('limit', 100, type=int), MAX_PAGE))
+    try:
+        before = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limits_map = limit_registry.all()
     result = []
-    for r in readings:
-        ind = Industry.query.get(r.industry_id)
-        limits = SafeLimit.query.filter_by(industry_type=ind.industry_type).first()
+    for r, industry_name, industry_type in violations_query(limit, before):
+        limits = limits_map.get(industry_type)
         d = _reading_dict(r)
-        d['industry_name'] = ind.name
-        d['industry_type'] = ind.industry_type
+        d['industry_name'] = industry_name
+        d['industry_type'] = industry_type
         d['limits'] = _limits_dict(limits) if limits else None
         result.append(d)
-    return jsonify(result)
+    return _with_next_cursor(jsonify(result), result, limit)
+
+
+# ── Anomalies ────────────────────────────────────────────────────────────────
+@api.route('/anomalies', methods=['GET'])
+@admin_required
+@cached(('anomalies', 'industries'))
+def get_anomalies():
+    limit = max(1, min(request.args.get('limit', 100, type=int), MAX_PAGE))
+    try:
+        before = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    page = recent_anomalies(limit, before, request.args.get('industry_id', type=int))
+    return _with_next_cursor(jsonify(page), page, limit)
+
+
+# ── Export ───────────────────────────────────────────────────────────────────
+@api.route('/export/readings', methods=['GET'])
+@admin_required
+def export_readings():
+    args = request.args
+    fmt = args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(FORMATS)}"}), 400
+    try:
+        start = parse_timestamp(args['from']) if args.get('from') else None
+        end = parse_timestamp(args['to']) if args.get('to') else None
+    except ValueError:
+        return jsonify({'error': 'from/to must be ISO-8601 timestamps'}), 400
+    filters = (args.get('industry_id', type=int), start, end,
+               args.get('violations_only', '').lower() in ('1', 'true', 'yes'))
+    chunks = stream_export(export_statement(*filters), fmt, archived_partitions(*filters))
+    return Response(stream_with_context(chunks), mimetype=FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename=readings.{fmt}'})
 
 
 # ── Admin Comment ─────────────────────────────────────────────────────────────
@@ -145,6 +341,7 @@ def add_comment():
 
 @api.route('/comments/<int:industry_id>', methods=['GET'])
 @admin_required
+@cached(lambda industry_id: (f'industry:{industry_id}',))
 def get_comments(industry_id):
     comments = (AdminComment.query
                 .filter_by(industry_id=industry_id)
@@ -166,36 +363,46 @@ def get_comments(industry_id):
 def send_notice():
     data = request.json or {}
     ind = Industry.query.get_or_404(data.get('industry_id'))
-    limits = SafeLimit.query.filter_by(industry_type=ind.industry_type).first()
-    latest = (SensorReading.query
-              .filter_by(industry_id=ind.id)
-              .order_by(SensorReading.timestamp.desc())
-              .first())
-
-    violations = []
-    if latest and limits:
-        fields = [('PM2.5', latest.pm25, limits.pm25),
-                  ('PM10', latest.pm10, limits.pm10),
-                  ('NO2', latest.no2, limits.no2),
-                  ('SO2', latest.so2, limits.so2),
-                  ('CO2', latest.co2, limits.co2)]
-        for name, val, lim in fields:
-            if val and val > lim:
-                violations.append({'pollutant': name, 'value': val, 'limit': lim})
-
-    email_data = {
-        'industry_name': ind.name,
-        'industry_type': ind.industry_type,
-        'location': ind.location or 'N/A',
-        'violations': violations,
-        'action': data.get('action', 'Notice Issued'),
-        'comment': data.get('comment', ''),
-    }
+    limits = limit_registry.get(ind.industry_type)
+    latest = latest_reading_query(ind.id).first()
+    email_data = notice_data(ind, latest, limits, data.get('action', 'Notice Issued'),
+                             data.get('comment', ''))
 
     to_email = data.get('email') or ind.contact_email
-    ok, mode = send_notice_email(to_email, email_data)
-    return jsonify({'success': ok, 'email_sent_to': to_email, 'mode': mode})
+    if not to_email:
+        return jsonify({'error': 'Industry has no contact email; pass `email`'}), 400
+    job = enqueue(to_email, email_data)
+    db.session.commit()
+    dispatcher = get_dispatcher()
+    if dispatcher:
+        dispatcher.wake()
+    return jsonify({'success': True, 'job_id': job.id, 'status': job.status,
+                    'email_sent_to': to_email, 'mode': job.mode}), 202
+
+
+@api.route('/send-notice/<int:job_id>', methods=['GET'])
+@admin_required
+def get_notice_status(job_id):
+    return jsonify(job_dict(EmailJob.query.get_or_404(job_id)))
+
+
+# ── Bulk Enforcement ─────────────────────────────────────────────────────────
+@api.route('/enforcement/runs', methods=['POST'])
+@admin_required
+def start_enforcement_run():
+    data = request.json or {}
+    run = start_enforcement(get_jwt_identity(), data.get('action', 'Notice Issued'),
+                            data.get('comment', ''), data.get('industry_type'))
+    return jsonify(run.as_dict()), 202
+
 
+@api.route('/enforcement/runs/<int:run_id>', methods=['GET'])
+@admin_required
+def get_enforcement_run(run_id):
+    run = enforcement_runs.get(run_id)
+    if not run:
+        return jsonify({'error': 'Not found'}), 404
+    return jsonify(run.as_dict())
 
 
 # ── PDF Download ──────────────────────────────────────────────────────────────
@@ -203,31 +410,9 @@ def send_notice():
 @admin_required
 def download_pdf(industry_id):
     ind = Industry.query.get_or_404(industry_id)
-    limits = SafeLimit.query.filter_by(industry_type=ind.industry_type).first()
-    latest = (SensorReading.query
-              .filter_by(industry_id=ind.id)
-              .order_by(SensorReading.timestamp.desc())
-              .first())
-
-    violations = []
-    if latest and limits:
-        fields = [('PM2.5', latest.pm25, limits.pm25),
-                  ('PM10', latest.pm10, limits.pm10),
-                  ('NO2', latest.no2, limits.no2),
-                  ('SO2', latest.so2, limits.so2),
-                  ('CO2', latest.co2, limits.co2)]
-        for name, val, lim in fields:
-            if val and val > lim:
-                violations.append({'pollutant': name, 'value': val, 'limit': lim})
-
-    pdf = generate_pdf_bytes({
-        'industry_name': ind.name,
-        'industry_type': ind.industry_type,
-        'location': ind.location,
-        'violations': violations,
-        'action': 'Notice Issued',
-        'comment': '',
-    })
+    limits = limit_registry.get(ind.industry_type)
+    latest = latest_reading_query(ind.id).first()
+    pdf = offload(render_pdf, notice_data(ind, latest, limits))
     return send_file(io.BytesIO(pdf), mimetype='application/pdf',
                      download_name='violation_notice.pdf', as_attachment=True)
 
@@ -247,27 +432,16 @@ def _reading_dict(r):
     }
 
 
+def _with_next_cursor(resp, page, limit):
+    """Keyset pagination: a full page (reading dicts, newest first) advertises the next one."""
+    if len(page) == limit:
+        resp.headers['X-Next-Cursor'] = encode_cursor(page[-1])
+    return resp
+
+
 def _limits_dict(l):
     return {
         'industry_type': l.industry_type,
         'pm25': l.pm25, 'pm10': l.pm10,
         'no2': l.no2, 'so2': l.so2, 'co2': l.co2,
     }
-
-
-def _calc_compliance(reading, limits):
-    """Returns 0-100 score where 100 = fully compliant."""
-    if not reading or not limits:
-        return None
-    ratios = []
-    pairs = [(reading.pm25, limits.pm25), (reading.pm10, limits.pm10),
-             (reading.no2, limits.no2), (reading.so2, limits.so2),
-             (reading.co2, limits.co2)]
-    for val, lim in pairs:
-        if val and lim:
-            ratios.append(min(val / lim, 2.0))
-    if not ratios:
-        return None
-    avg = sum(ratios) / len(ratios)
-    score = max(0, round((2.0 - avg) / 2.0 * 100, 1))
-    return score
@@ -0,0 +1,37 @@
+"""
+Async runtime selection. Must be imported before anything else in app.py
+(bar startup.py, which only touches builtins) so that eventlet can
+monkey-patch the standard library first.
+
+    ASYNC_MODE=threading   one OS thread per connection, Werkzeug server (default)
+    ASYNC_MODE=eventlet    green threads on one event loop, eventlet.wsgi
+
+Under a cooperative loop, anything that holds the CPU or sits in a C call
+without yielding (bcrypt, reportlab, blocking SMTP) stalls every socket on
+the server; `offload()` runs such calls on a native thread pool instead.
+"""
+import os
+
+ASYNC_MODE = os.getenv('ASYNC_MODE', 'threading').lower()
+
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE != 'threading':
+    raise RuntimeError(f'ASYNC_MODE must be threading or eventlet, not {ASYNC_MODE!r}')
+
+
+def offload(fn, *args, **kwargs):
+    """Run a blocking call without stalling the event loop; returns its result."""
+    if ASYNC_MODE == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+def run_kwargs():
+    """Extra socketio.run() arguments for the selected runtime."""
+    if ASYNC_MODE == 'threading':
+        # Werkzeug refuses to start outside debug mode unless told otherwise
+        return {'allow_unsafe_werkzeug': True}
+    return {}
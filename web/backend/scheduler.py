@@ -0,0 +1,229 @@
+"""
+Drone visit scheduling.
+
+RiskScheduler keeps every industry in a priority queue keyed by
+
+    W_VIOLATION * recent violation rate
+  + W_COMPLIANCE * (1 - compliance score / 100)
+  + W_AGE * seconds since the last visit
+
+All sites age at the same rate, so the age term is stored as -W_AGE * last
+visit and heap keys only change when a site is observed. A drone that needs
+work pops the top CANDIDATES sites, chains a ROUTE_LENGTH route greedily by
+priority minus W_DISTANCE * travel km from its position, and claims those
+stops so other drones plan around them. Each observation re-keys one site
+(a lazy heap push) and marks stale only the routes it now outranks; those
+drones replan at their next stop. RoundRobinScheduler is the old behaviour
+behind the same interface. `python -m bench.scheduler` compares the two.
+"""
+import heapq
+import os
+from collections import namedtuple
+
+from grid import haversine_km
+
+W_VIOLATION = 1.0
+W_COMPLIANCE = 0.5
+W_AGE = 1 / (6 * 3600)    # six hours unvisited is worth one violating-rate point
+W_DISTANCE = 1 / 100      # 100 km of travel costs as much
+RATE_DECAY = 0.3          # EWMA weight of the newest reading in the violation rate
+PRIOR_RATE = 0.2
+CANDIDATES = int(os.getenv('SCHEDULER_CANDIDATES', 32))
+ROUTE_LENGTH = int(os.getenv('SCHEDULER_ROUTE_LENGTH', 3))
+
+Site = namedtuple('Site', 'id name industry_type lat lng')
+
+
+class _SiteState:
+    __slots__ = ('site', 'rate', 'score', 'last_visit', 'last_seen', 'version')
+
+    def __init__(self, site, last_visit):
+        self.site = site
+        self.rate = PRIOR_RATE
+        self.score = None
+        self.last_visit = last_visit
+        self.last_seen = None
+        self.version = 0
+
+    @property
+    def key(self):
+        compliance = 0.5 if self.score is None else 1 - self.score / 100
+        return W_VIOLATION * self.rate + W_COMPLIANCE * compliance - W_AGE * self.last_visit
+
+
+class RiskScheduler:
+    def __init__(self):
+        self._sites = {}      # industry id -> _SiteState
+        self._heap = []       # (-key, version, industry id), stale entries skipped on pop
+        self._claims = {}     # industry id -> drone id
+        self._routes = {}     # drone id -> [industry id, ...] still to fly
+        self._current = {}    # drone id -> industry id it is flying to or scanning
+        self._floors = {}     # drone id -> lowest key on its planned route
+        self._stale = set()
+        self.replans = 0
+
+    # ── Sites ─────────────────────────────────────────────────────────────────
+    def sync(self, sites, now, last_visits=None):
+        """
+        Add, move or drop sites to match `sites` (Site tuples). New sites count
+        as visited at `last_visits[id]` when given, else at `now`.
+        """
+        last_visits = last_visits or {}
+        seen = set()
+        for site in sites:
+            seen.add(site.id)
+            state = self._sites.get(site.id)
+            if state is None:
+                self._sites[site.id] = state = _SiteState(site, last_visits.get(site.id, now))
+                self._push(state)
+            else:
+                state.site = site
+        for industry_id in self._sites.keys() - seen:
+            del self._sites[industry_id]
+            drone = self._claims.pop(industry_id, None)
+            if drone is not None:
+                self._stale.add(drone)
+
+    def sites(self):
+        return [s.site for s in self._sites.values()]
+
+    def observe(self, industry_id, violation, score, now, seen=None):
+        """
+        Fold one reading into its site and re-key it. `seen` (the reading
+        timestamp) lets repeated sightings of the same latest reading be ignored;
+        `violation` None records a visit that took no reading.
+        """
+        state = self._sites.get(industry_id)
+        if state is None or (seen is not None and state.last_seen is not None and seen <= state.last_seen):
+            return
+        if violation is not None:
+            state.rate = (1 - RATE_DECAY) * state.rate + RATE_DECAY * (1.0 if violation else 0.0)
+        if score is not None:
+            state.score = score
+        state.last_visit = max(state.last_visit, now)
+        if seen is not None:
+            state.last_seen = seen
+        self._push(state)
+        if industry_id not in self._claims:
+            key = state.key
+            self._stale.update(d for d, floor in self._floors.items() if key > floor)
+
+    def _push(self, state):
+        state.version += 1
+        heapq.heappush(self._heap, (-state.key, state.version, state.site.id))
+
+    # ── Planning ──────────────────────────────────────────────────────────────
+    def next_stop(self, drone_id, lat, lng, now):
+        """The site `drone_id` (at lat/lng) should fly to next, or None if there is none."""
+        previous = self._current.pop(drone_id, None)
+        if previous is not None:
+            self._claims.pop(previous, None)
+        route = self._routes.get(drone_id)
+        if not route or drone_id in self._stale:
+            self._plan(drone_id, lat, lng, now)
+            route = self._routes[drone_id]
+        if not route:
+            return None
+        industry_id = route.pop(0)
+        self._current[drone_id] = industry_id
+        return self._sites[industry_id].site
+
+    def release(self, drone_id):
+        """Drop a drone's route and claims (it stopped or went away)."""
+        for industry_id in self._routes.pop(drone_id, []) + [self._current.pop(drone_id, None)]:
+            self._claims.pop(industry_id, None)
+        self._floors.pop(drone_id, None)
+        self._stale.discard(drone_id)
+
+    def _candidates(self, drone_id):
+        """Up to CANDIDATES unclaimed sites, best key first, left in the heap."""
+        taken, held = [], []
+        while self._heap and len(taken) < CANDIDATES:
+            entry = heapq.heappop(self._heap)
+            state = self._sites.get(entry[2])
+            if state is None or state.version != entry[1]:
+                continue  # superseded by a later push
+            held.append(entry)
+            if self._claims.get(entry[2], drone_id) == drone_id:
+                taken.append(state)
+        for entry in held:
+            heapq.heappush(self._heap, entry)
+        return taken
+
+    def _plan(self, drone_id, lat, lng, now):
+        """
+        Greedy route for one drone; a drone with no position yet ignores
+        distance. Routes shorten when there are too few sites for every drone
+        to claim ROUTE_LENGTH of them.
+        """
+        for industry_id, drone in list(self._claims.items()):
+            if drone == drone_id:
+                del self._claims[industry_id]
+        pool = self._candidates(drone_id)
+        self._routes.setdefault(drone_id, [])
+        length = min(ROUTE_LENGTH, max(1, len(self._sites) // (2 * len(self._routes))))
+        route, floor = [], None
+        while pool and len(route) < length:
+            if lat is None:
+                best = max(pool, key=lambda s: s.key)
+            else:
+                best = max(pool, key=lambda s: s.key - W_DISTANCE * haversine_km(lat, lng, s.site.lat, s.site.lng))
+            pool.remove(best)
+            route.append(best.site.id)
+            self._claims[best.site.id] = drone_id
+            floor = best.key if floor is None else min(floor, best.key)
+            lat, lng = best.site.lat, best.site.lng
+        self._routes[drone_id] = route
+        self._floors[drone_id] = floor if floor is not None else float('inf')
+        self._stale.discard(drone_id)
+        self.replans += 1
+
+    def routes(self):
+        """{drone id: [industry id, ...]} planned after each drone's current stop."""
+        return {d: list(r) for d, r in self._routes.items()}
+
+    def priorities(self, now, limit=20):
+        """[(industry id, priority)] highest first, for inspection."""
+        ranked = sorted(self._sites.values(), key=lambda s: s.key, reverse=True)[:limit]
+        return [(s.site.id, round(s.key + W_AGE * now, 4)) for s in ranked]
+
+
+class RoundRobinScheduler:
+    """Each drone walks the site list in id order, starting from its own offset."""
+
+    def __init__(self):
+        self._sites = []
+        self._index = {}
+
+    def sync(self, sites, now, last_visits=None):
+        self._sites = sorted(sites, key=lambda s: s.id)
+
+    def sites(self):
+        return list(self._sites)
+
+    def observe(self, industry_id, violation, score, now, seen=None):
+        pass
+
+    def next_stop(self, drone_id, lat, lng, now):
+        if not self._sites:
+            return None
+        index = self._index.get(drone_id)
+        index = drone_id - 1 if index is None else index + 1
+        self._index[drone_id] = index
+        return self._sites[index % len(self._sites)]
+
+    def release(self, drone_id):
+        self._index.pop(drone_id, None)
+
+    def routes(self):
+        return {}
+
+
+SCHEDULERS = {'risk': RiskScheduler, 'round_robin': RoundRobinScheduler}
+
+
+def make_scheduler(name=None):
+    name = name or os.getenv('SIM_SCHEDULER', 'risk')
+    if name not in SCHEDULERS:
+        raise ValueError(f"SIM_SCHEDULER must be one of {', '.join(SCHEDULERS)}")
+    return SCHEDULERS[name]()
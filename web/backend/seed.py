@@ -1,5 +1,10 @@
+from sqlalchemy import insert
+
 from models import db, User, Industry, SafeLimit, AdminComment
 from auth import hash_password
+from cache import invalidate_on_commit
+from limits import registry as limit_registry
+from migrations import upgrade
 
 
 INDUSTRIES = [
@@ -29,39 +34,57 @@ SAFE_LIMITS = [
 ]
 
 
+def _missing(column, keys):
+    """The `keys` that no row has in `column` yet, in their given order."""
+    present = {k for (k,) in db.session.query(column).filter(column.in_(keys))}
+    return [k for k in keys if k not in present]
+
+
 def seed(app):
+    """
+    Insert whatever of the demo data is missing: one lookup and at most one
+    multi-row INSERT per table, so re-seeding an existing database costs
+    three lookups and never hashes a password.
+    """
     with app.app_context():
-        db.create_all()
+        upgrade()
 
         # Admin user
-        if not User.query.filter_by(username='admin').first():
-            db.session.add(User(
-                username='admin',
-                password_hash=hash_password('admin123'),
-                role='admin',
-            ))
+        if _missing(User.username, ['admin']):
+            db.session.execute(insert(User), [{
+                'username': 'admin',
+                'password_hash': hash_password('admin123'),
+                'role': 'admin',
+            }])
             print('[SEED] Created admin user (admin / admin123)')
 
         # Safe limits
-        for sl in SAFE_LIMITS:
-            if not SafeLimit.query.filter_by(industry_type=sl['type']).first():
-                db.session.add(SafeLimit(
-                    industry_type=sl['type'],
-                    pm25=sl['pm25'], pm10=sl['pm10'],
-                    no2=sl['no2'],  so2=sl['so2'],  co2=sl['co2'],
-                ))
+        types = set(_missing(SafeLimit.industry_type, [sl['type'] for sl in SAFE_LIMITS]))
+        limits = [{
+            'industry_type': sl['type'],
+            'pm25': sl['pm25'], 'pm10': sl['pm10'],
+            'no2': sl['no2'],  'so2': sl['so2'],  'co2': sl['co2'],
+        } for sl in SAFE_LIMITS if sl['type'] in types]
+        if limits:
+            db.session.execute(insert(SafeLimit), limits)
 
         # Industries
-        for ind in INDUSTRIES:
-            if not Industry.query.filter_by(name=ind['name']).first():
-                db.session.add(Industry(
-                    name=ind['name'],
-                    industry_type=ind['type'],
-                    location=ind['location'],
-                    contact_email=ind['email'],
-                    lat=ind['lat'],
-                    lng=ind['lng'],
-                ))
+        names = set(_missing(Industry.name, [ind['name'] for ind in INDUSTRIES]))
+        industries = [{
+            'name': ind['name'],
+            'industry_type': ind['type'],
+            'location': ind['location'],
+            'contact_email': ind['email'],
+            'lat': ind['lat'],
+            'lng': ind['lng'],
+        } for ind in INDUSTRIES if ind['name'] in names]
+        if industries:
+            db.session.execute(insert(Industry), industries)
 
+        # Core inserts skip the ORM flush hooks that normally invalidate these
+        if limits or industries:
+            invalidate_on_commit(db.session, 'limits', 'industries')
         db.session.commit()
+        if limits:
+            limit_registry.invalidate()
         print('[SEED] Database seeded successfully.')
@@ -1,8 +1,19 @@
+import heapq
+import os
+import queue
 import threading
 import time
 import random
 from datetime import datetime
 
+from writer import get_writer
+from fanout import get_fanout
+from limits import registry as limit_registry
+from compliance import compliance_score, is_violation
+from metrics import SIM_LAG, SIM_DROPPED, SOCKET_EMITS
+from scheduler import Site, make_scheduler
+from summary import industry_rows
+
 # Will be injected by app.py
 socketio = None
 app = None
@@ -13,9 +24,15 @@ SafeLimit = None
 
 DRONE_STATES = ['traveling', 'scanning', 'uploading']
 
-current_industry_index = 0
-current_drone_state = 'traveling'
-_lock = threading.Lock()
+# Flight plan per industry visit, in simulated seconds
+TRAVEL_SECONDS = 5
+SCAN_SAMPLES = 4
+SCAN_INTERVAL_SECONDS = 5
+UPLOAD_SECONDS = 3
+NO_LIMITS_SKIP_SECONDS = 2
+REFRESH_SECONDS = 30  # how often the industry snapshot is reloaded
+
+fleet = None
 
 
 def _base_reading(limits):
@@ -37,111 +54,207 @@ def _base_reading(limits):
     }
 
 
-def _is_violation(reading, limits):
-    return (
-        reading['pm25'] > limits.pm25 or
-        reading['pm10'] > limits.pm10 or
-        reading['no2']  > limits.no2  or
-        reading['so2']  > limits.so2  or
-        reading['co2']  > limits.co2
-    )
+class Drone:
+    __slots__ = ('id', 'lat', 'lng', 'industry', 'limits', 'state', 'samples_left')
 
+    def __init__(self, drone_id):
+        self.id = drone_id
+        self.lat = self.lng = None   # unknown until the first site is reached
+        self.industry = None
+        self.limits = None
+        self.state = 'idle'
+        self.samples_left = 0
 
-def simulation_loop():
-    global current_industry_index, current_drone_state
 
-    with app.app_context():
-        time.sleep(3)  # Wait for DB to be fully initialised
+class FleetSimulator:
+    """
+    Runs N independent drones from one scheduler thread. Each drone is a small
+    state machine (traveling -> scanning x4 -> uploading -> next industry);
+    its next step sits in a heap keyed by due time, and the loop wakes at most
+    `tick_hz` times per second to run every step that has come due.
+    `time_scale` compresses the flight plan (10 = ten times faster).
+    Which industry a drone visits next is up to `scheduler` (scheduler.py,
+    SIM_SCHEDULER by default).
+    """
+
+    def __init__(self, drones=1, tick_hz=10.0, time_scale=1.0, rng=None, scheduler=None):
+        self.drones = [Drone(i + 1) for i in range(drones)]
+        self.tick = 1.0 / tick_hz
+        self.time_scale = time_scale
+        self.rng = rng or random.Random()
+        self.scheduler = scheduler or make_scheduler()
+        self._heap = []
+        self._seq = 0
+        self._refreshed_at = None
+        self._stop = threading.Event()
+        self.readings = 0
+        self.emits = 0
+        self.max_lag = 0.0
 
-        cycle_count = 0
-        while True:
-            industries = Industry.query.all()
-            if not industries:
-                time.sleep(5)
-                continue
-
-            with _lock:
-                current_industry_index = current_industry_index % len(industries)
-                industry = industries[current_industry_index]
-
-            limits = SafeLimit.query.filter_by(
-                industry_type=industry.industry_type
-            ).first()
-
-            if not limits:
-                with _lock:
-                    current_industry_index += 1
-                time.sleep(2)
-                continue
-
-            # Traveling state
-            with _lock:
-                current_drone_state = 'traveling'
-            socketio.emit('drone_state', {
+    # ── Scheduling ────────────────────────────────────────────────────────────
+    def _schedule(self, drone, sim_seconds, now):
+        self._seq += 1
+        heapq.heappush(self._heap, (now + sim_seconds / self.time_scale, self._seq, drone))
+
+    def _clock(self, ts=None):
+        """Scheduler time: simulated seconds, so visit ages follow `time_scale`."""
+        ts = ts or datetime.utcnow()
+        return (ts - datetime(1970, 1, 1)).total_seconds() * self.time_scale
+
+    def _refresh(self, now):
+        """
+        Re-sync the scheduler's sites and fold in each industry's latest
+        reading, so readings from other sources re-rank sites too.
+        """
+        rows = industry_rows()
+        latest = {ind.id: r for ind, r, _ in rows if r is not None}
+        self.scheduler.sync([Site(i.id, i.name, i.industry_type, i.lat, i.lng) for i, _, _ in rows],
+                            self._clock(), {i: self._clock(r.timestamp) for i, r in latest.items()})
+        for ind, _, _ in rows:
+            r = latest.get(ind.id)
+            if r is not None:
+                limits = limit_registry.get(ind.industry_type)
+                self.scheduler.observe(ind.id, r.is_violation, compliance_score(r, limits),
+                                       self._clock(r.timestamp), seen=r.timestamp)
+        db.session.remove()
+        self._refreshed_at = now
+
+    def _emit(self, event, payload):
+        socketio.emit(event, payload)
+        SOCKET_EMITS.inc(event)
+        self.emits += 1
+
+    # ── Drone steps ───────────────────────────────────────────────────────────
+    def _step(self, drone, now):
+        if drone.state in ('idle', 'uploading'):
+            site = self.scheduler.next_stop(drone.id, drone.lat, drone.lng, self._clock())
+            if site is None:
+                self._schedule(drone, TRAVEL_SECONDS, now)
+                return
+            drone.industry = site
+            drone.limits = limit_registry.get(drone.industry.industry_type)
+            if not drone.limits:
+                self.scheduler.observe(site.id, None, None, self._clock())
+                drone.state = 'uploading'  # skip straight to the next industry
+                self._schedule(drone, NO_LIMITS_SKIP_SECONDS, now)
+                return
+            drone.state = 'traveling'
+            self._emit('drone_state', {
                 'state': 'traveling',
-                'industry_id': industry.id,
-                'industry_name': industry.name
-            })
-            time.sleep(5)
-
-            # Scanning state – emit readings every 5 seconds for ~20 seconds
-            with _lock:
-                current_drone_state = 'scanning'
-
-            scan_readings = []
-            for _ in range(4):
-                reading_data = _base_reading(limits)
-                violation = _is_violation(reading_data, limits)
-
-                record = SensorReading(
-                    industry_id=industry.id,
-                    gps_lat=industry.lat + random.uniform(-0.005, 0.005),
-                    gps_lng=industry.lng + random.uniform(-0.005, 0.005),
-                    is_violation=violation,
-                    **reading_data
-                )
-                db.session.add(record)
-                db.session.commit()
-                db.session.refresh(record)
-
-                payload = {
-                    'reading_id': record.id,
-                    'industry_id': industry.id,
-                    'industry_name': industry.name,
-                    'industry_type': industry.industry_type,
-                    'state': 'scanning',
-                    'timestamp': record.timestamp.isoformat(),
-                    'is_violation': violation,
-                    'limits': {
-                        'pm25': limits.pm25, 'pm10': limits.pm10,
-                        'no2': limits.no2, 'so2': limits.so2, 'co2': limits.co2
-                    },
-                    **reading_data
-                }
-                socketio.emit('drone_update', payload)
-                scan_readings.append(payload)
-                time.sleep(5)
-
-            # Uploading state
-            with _lock:
-                current_drone_state = 'uploading'
-            socketio.emit('drone_state', {
-                'state': 'uploading',
-                'industry_id': industry.id,
-                'industry_name': industry.name
+                'drone_id': drone.id,
+                'industry_id': drone.industry.id,
+                'industry_name': drone.industry.name
             })
-            time.sleep(3)
+            self._schedule(drone, TRAVEL_SECONDS, now)
 
-            # Move to next industry
-            with _lock:
-                current_industry_index = (current_industry_index + 1) % len(industries)
+        elif drone.state == 'traveling':
+            drone.lat, drone.lng = drone.industry.lat, drone.industry.lng
+            drone.state = 'scanning'
+            drone.samples_left = SCAN_SAMPLES
+            self._scan(drone, now)
 
-            cycle_count += 1
+        elif drone.state == 'scanning':
+            if drone.samples_left:
+                self._scan(drone, now)
+            else:
+                drone.state = 'uploading'
+                self._emit('drone_state', {
+                    'state': 'uploading',
+                    'drone_id': drone.id,
+                    'industry_id': drone.industry.id,
+                    'industry_name': drone.industry.name
+                })
+                self._schedule(drone, UPLOAD_SECONDS, now)
+
+    def _scan(self, drone, now):
+        industry, limits = drone.industry, drone.limits
+        reading_data = _base_reading(limits)
+        violation = is_violation(reading_data, limits)
+        row = {
+            'industry_id': industry.id,
+            'gps_lat': industry.lat + self.rng.uniform(-0.005, 0.005),
+            'gps_lng': industry.lng + self.rng.uniform(-0.005, 0.005),
+            'is_violation': violation,
+            **reading_data
+        }
+        payload = {
+            'drone_id': drone.id,
+            'industry_id': industry.id,
+            'industry_name': industry.name,
+            'industry_type': industry.industry_type,
+            'state': 'scanning',
+            'timestamp': None,
+            'is_violation': violation,
+            'limits': {
+                'pm25': limits.pm25, 'pm10': limits.pm10,
+                'no2': limits.no2, 'so2': limits.so2, 'co2': limits.co2
+            },
+            **reading_data
+        }
+
+        def _written(fut):
+            try:
+                payload['reading_id'] = fut.result()
+            except Exception as e:
+                print(f'[SIMULATION] Reading for {industry.name} not stored: {e}')
+                return
+            fanout = get_fanout()
+            if fanout is not None:
+                fanout.publish(payload)
+                self.emits += 1
+
+        drone.samples_left -= 1
+        self._schedule(drone, SCAN_INTERVAL_SECONDS, now)
+        try:
+            fut = get_writer().submit(row)
+        except queue.Full:
+            # Backpressure: lose this sample rather than the drone
+            SIM_DROPPED.inc()
+            print(f'[SIMULATION] Writer saturated, dropped a reading for {industry.name}')
+            return
+        payload['timestamp'] = row['timestamp'].isoformat()
+        self.scheduler.observe(industry.id, violation, compliance_score(reading_data, limits),
+                               self._clock(row['timestamp']), seen=row['timestamp'])
+        fut.add_done_callback(_written)
+        self.readings += 1
+
+    # ── Loop ──────────────────────────────────────────────────────────────────
+    def run(self):
+        with app.app_context():
+            now = time.monotonic()
+            self._refresh(now)
+            for drone in self.drones:
+                # Stagger take-offs across the first tick window
+                self._schedule(drone, self.rng.uniform(0, self.tick) * self.time_scale, now)
+
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if now - self._refreshed_at >= REFRESH_SECONDS:
+                    self._refresh(now)
+                while self._heap and self._heap[0][0] <= now:
+                    due, _, drone = heapq.heappop(self._heap)
+                    self.max_lag = max(self.max_lag, now - due)
+                    SIM_LAG.observe(now - due)
+                    try:
+                        self._step(drone, now)
+                    except Exception as e:
+                        print(f'[SIMULATION] Drone {drone.id} step failed: {e}')
+                        db.session.rollback()
+                        # Back to the scheduler for a fresh stop, or the drone is lost
+                        drone.state = 'idle'
+                        if all(d is not drone for _, _, d in self._heap):
+                            self._schedule(drone, TRAVEL_SECONDS, now)
+                wait = self.tick if not self._heap else min(self.tick, self._heap[0][0] - time.monotonic())
+                if wait > 0:
+                    self._stop.wait(wait)
+
+    def stop(self):
+        self._stop.set()
 
 
 def start_simulation(flask_app, flask_socketio, flask_db, industry_model,
                      sensor_model, safelimit_model):
-    global socketio, app, db, Industry, SensorReading, SafeLimit
+    global socketio, app, db, Industry, SensorReading, SafeLimit, fleet
     socketio = flask_socketio
     app = flask_app
     db = flask_db
@@ -149,6 +262,18 @@ def start_simulation(flask_app, flask_socketio, flask_db, industry_model,
     SensorReading = sensor_model
     SafeLimit = safelimit_model
 
-    t = threading.Thread(target=simulation_loop, daemon=True)
+    fleet = FleetSimulator(
+        drones=int(os.getenv('SIM_DRONES', 1)),
+        tick_hz=float(os.getenv('SIM_TICK_HZ', 10)),
+        time_scale=float(os.getenv('SIM_TIME_SCALE', 1)),
+    )
+
+    def _run():
+        time.sleep(3)  # Wait for DB to be fully initialised
+        fleet.run()
+
+    t = threading.Thread(target=_run, name='drone-fleet', daemon=True)
     t.start()
-    print("[SIMULATION] Drone simulation started.")
+    print(f"[SIMULATION] Drone simulation started ({len(fleet.drones)} drone(s), "
+          f"{os.getenv('SIM_SCHEDULER', 'risk')} scheduler).")
+    return fleet
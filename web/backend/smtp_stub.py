@@ -0,0 +1,129 @@
+"""
+In-process SMTP stand-in for exercising the outbox without a real relay.
+
+Speaks just enough SMTP for smtplib (EHLO/HELO, AUTH, MAIL, RCPT, DATA,
+NOOP, RSET, QUIT), keeps every accepted message in memory and can be told
+to fail the next N messages to drive the retry path. No STARTTLS, so point
+the app at it with SMTP_STARTTLS=0 and SMTP_RELAY=1.
+
+    python smtp_stub.py [port]     # standalone, prints each message received
+"""
+import socketserver
+import sys
+import threading
+from email import message_from_bytes
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        stub = self.server.stub
+        with stub.lock:
+            stub.connections += 1
+        self._reply('220 aerosense-stub ESMTP')
+        sender, rcpts = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode(errors='replace').strip()
+            verb = cmd.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self.wfile.write(b'250-aerosense-stub\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n')
+            elif verb == 'HELO':
+                self._reply('250 aerosense-stub')
+            elif verb == 'AUTH':
+                parts = cmd.split()
+                if parts[1].upper() == 'LOGIN' and len(parts) == 2:
+                    self._reply('334 VXNlcm5hbWU6')
+                    self.rfile.readline()
+                if parts[1].upper() == 'LOGIN':
+                    self._reply('334 UGFzc3dvcmQ6')
+                    self.rfile.readline()
+                self._reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                sender, rcpts = cmd.split(':', 1)[1].strip(), []
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                rcpts.append(cmd.split(':', 1)[1].strip())
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b'.\r\n', b'.\n', b''):
+                        break
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                if stub.take_failure():
+                    self._reply('451 Requested action aborted: local error')
+                else:
+                    stub.accept(sender, rcpts, b''.join(lines))
+                    self._reply('250 OK: queued')
+            elif verb in ('NOOP', 'RSET'):
+                if verb == 'RSET':
+                    sender, rcpts = None, []
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SmtpStub:
+    def __init__(self, host='127.0.0.1', port=0, verbose=False):
+        self._server = _Server((host, port), _Handler)
+        self._server.stub = self
+        self.host, self.port = self._server.server_address
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self._failures = 0
+
+    def settings(self):
+        """smtp_settings()-shaped dict pointing at this stub."""
+        return {'host': self.host, 'port': self.port, 'user': '', 'password': '',
+                'sender': 'notices@aerosense.local', 'starttls': False}
+
+    def fail_next(self, n):
+        with self.lock:
+            self._failures += n
+
+    def take_failure(self):
+        with self.lock:
+            if self._failures:
+                self._failures -= 1
+                return True
+            return False
+
+    def accept(self, sender, rcpts, raw):
+        msg = message_from_bytes(raw)
+        with self.lock:
+            self.messages.append({'from': sender, 'to': rcpts, 'subject': msg['Subject'],
+                                  'size': len(raw)})
+        if self.verbose:
+            print(f"[SMTP-STUB] {sender} -> {', '.join(rcpts)}: {msg['Subject']} ({len(raw)} B)")
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='smtp-stub', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == '__main__':
+    stub = SmtpStub(port=int(sys.argv[1]) if len(sys.argv) > 1 else 2525, verbose=True)
+    print(f'[SMTP-STUB] Listening on {stub.host}:{stub.port} '
+          f'(SMTP_HOST={stub.host} SMTP_PORT={stub.port} SMTP_STARTTLS=0 SMTP_RELAY=1)')
+    stub._server.serve_forever()
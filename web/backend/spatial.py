@@ -0,0 +1,146 @@
+"""
+Spatial queries over the grid cell columns (see grid.py).
+
+Industries are found through ix_industries_cell, one index range per grid
+row the search box spans, and readings through ix_sensor_readings_cell_ts,
+which seeks each candidate cell straight to the time window. Exact
+distances are only computed for the candidates. Violation tiles aggregate
+the rollup tables, never raw readings.
+"""
+from datetime import timedelta
+
+import numpy as np
+from sqlalchemy import func, or_, tuple_
+
+import grid
+from models import db, Industry, IndustrySummary, ReadingRollup, SensorReading
+from rollups import bucket_start
+
+MAX_ROW_RANGES = 64          # wider boxes (country views) just filter on lat/lng
+MAX_READING_CELLS = 2500     # ~270 km across at the default grid size
+MAX_ZOOM = 22
+TILE_BINS = 8                # per side: 32 px bins on a 256 px tile
+HOURLY_TILE_SPAN = timedelta(days=2)   # longer windows count day rollups
+
+
+def _within(column_lat, column_lng, column_cell, min_lat, min_lng, max_lat, max_lng):
+    """Filters for points inside the box, through the cell index when it is selective."""
+    filters = [column_lat.between(min_lat, max_lat), column_lng.between(min_lng, max_lng)]
+    ranges = grid.cell_ranges(min_lat, min_lng, max_lat, max_lng)
+    if len(ranges) <= MAX_ROW_RANGES:
+        filters.insert(0, or_(*[column_cell == lo if lo == hi else column_cell.between(lo, hi)
+                                for lo, hi in ranges]))
+    return filters
+
+
+def _industry_within(min_lat, min_lng, max_lat, max_lng):
+    return _within(Industry.lat, Industry.lng, Industry.cell, min_lat, min_lng, max_lat, max_lng)
+
+
+# ── Industries ────────────────────────────────────────────────────────────────
+def industries_in_bbox(min_lat, min_lng, max_lat, max_lng, limit):
+    query = Industry.query.filter(*_industry_within(min_lat, min_lng, max_lat, max_lng))
+    if len(grid.cell_ranges(min_lat, min_lng, max_lat, max_lng)) > MAX_ROW_RANGES:
+        return query.order_by(Industry.id).limit(limit).all()
+    # An ORDER BY id here would make SQLite walk the primary key instead of
+    # the cell ranges; the box holds few enough rows to sort them here
+    return sorted(query.all(), key=lambda ind: ind.id)[:limit]
+
+
+def industries_near(lat, lng, radius_km, limit):
+    """[(industry, distance_km)] within the radius, nearest first."""
+    candidates = Industry.query.filter(*_industry_within(*grid.bbox_around(lat, lng, radius_km))).all()
+    found = [(ind, grid.haversine_km(lat, lng, ind.lat, ind.lng)) for ind in candidates]
+    found = [(ind, d) for ind, d in found if d <= radius_km]
+    found.sort(key=lambda item: item[1])
+    return found[:limit]
+
+
+# ── Readings ──────────────────────────────────────────────────────────────────
+def readings_near_query(cells, start, end, limit, before=None):
+    query = SensorReading.query.filter(SensorReading.cell.in_(cells),
+                                       SensorReading.timestamp >= start,
+                                       SensorReading.timestamp < end)
+    if before is not None:
+        query = query.filter(tuple_(SensorReading.timestamp, SensorReading.id) < tuple_(*before))
+    return query.order_by(SensorReading.timestamp.desc(), SensorReading.id.desc()).limit(limit)
+
+
+def readings_near(lat, lng, radius_km, start, end, limit):
+    """
+    [(reading, distance_km)] taken within the radius in [start, end), newest
+    first. Raises ValueError when the circle covers too many cells.
+    """
+    box = grid.bbox_around(lat, lng, radius_km)
+    ranges = grid.cell_ranges(*box)
+    if grid.cell_count(ranges) > MAX_READING_CELLS:
+        raise ValueError(f'radius covers more than {MAX_READING_CELLS} grid cells')
+    cells = grid.cells(ranges)
+    found, before = [], None
+    while len(found) < limit:
+        page = readings_near_query(cells, start, end, limit, before).all()
+        for r in page:
+            d = grid.haversine_km(lat, lng, r.gps_lat, r.gps_lng)
+            if d <= radius_km:
+                found.append((r, d))
+        if len(page) < limit:
+            break
+        before = (page[-1].timestamp, page[-1].id)
+    return found[:limit]
+
+
+# ── Violation tiles ───────────────────────────────────────────────────────────
+def _violations(filters, start=None, end=None):
+    """(industry id, lat, lng, violations) for industries matching `filters`."""
+    if start is None:
+        return (db.session.query(Industry.id, Industry.lat, Industry.lng,
+                                 func.coalesce(IndustrySummary.violations_count, 0))
+                .outerjoin(IndustrySummary, IndustrySummary.industry_id == Industry.id)
+                .filter(*filters)
+                .all())
+    resolution = 'hour' if end - start <= HOURLY_TILE_SPAN else 'day'
+    counts = (db.session.query(ReadingRollup.industry_id, func.sum(ReadingRollup.violations))
+              .join(Industry, Industry.id == ReadingRollup.industry_id)
+              .filter(*filters,
+                      ReadingRollup.resolution == resolution,
+                      ReadingRollup.bucket >= bucket_start(start, resolution),
+                      ReadingRollup.bucket < end)
+              .group_by(ReadingRollup.industry_id)
+              .all())
+    counts = dict(counts)
+    return [(i, lat, lng, counts.get(i, 0))
+            for i, lat, lng in db.session.query(Industry.id, Industry.lat, Industry.lng).filter(*filters)]
+
+
+def violation_tile(z, x, y, start=None, end=None):
+    """Industries and violation counts of a slippy-map tile, binned TILE_BINS x TILE_BINS."""
+    min_lat, min_lng, max_lat, max_lng = grid.tile_bbox(z, x, y)
+    rows = _violations(_industry_within(min_lat, min_lng, max_lat, max_lng), start, end)
+    tile = {'z': z, 'x': x, 'y': y, 'bbox': [min_lng, min_lat, max_lng, max_lat],
+            'industries': len(rows), 'violations': 0, 'bins': []}
+    if not rows:
+        return tile
+    ids, lat, lng, violations = (np.array(col) for col in zip(*rows))
+    violations = violations.astype(np.int64)
+    fx, fy = grid.tile_positions(lat, lng, z)
+    bx = np.clip(((fx - x) * TILE_BINS).astype(np.int64), 0, TILE_BINS - 1)
+    by = np.clip(((fy - y) * TILE_BINS).astype(np.int64), 0, TILE_BINS - 1)
+    key = by * TILE_BINS + bx
+    size = TILE_BINS * TILE_BINS
+    count = np.bincount(key, minlength=size)
+    total = np.bincount(key, weights=violations, minlength=size)
+    lat_sum = np.bincount(key, weights=lat, minlength=size)
+    lng_sum = np.bincount(key, weights=lng, minlength=size)
+    # Worst industry per bin: sort by violations, last write per bin wins
+    order = np.argsort(violations, kind='stable')
+    top = np.zeros(size, dtype=np.int64)
+    top[key[order]] = ids[order]
+    for k in np.flatnonzero(count):
+        tile['bins'].append({
+            'bx': int(k % TILE_BINS), 'by': int(k // TILE_BINS),
+            'industries': int(count[k]), 'violations': int(total[k]),
+            'lat': round(float(lat_sum[k] / count[k]), 5), 'lng': round(float(lng_sum[k] / count[k]), 5),
+            'top_industry_id': int(top[k]),
+        })
+    tile['violations'] = int(violations.sum())
+    return tile
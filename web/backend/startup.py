@@ -0,0 +1,115 @@
+"""
+Startup profiling.
+
+With STARTUP_PROFILE=1 every module imported after this one (app.py imports
+it first) is timed, cumulative and self, and `step()` blocks time the
+server's initialisation; `report()` prints both and stops timing imports.
+Off by default, when importing this module only reads the setting.
+
+    STARTUP_PROFILE=1 python app.py     # report printed before the server starts
+    python startup.py                   # import app and seed, then report
+"""
+import builtins
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+ENABLED = os.getenv('STARTUP_PROFILE', '0').lower() not in ('', '0', 'false', 'no')
+TOP = int(os.getenv('STARTUP_PROFILE_TOP', 15))
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_original_import = builtins.__import__
+_started = time.perf_counter()
+_imports = {}   # module name -> (cumulative seconds, self seconds)
+_steps = []     # (name, seconds)
+_children = []  # seconds spent in nested imports, one entry per import in progress
+
+
+def _resolve(name, globals, level):
+    if not level:
+        return name
+    package = (globals or {}).get('__package__') or ''
+    base = package.rsplit('.', level - 1)[0] if level > 1 else package
+    return f'{base}.{name}' if name else base
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    absolute = _resolve(name, globals, level)
+    if absolute in sys.modules and not fromlist:
+        return _original_import(name, globals, locals, fromlist, level)
+    # `from package import submodule` can load a module without naming it
+    pending = [absolute] + [f'{absolute}.{f}' for f in fromlist or () if f != '*']
+    pending = [m for m in pending if m not in sys.modules]
+    if not pending:
+        return _original_import(name, globals, locals, fromlist, level)
+    _children.append(0.0)
+    t0 = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        elapsed = time.perf_counter() - t0
+        nested = _children.pop()
+        if _children:
+            _children[-1] += elapsed
+        loaded = [m for m in pending if m in sys.modules]
+        if loaded:
+            _imports[loaded[0]] = (elapsed, elapsed - nested)
+
+
+if ENABLED:
+    builtins.__import__ = _timed_import
+
+
+@contextmanager
+def step(name):
+    """Time an initialisation step for the report."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if ENABLED:
+            _steps.append((name, time.perf_counter() - t0))
+
+
+def _is_backend(name):
+    path = getattr(sys.modules.get(name), '__file__', None) or ''
+    return path.startswith(BACKEND_DIR + os.sep)
+
+
+def report():
+    """Print import and initialisation times, then stop timing imports."""
+    if not ENABLED:
+        return
+    builtins.__import__ = _original_import
+    total = time.perf_counter() - _started
+    own = sorted(((n, c, s) for n, (c, s) in _imports.items() if _is_backend(n)),
+                 key=lambda item: item[1], reverse=True)
+    packages = {}
+    for n, (c, s) in _imports.items():
+        if not _is_backend(n):
+            top = n.split('.')[0]
+            packages[top] = packages.get(top, 0.0) + s
+
+    print(f'[STARTUP] Ready in {total * 1000:.0f} ms, {len(_imports)} modules imported')
+    print(f"[STARTUP] {'backend module':<24} {'cumulative ms':>14} {'self ms':>9}")
+    for n, c, s in own:
+        print(f'[STARTUP] {n:<24} {c * 1000:>14.1f} {s * 1000:>9.1f}')
+    print(f"[STARTUP] {'package (top ' + str(TOP) + ')':<24} {'self ms':>14}")
+    for n, s in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:TOP]:
+        print(f'[STARTUP] {n:<24} {s * 1000:>14.1f}')
+    print(f"[STARTUP] {'init step':<24} {'ms':>14}")
+    for n, s in _steps:
+        print(f'[STARTUP] {n:<24} {s * 1000:>14.1f}')
+
+
+if __name__ == '__main__':
+    # Re-imported under its own name so app.py sees the enabled profiler
+    os.environ['STARTUP_PROFILE'] = '1'
+    import startup
+    with startup.step('import app'):
+        from app import app
+    from seed import seed
+    with startup.step('seed'):
+        seed(app)
+    startup.report()
@@ -0,0 +1,115 @@
+from datetime import datetime
+
+from sqlalchemy import select, delete, func, or_, and_, case
+from sqlalchemy.dialects import postgresql, sqlite
+
+import archive
+from models import db, Industry, SensorReading, IndustrySummary
+
+
+# ── Read side ────────────────────────────────────────────────────────────────
+def industry_rows():
+    """
+    Returns [(industry, latest_reading|None, violations_count)] for every
+    industry using a single joined query against the rollup table.
+    """
+    rows = (db.session.query(Industry, SensorReading, IndustrySummary.violations_count,
+                             IndustrySummary.last_reading_at)
+            .outerjoin(IndustrySummary, IndustrySummary.industry_id == Industry.id)
+            .outerjoin(SensorReading, SensorReading.id == IndustrySummary.latest_reading_id)
+            .order_by(Industry.id)
+            .all())
+    result = []
+    for ind, latest, count, last_at in rows:
+        if latest is None and last_at is not None:
+            latest = _archived_latest(ind.id)
+        result.append((ind, latest, count or 0))
+    return result
+
+
+def _archived_latest(industry_id):
+    """An industry whose readings are all archived: its last one, as a detached SensorReading."""
+    rows = archive.latest(industry_id, 1)
+    if not rows:
+        return None
+    return SensorReading(**{**rows[0], 'timestamp': datetime.fromisoformat(rows[0]['timestamp'])})
+
+
+# ── Write side ───────────────────────────────────────────────────────────────
+def apply_readings(rows):
+    """
+    Fold freshly inserted readings into the rollup. `rows` are mappings with
+    id, industry_id, timestamp and is_violation. Runs inside the caller's
+    transaction so the rollup commits atomically with the readings.
+    """
+    by_industry = {}
+    for r in rows:
+        entry = by_industry.setdefault(r['industry_id'], [None, 0])
+        if entry[0] is None or r['timestamp'] >= entry[0]['timestamp']:
+            entry[0] = r
+        if r['is_violation']:
+            entry[1] += 1
+
+    if by_industry:
+        db.session.execute(_upsert_statement(db.engine.dialect.name), [{
+            'industry_id': i, 'latest_reading_id': latest['id'],
+            'last_reading_at': latest['timestamp'], 'violations_count': violations,
+        } for i, (latest, violations) in by_industry.items()])
+
+
+def _upsert_statement(dialect_name):
+    # One statement, so two writers folding the same new industry cannot
+    # both take the INSERT path and fail the second batch on the key
+    t = IndustrySummary.__table__
+    if dialect_name == 'postgresql':
+        stmt = postgresql.insert(t)
+    elif dialect_name == 'sqlite':
+        stmt = sqlite.insert(t)
+    else:
+        raise NotImplementedError(f'Summaries need SQLite or PostgreSQL, not {dialect_name}')
+    new = stmt.excluded
+    newer = or_(t.c.last_reading_at.is_(None), t.c.last_reading_at <= new.last_reading_at)
+    return stmt.on_conflict_do_update(
+        index_elements=[t.c.industry_id],
+        set_={'violations_count': t.c.violations_count + new.violations_count,
+              'latest_reading_id': case((newer, new.latest_reading_id), else_=t.c.latest_reading_id),
+              'last_reading_at': case((newer, new.last_reading_at), else_=t.c.last_reading_at)},
+    )
+
+
+def rebuild():
+    """Recompute the whole rollup from sensor_readings with set-based queries."""
+    latest_ts = (select(SensorReading.industry_id,
+                        func.max(SensorReading.timestamp).label('ts'))
+                 .group_by(SensorReading.industry_id)
+                 .subquery())
+    latest = {industry_id: (reading_id, ts) for industry_id, reading_id, ts in db.session.execute(
+        select(SensorReading.industry_id, func.max(SensorReading.id), latest_ts.c.ts)
+        .join(latest_ts, and_(latest_ts.c.industry_id == SensorReading.industry_id,
+                              latest_ts.c.ts == SensorReading.timestamp))
+        .group_by(SensorReading.industry_id, latest_ts.c.ts)
+    )}
+    counts = dict(db.session.execute(
+        select(SensorReading.industry_id, func.count())
+        .where(SensorReading.is_violation == db.true())
+        .group_by(SensorReading.industry_id)
+    ).all())
+    for industry_id, n in archive.violation_counts().items():
+        counts[industry_id] = counts.get(industry_id, 0) + n
+
+    rows = []
+    known = set(db.session.scalars(select(Industry.id)))
+    for industry_id in sorted((set(latest) | set(counts) | set(archive.industry_ids())) & known):
+        reading_id, ts = latest.get(industry_id, (None, None))
+        if reading_id is None:
+            # Everything is archived: the pointer can only reference hot rows,
+            # but the time of the last reading is kept
+            archived = archive.latest(industry_id, 1)
+            ts = datetime.fromisoformat(archived[0]['timestamp']) if archived else None
+        rows.append({'industry_id': industry_id, 'latest_reading_id': reading_id,
+                     'last_reading_at': ts, 'violations_count': counts.get(industry_id, 0)})
+
+    db.session.execute(delete(IndustrySummary))
+    if rows:
+        db.session.execute(IndustrySummary.__table__.insert(), rows)
+    db.session.commit()
@@ -0,0 +1,57 @@
+"""
+Shared fixtures; run the suite from web/backend with `python -m pytest`.
+app.py reads DATABASE_URL when it is imported, so the environment points at
+a scratch directory before anything from the backend is imported; the
+database is migrated and seeded once per session.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRATCH = tempfile.mkdtemp(prefix='aerosense-tests-')
+
+sys.path.insert(0, BACKEND_DIR)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(SCRATCH, 'test.db')}"
+os.environ['ARCHIVE_DIR'] = os.path.join(SCRATCH, 'archive')
+os.environ['JWT_SECRET_KEY'] = uuid.uuid4().hex
+for name in ('SMTP_HOST', 'SMTP_USER', 'SMTP_PASS', 'SMTP_RELAY'):
+    os.environ.pop(name, None)
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app
+    from seed import seed
+    seed(app)
+    yield app
+    shutil.rmtree(SCRATCH, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def auth(app):
+    resp = app.test_client().post('/api/login', json={'username': 'admin', 'password': 'admin123'})
+    return {'Authorization': f"Bearer {resp.get_json()['token']}"}
+
+
+@pytest.fixture
+def industry(app):
+    """A fresh industry with no readings, so tests never see each other's data."""
+    from models import db, Industry
+    with app.app_context():
+        ind = Industry(name=f'Test {uuid.uuid4().hex[:8]}', industry_type='Steel Industry',
+                       location='Test', contact_email='env@example.com', lat=21.0, lng=78.0)
+        db.session.add(ind)
+        db.session.commit()
+        industry_id = ind.id
+        db.session.remove()
+    return industry_id
@@ -0,0 +1,117 @@
+import json
+from datetime import timedelta
+
+from cache import ResponseCache, response_cache, invalidate_on_commit
+from models import db, Industry
+
+
+# ── Generations ───────────────────────────────────────────────────────────────
+def test_bump_changes_only_its_scopes():
+    cache = ResponseCache()
+    a, b = cache.tag(('industry:1',)), cache.tag(('industry:2',))
+    cache.bump('industry:1')
+    assert cache.tag(('industry:1',)) != a
+    assert cache.tag(('industry:2',)) == b
+
+
+def test_clear_changes_every_tag():
+    cache = ResponseCache()
+    cache.put(('/x', 't'), (b'', 200, []))
+    before = cache.tag(('industry:1',))
+    cache.clear()
+    assert cache.tag(('industry:1',)) != before
+    assert cache.get(('/x', 't')) is None
+
+
+def test_scopes_bump_on_commit_not_on_rollback(app):
+    with app.app_context():
+        tag = response_cache.tag(('test-scope',))
+        invalidate_on_commit(db.session, 'test-scope')
+        db.session.rollback()
+        assert response_cache.tag(('test-scope',)) == tag
+
+        invalidate_on_commit(db.session, 'test-scope')
+        assert response_cache.tag(('test-scope',)) == tag
+        db.session.commit()
+        assert response_cache.tag(('test-scope',)) != tag
+
+
+# ── Cached views ──────────────────────────────────────────────────────────────
+def test_etag_answers_304(client, industry):
+    first = client.get(f'/api/industries/{industry}')
+    assert first.status_code == 200 and first.headers['ETag']
+    again = client.get(f'/api/industries/{industry}', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert again.headers['ETag'] == first.headers['ETag']
+
+
+def freeze(monkeypatch, seconds=0):
+    now = ResponseCache._now() + timedelta(seconds=seconds)
+    monkeypatch.setattr(ResponseCache, '_now', staticmethod(lambda: now))
+    return now
+
+
+def test_last_modified_answers_304(client, industry, monkeypatch):
+    freeze(monkeypatch, 2)
+    first = client.get(f'/api/industries/{industry}')
+    again = client.get(f'/api/industries/{industry}',
+                       headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert again.status_code == 304
+
+
+def test_no_last_modified_from_the_current_second(client, auth, industry, monkeypatch):
+    now = freeze(monkeypatch)
+    client.post('/api/comment', headers=auth, json={'industry_id': industry, 'comment': 'First'})
+    first = client.get(f'/api/comments/{industry}', headers=auth)
+    assert 'Last-Modified' not in first.headers
+    # A second write in the same second leaves the date unchanged
+    client.post('/api/comment', headers=auth, json={'industry_id': industry, 'comment': 'Second'})
+    since = now.strftime('%a, %d %b %Y %H:%M:%S GMT')
+    again = client.get(f'/api/comments/{industry}', headers={**auth, 'If-Modified-Since': since})
+    assert again.status_code == 200
+    assert len(again.get_json()) == 2
+
+
+def test_repeat_request_served_from_cache(client, industry):
+    client.get(f'/api/industries/{industry}')
+    hits = response_cache.hits
+    assert client.get(f'/api/industries/{industry}').status_code == 200
+    assert response_cache.hits == hits + 1
+
+
+def test_comment_invalidates_its_industry(client, auth, industry):
+    other = client.get('/api/industries/1')
+    first = client.get(f'/api/comments/{industry}', headers=auth)
+    assert first.get_json() == []
+
+    resp = client.post('/api/comment', headers=auth,
+                       json={'industry_id': industry, 'comment': 'Stack emissions over limit'})
+    assert resp.status_code == 200
+
+    after = client.get(f'/api/comments/{industry}', headers={**auth, 'If-None-Match': first.headers['ETag']})
+    assert after.status_code == 200
+    assert [c['comment'] for c in after.get_json()] == ['Stack emissions over limit']
+    assert after.headers['ETag'] != first.headers['ETag']
+    # Other industries keep their validators
+    assert client.get('/api/industries/1', headers={'If-None-Match': other.headers['ETag']}).status_code == 304
+
+
+def test_ingest_invalidates_history(client, auth, industry):
+    first = client.get(f'/api/history/{industry}')
+    assert first.get_json() == []
+    batch = [{'industry_id': industry, 'pm25': 10, 'pm10': 10, 'no2': 10, 'so2': 10, 'co2': 10}]
+    client.post('/api/readings/batch', data=json.dumps(batch), headers=auth, content_type='application/json')
+    after = client.get(f'/api/history/{industry}', headers={'If-None-Match': first.headers['ETag']})
+    assert after.status_code == 200
+    assert len(after.get_json()) == 1
+
+
+def test_industry_edit_invalidates_list(app, client, industry):
+    first = client.get('/api/industries')
+    with app.app_context():
+        db.session.get(Industry, industry).location = 'Moved'
+        db.session.commit()
+    after = client.get('/api/industries', headers={'If-None-Match': first.headers['ETag']})
+    assert after.status_code == 200
+    assert next(i for i in after.get_json() if i['id'] == industry)['location'] == 'Moved'
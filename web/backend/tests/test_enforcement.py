@@ -0,0 +1,53 @@
+import json
+import uuid
+from datetime import datetime
+
+import enforcement
+from models import db, AdminComment, EmailJob, Industry
+
+
+def violating_industry(app, client, auth, email):
+    with app.app_context():
+        ind = Industry(name=f'Test {uuid.uuid4().hex[:8]}', industry_type='Thermal Plant',
+                       location='Test', contact_email=email, lat=21.0, lng=78.0)
+        db.session.add(ind)
+        db.session.commit()
+        industry_id = ind.id
+    batch = [{'industry_id': industry_id, 'pm25': 500, 'pm10': 10, 'no2': 10, 'so2': 10, 'co2': 10}]
+    resp = client.post('/api/readings/batch', data=json.dumps(batch), headers=auth,
+                       content_type='application/json')
+    assert resp.status_code == 201
+    return industry_id
+
+
+def test_run_skips_industries_without_email(app, client, auth):
+    with_email = violating_industry(app, client, auth, 'plant@example.com')
+    without = violating_industry(app, client, auth, None)
+
+    run = enforcement.EnforcementRun(app, None, 'admin', industry_type='Thermal Plant')
+    run._run()
+    assert run.status == 'done', run.error
+    assert without in run.as_dict()['skipped_no_email']
+    assert with_email not in run.skipped_no_email
+
+    with app.app_context():
+        jobs = EmailJob.query.filter(EmailJob.id.in_(run.job_ids)).all()
+        assert 'plant@example.com' in [j.to_email for j in jobs]
+        assert len(jobs) == run.total
+        assert AdminComment.query.filter_by(industry_id=with_email).count() == 1
+        assert AdminComment.query.filter_by(industry_id=without).count() == 0
+
+
+def test_finished_runs_are_bounded(app, monkeypatch):
+    monkeypatch.setattr(enforcement, 'runs', {})
+    monkeypatch.setattr(enforcement, 'RUNS_KEPT', 2)
+    monkeypatch.setattr(enforcement.EnforcementRun, '_run', lambda self: None)
+
+    running = enforcement.EnforcementRun(app, None, 'admin').start()
+    made = []
+    for _ in range(3):
+        run = enforcement.EnforcementRun(app, None, 'admin')
+        run.finished_at = datetime.utcnow()
+        made.append(run.start())
+    # The oldest finished runs go; the unfinished one stays
+    assert list(enforcement.runs) == [running.id, made[2].id]
@@ -0,0 +1,132 @@
+import gzip
+import json
+
+import pytest
+
+import ingest
+from models import SensorReading
+
+READING = {'pm25': 30, 'pm10': 50, 'no2': 20, 'so2': 20, 'co2': 500}
+
+
+def post_batch(client, auth, body, content_type='application/json', **headers):
+    return client.post('/api/readings/batch', data=body, headers={**auth, **headers},
+                       content_type=content_type)
+
+
+# ── validate() ────────────────────────────────────────────────────────────────
+@pytest.mark.parametrize('record, error', [
+    ({'industry_id': True, **READING}, 'unknown industry_id True'),
+    ({'industry_id': 1.0, **READING}, 'unknown industry_id 1.0'),
+    ({'industry_id': 99, **READING}, 'unknown industry_id 99'),
+    ({'industry_id': 1, **READING, 'pm25': -1}, 'pm25 must be non-negative'),
+    ({'industry_id': 1, **READING, 'no2': '20'}, 'no2 must be a number'),
+    ({'industry_id': 1, **READING, 'so2': False}, 'so2 must be a number'),
+    ({'industry_id': 1, **READING, 'co2': float('nan')}, 'co2 must be finite'),
+    ({'industry_id': 1, **READING, 'timestamp': 'yesterday'}, None),
+    ([1, 2], 'reading must be an object'),
+])
+def test_validate_rejects(record, error):
+    rows, errors = ingest.validate([record], {1: ('Plant', 'Steel Industry')})
+    assert rows == []
+    assert errors[0]['index'] == 0
+    if error:
+        assert errors[0]['error'] == error
+
+
+def test_validate_accepts_missing_optional_fields():
+    rows, errors = ingest.validate([{'industry_id': 1, **READING}], {1: ('Plant', 'Steel Industry')})
+    assert errors == []
+    assert rows[0]['pm25'] == 30.0 and rows[0]['temperature'] is None
+
+
+def test_validate_caps_errors():
+    rows, errors = ingest.validate([{'industry_id': True}] * 200, {})
+    assert len(errors) == ingest.MAX_ERRORS
+
+
+# ── parse_batch() ─────────────────────────────────────────────────────────────
+def test_parse_ndjson_and_gzip():
+    lines = b'{"industry_id": 1}\n\n{"industry_id": 2}\n'
+    assert ingest.parse_batch(lines, 'application/x-ndjson') == [{'industry_id': 1}, {'industry_id': 2}]
+    body = gzip.compress(json.dumps({'readings': [{'industry_id': 3}]}).encode())
+    assert ingest.parse_batch(body, 'application/json', 'gzip') == [{'industry_id': 3}]
+
+
+def test_parse_refuses_gzip_bomb(monkeypatch):
+    monkeypatch.setattr(ingest, 'MAX_BATCH_BYTES', 1024)
+    body = gzip.compress(b'[' + b' ' * 4096 + b']')
+    assert len(body) < 1024
+    with pytest.raises(ingest.BatchTooLarge):
+        ingest.parse_batch(body, 'application/json', 'gzip')
+
+
+def test_parse_rejects_non_array():
+    with pytest.raises(ValueError):
+        ingest.parse_batch(b'"readings"')
+
+
+# ── POST /api/readings/batch ──────────────────────────────────────────────────
+def test_batch_inserts_and_scores(app, client, auth, industry):
+    batch = [{'industry_id': industry, **READING},
+             {'industry_id': industry, **READING, 'pm25': 500}]
+    resp = post_batch(client, auth, json.dumps(batch))
+    assert resp.status_code == 201
+    assert resp.get_json()['accepted'] == 2
+    assert resp.get_json()['violations'] == 1
+    with app.app_context():
+        assert SensorReading.query.filter_by(industry_id=industry).count() == 2
+
+
+def test_batch_is_all_or_nothing(app, client, auth, industry):
+    batch = [{'industry_id': industry, **READING}, {'industry_id': True, **READING}]
+    resp = post_batch(client, auth, json.dumps(batch))
+    assert resp.status_code == 400
+    assert resp.get_json()['details'] == [{'index': 1, 'error': 'unknown industry_id True'}]
+    with app.app_context():
+        assert SensorReading.query.filter_by(industry_id=industry).count() == 0
+
+
+def test_batch_requires_login(client):
+    assert client.post('/api/readings/batch', json=[]).status_code == 401
+
+
+def test_batch_malformed_json(client, auth):
+    resp = post_batch(client, auth, b'[{')
+    assert resp.status_code == 400
+    assert resp.get_json()['error'].startswith('Malformed batch')
+
+
+def test_batch_too_large_before_parsing(client, auth, monkeypatch):
+    import routes
+    monkeypatch.setattr(routes, 'MAX_BATCH_BYTES', 16)
+    monkeypatch.setattr(routes, 'parse_batch', lambda *a: pytest.fail('body was parsed'))
+    resp = post_batch(client, auth, json.dumps([{'industry_id': 1}] * 10))
+    assert resp.status_code == 413
+
+
+def test_batch_too_many_readings(client, auth, monkeypatch):
+    import routes
+    monkeypatch.setattr(routes, 'MAX_BATCH', 2)
+    resp = post_batch(client, auth, json.dumps([{'industry_id': 1}] * 3))
+    assert resp.status_code == 413
+
+
+# ── Socket subscriptions ──────────────────────────────────────────────────────
+def test_subscribe_rejects_bool_id(app, industry, monkeypatch):
+    import app as backend
+
+    class Fanout:
+        def subscribe(self, sid, ind, limits):
+            return {'industry_id': ind.id}
+
+        def forget(self, sid):
+            pass
+
+    monkeypatch.setattr(backend, 'get_fanout', lambda: Fanout())
+    sock = backend.socketio.test_client(app)
+    sock.emit('subscribe', {'industry_id': True})
+    sock.emit('subscribe', {'industry_id': industry})
+    events = [(e['name'], e['args'][0]['industry_id']) for e in sock.get_received()]
+    assert events == [('subscribe_error', True), ('subscribed', industry)]
+    sock.disconnect()
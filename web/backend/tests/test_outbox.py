@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from email_service import smtp_settings
+from models import db, EmailJob, Industry
+from outbox import OutboxDispatcher
+from smtp_stub import SmtpStub
+
+
+@pytest.fixture
+def stub():
+    stub = SmtpStub().start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def outbox(app):
+    """An empty outbox; the test's app context stays open for the dispatcher."""
+    with app.app_context():
+        EmailJob.query.delete()
+        db.session.commit()
+        yield
+        db.session.remove()
+
+
+def notify(client, auth, industry_id, **extra):
+    resp = client.post('/api/send-notice', headers=auth, json={'industry_id': industry_id, **extra})
+    assert resp.status_code == 202
+    return resp.get_json()['job_id']
+
+
+def job(job_id):
+    db.session.expire_all()
+    return db.session.get(EmailJob, job_id)
+
+
+def make_due(job_id):
+    job(job_id).next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+
+
+# ── Settings ──────────────────────────────────────────────────────────────────
+def test_relay_needs_opt_in(monkeypatch):
+    monkeypatch.setenv('SMTP_HOST', 'localhost')
+    assert smtp_settings() is None
+    monkeypatch.setenv('SMTP_RELAY', '1')
+    assert smtp_settings()['host'] == 'localhost'
+
+
+# ── /api/send-notice ──────────────────────────────────────────────────────────
+def test_notice_is_queued(client, auth, industry, outbox):
+    job_id = notify(client, auth, industry, email='officer@example.com')
+    status = client.get(f'/api/send-notice/{job_id}', headers=auth).get_json()
+    assert status['status'] == 'queued'
+    assert status['to_email'] == 'officer@example.com'
+    assert status['attempts'] == 0
+
+
+def test_notice_without_address_is_400(client, auth, industry, outbox):
+    ind = db.session.get(Industry, industry)
+    ind.contact_email = None
+    db.session.commit()
+    resp = client.post('/api/send-notice', headers=auth, json={'industry_id': industry})
+    assert resp.status_code == 400
+    assert EmailJob.query.count() == 0
+
+
+# ── Dispatcher ────────────────────────────────────────────────────────────────
+def test_sends_over_one_session(app, client, auth, industry, outbox, stub):
+    ids = [notify(client, auth, industry) for _ in range(3)]
+    dispatcher = OutboxDispatcher(app, pool_size=1, settings=stub.settings())
+    assert dispatcher.dispatch_once() == 3
+    assert [job(i).status for i in ids] == ['sent'] * 3
+    assert all(job(i).mode == 'smtp' and job(i).attempts == 1 for i in ids)
+    assert [m['to'] for m in stub.messages] == [['<env@example.com>']] * 3
+
+    notify(client, auth, industry)
+    assert dispatcher.dispatch_once() == 1
+    assert dispatcher.dispatch_once() == 0
+    # The session stayed open between batches
+    assert stub.connections == 1
+    dispatcher.pool.close()
+
+
+def test_failed_send_backs_off_then_succeeds(app, client, auth, industry, outbox, stub):
+    job_id = notify(client, auth, industry)
+    dispatcher = OutboxDispatcher(app, pool_size=1, backoff_base=10.0, settings=stub.settings())
+    stub.fail_next(2)
+
+    before = datetime.utcnow()
+    assert dispatcher.dispatch_once() == 1
+    first = job(job_id)
+    assert (first.status, first.attempts) == ('queued', 1)
+    assert '451' in first.last_error
+    assert timedelta(seconds=8) <= first.next_attempt_at - before <= timedelta(seconds=13)
+    # Not due yet
+    assert dispatcher.dispatch_once() == 0
+
+    make_due(job_id)
+    before = datetime.utcnow()
+    dispatcher.dispatch_once()
+    second = job(job_id)
+    assert (second.status, second.attempts) == ('queued', 2)
+    assert timedelta(seconds=16) <= second.next_attempt_at - before <= timedelta(seconds=25)
+
+    make_due(job_id)
+    dispatcher.dispatch_once()
+    done = job(job_id)
+    assert (done.status, done.attempts, done.last_error) == ('sent', 3, None)
+    assert done.sent_at is not None
+    assert len(stub.messages) == 1
+    assert (dispatcher.retried, dispatcher.sent) == (2, 1)
+    dispatcher.pool.close()
+
+
+def test_gives_up_after_max_attempts(app, client, auth, industry, outbox, stub):
+    job_id = notify(client, auth, industry)
+    dispatcher = OutboxDispatcher(app, pool_size=1, max_attempts=2, settings=stub.settings())
+    stub.fail_next(5)
+    dispatcher.dispatch_once()
+    make_due(job_id)
+    dispatcher.dispatch_once()
+    failed = job(job_id)
+    assert (failed.status, failed.attempts) == ('failed', 2)
+    make_due(job_id)
+    assert dispatcher.dispatch_once() == 0
+    assert stub.messages == []
+    dispatcher.pool.close()
+
+
+def test_dead_server_is_retried(app, client, auth, industry, outbox, stub):
+    job_id = notify(client, auth, industry)
+    settings = stub.settings()
+    stub.stop()
+    dispatcher = OutboxDispatcher(app, pool_size=1, settings=settings)
+    dispatcher.dispatch_once()
+    assert (job(job_id).status, job(job_id).attempts) == ('queued', 1)
+    dispatcher.pool.close()
+
+
+def test_demo_mode_logs_instead(app, client, auth, industry, outbox):
+    job_id = notify(client, auth, industry)
+    dispatcher = OutboxDispatcher(app)
+    assert dispatcher.pool is None
+    dispatcher.dispatch_once()
+    assert (job(job_id).status, job(job_id).mode) == ('sent', 'demo')
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from queries import encode_cursor, decode_cursor
+
+START = datetime(2026, 1, 1, 12, 0)
+
+
+def add_readings(client, auth, industry_id, timestamps, pm25=10):
+    batch = [{'industry_id': industry_id, 'pm25': pm25, 'pm10': 10, 'no2': 10, 'so2': 10, 'co2': 10,
+              'timestamp': ts.isoformat()} for ts in timestamps]
+    resp = client.post('/api/readings/batch', data=json.dumps(batch), headers=auth,
+                       content_type='application/json')
+    assert resp.status_code == 201
+    return list(range(resp.get_json()['first_id'], resp.get_json()['last_id'] + 1))
+
+
+def walk(client, url, **headers):
+    """Follow X-Next-Cursor to the end; returns the pages as id lists."""
+    pages, cursor = [], None
+    while True:
+        resp = client.get(url + (f'&cursor={cursor}' if cursor else ''), headers=headers)
+        assert resp.status_code == 200
+        pages.append([r['id'] for r in resp.get_json()])
+        cursor = resp.headers.get('X-Next-Cursor')
+        if cursor is None:
+            return pages
+
+
+# ── Cursors ───────────────────────────────────────────────────────────────────
+def test_cursor_round_trip():
+    reading = {'timestamp': START.isoformat(), 'id': 42}
+    assert decode_cursor(encode_cursor(reading)) == (START, 42)
+
+
+@pytest.mark.parametrize('cursor', ['', '!!!', 'bm90LWEtY3Vyc29y', 'MjAyNi0wMS0wMXx4', '_w'])
+def test_malformed_cursor(cursor):
+    with pytest.raises(ValueError, match='^invalid cursor$'):
+        decode_cursor(cursor)
+
+
+@pytest.mark.parametrize('url', ['/api/history/1', '/api/violations', '/api/anomalies'])
+def test_malformed_cursor_is_400(client, auth, url):
+    resp = client.get(f'{url}?cursor=bm90LWEtY3Vyc29y', headers=auth)
+    assert resp.status_code == 400
+    assert resp.get_json() == {'error': 'invalid cursor'}
+
+
+# ── History pages ─────────────────────────────────────────────────────────────
+def test_history_pages_cover_every_reading_once(client, auth, industry):
+    # Pairs of readings share a timestamp, so the id has to break ties
+    ids = add_readings(client, auth, industry, [START + timedelta(minutes=k // 2) for k in range(25)])
+    pages = walk(client, f'/api/history/{industry}?limit=10')
+    assert [len(p) for p in pages] == [10, 10, 5]
+    seen = [i for page in pages for i in page]
+    assert sorted(seen) == ids
+    # Newest page first; each page is oldest-first for charting
+    assert [i for page in pages for i in reversed(page)] == ids[::-1]
+
+
+def test_history_page_boundary_ignores_new_readings(client, auth, industry):
+    ids = add_readings(client, auth, industry, [START + timedelta(minutes=k) for k in range(6)])
+    first = client.get(f'/api/history/{industry}?limit=3')
+    assert [r['id'] for r in first.get_json()] == ids[3:]
+    add_readings(client, auth, industry, [START + timedelta(hours=1)])
+    second = client.get(f"/api/history/{industry}?limit=3&cursor={first.headers['X-Next-Cursor']}")
+    assert [r['id'] for r in second.get_json()] == ids[:3]
+
+
+def test_short_page_has_no_cursor(client, auth, industry):
+    add_readings(client, auth, industry, [START])
+    resp = client.get(f'/api/history/{industry}?limit=10')
+    assert len(resp.get_json()) == 1
+    assert 'X-Next-Cursor' not in resp.headers
+
+
+def test_violation_pages(client, auth, industry):
+    ids = add_readings(client, auth, industry, [START + timedelta(days=300, minutes=k) for k in range(7)],
+                       pm25=500)
+    pages = walk(client, '/api/violations?limit=3', **auth)
+    seen = [i for page in pages for i in page]
+    assert len(seen) == len(set(seen))
+    # The newest violations in the database are this test's
+    assert seen[:7] == ids[::-1]
@@ -0,0 +1,82 @@
+import queue
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+import pytest
+
+import simulation
+from limits import registry as limit_registry
+from metrics import SIM_DROPPED
+from models import db
+from scheduler import Site
+
+
+@pytest.fixture
+def fleet(app, monkeypatch):
+    monkeypatch.setattr(simulation, 'app', app)
+    monkeypatch.setattr(simulation, 'db', db)
+    return simulation.FleetSimulator(drones=1, tick_hz=100, time_scale=100)
+
+
+class SaturatedWriter:
+    def submit(self, row):
+        raise queue.Full
+
+
+def test_saturated_writer_drops_the_sample(app, fleet, monkeypatch):
+    monkeypatch.setattr(simulation, 'get_writer', lambda: SaturatedWriter())
+    drone = fleet.drones[0]
+    with app.app_context():
+        drone.limits = limit_registry.get('Steel Industry')
+    drone.industry = Site(1, 'Plant', 'Steel Industry', 21.0, 78.0)
+    drone.state, drone.samples_left = 'scanning', 2
+    dropped = SIM_DROPPED._values.get((), 0)
+
+    fleet._scan(drone, 0.0)
+    assert SIM_DROPPED._values[()] == dropped + 1
+    assert fleet.readings == 0
+    # The drone carries on with its scan
+    assert drone.samples_left == 1
+    assert [d for _, _, d in fleet._heap] == [drone]
+
+
+def test_failed_step_keeps_the_loop_running(fleet, monkeypatch):
+    calls = []
+
+    def step(drone, now):
+        calls.append(drone.id)
+        if len(calls) >= 3:
+            fleet.stop()
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(fleet, '_step', step)
+    thread = threading.Thread(target=fleet.run, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert calls == [1, 1, 1]
+    assert fleet.drones[0].state == 'idle'
+
+
+def test_stored_reading_without_fanout(app, fleet, monkeypatch, caplog):
+    class Writer:
+        def submit(self, row):
+            row.setdefault('timestamp', datetime.utcnow())
+            self.fut = Future()
+            return self.fut
+
+    writer = Writer()
+    monkeypatch.setattr(simulation, 'get_writer', lambda: writer)
+    monkeypatch.setattr(simulation, 'get_fanout', lambda: None)
+    drone = fleet.drones[0]
+    with app.app_context():
+        drone.limits = limit_registry.get('Steel Industry')
+    drone.industry = Site(1, 'Plant', 'Steel Industry', 21.0, 78.0)
+    drone.state, drone.samples_left = 'scanning', 1
+
+    fleet._scan(drone, 0.0)
+    writer.fut.set_result(42)   # runs the done callback, which logs what it raises
+    assert caplog.records == []
+    assert fleet.readings == 1
+    assert fleet.emits == 0
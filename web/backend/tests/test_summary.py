@@ -0,0 +1,71 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import archive
+import summary
+from models import db, IndustrySummary, SensorReading
+
+START = datetime(2026, 1, 1, 12, 0)
+
+
+@pytest.fixture
+def session(app):
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        db.session.remove()
+
+
+def reading(industry_id, reading_id, minutes, violation=False):
+    return {'id': reading_id, 'industry_id': industry_id,
+            'timestamp': START + timedelta(minutes=minutes), 'is_violation': violation}
+
+
+def row(industry_id):
+    db.session.expire_all()
+    s = db.session.get(IndustrySummary, industry_id)
+    return s.latest_reading_id, s.last_reading_at, s.violations_count
+
+
+def test_apply_inserts_then_folds(session, industry):
+    summary.apply_readings([reading(industry, 1, 0, True), reading(industry, 2, 5)])
+    assert row(industry) == (2, START + timedelta(minutes=5), 1)
+
+    # An older reading only adds to the count
+    summary.apply_readings([reading(industry, 3, 1, True)])
+    assert row(industry) == (2, START + timedelta(minutes=5), 2)
+
+    summary.apply_readings([reading(industry, 4, 10)])
+    assert row(industry) == (4, START + timedelta(minutes=10), 2)
+
+
+def test_apply_over_a_row_it_did_not_see(session, industry):
+    # Another writer inserted the row after this batch was built
+    session.add(IndustrySummary(industry_id=industry, latest_reading_id=7,
+                                last_reading_at=START, violations_count=3))
+    session.flush()
+    summary.apply_readings([reading(industry, 8, 5, True)])
+    assert row(industry) == (8, START + timedelta(minutes=5), 4)
+
+
+def test_rebuild_keeps_fully_archived_industries(app, client, auth, industry):
+    old = datetime(2015, 6, 1)
+    batch = [{'industry_id': industry, 'pm25': pm25, 'pm10': 10, 'no2': 10, 'so2': 10, 'co2': 10,
+              'timestamp': (old + timedelta(hours=k)).isoformat()} for k, pm25 in enumerate([500, 10, 500])]
+    resp = client.post('/api/readings/batch', data=json.dumps(batch), headers=auth,
+                       content_type='application/json')
+    assert resp.status_code == 201
+    with app.app_context():
+        # Summaries are rebuilt from scratch, so nothing protects the latest reading
+        db.session.query(IndustrySummary).filter_by(industry_id=industry).delete()
+        db.session.commit()
+        assert archive.compact((datetime.utcnow() - datetime(2016, 1, 1)).days) == 3
+        assert SensorReading.query.filter_by(industry_id=industry).count() == 0
+        summary.rebuild()
+        assert row(industry) == (None, old + timedelta(hours=2), 2)
+
+    listed = next(i for i in client.get('/api/industries').get_json() if i['id'] == industry)
+    assert listed['violations_count'] == 2
+    assert listed['last_reading_at'] == (old + timedelta(hours=2)).isoformat()
@@ -0,0 +1,190 @@
+"""
+Group-commit writer for sensor readings.
+
+Producers (the simulator, ingestion) hand rows to a bounded queue; a single
+background thread drains it and writes each batch with one multi-row INSERT
+and one COMMIT, flushing when the batch is full or the flush interval passes.
+`submit` blocks while the queue is full (backpressure) and returns a Future
+that resolves to the new reading id once its batch has committed.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from models import db, SensorReading
+from cache import invalidate_on_commit
+from grid import cell_of
+from metrics import Callback, WRITER_FLUSH_SECONDS, WRITER_BATCH_ROWS
+from summary import apply_readings
+from rollups import apply_readings as apply_rollups
+from forecast import apply_readings as apply_forecasts
+from anomaly import apply_readings as apply_anomalies
+
+_STOP = object()
+_COLUMNS = [c.name for c in SensorReading.__table__.columns if c.name != 'id']
+
+writer = None
+
+
+def persist(rows):
+    """
+    Bulk-insert reading dicts in the current session and run the derived
+    rollups. Fills in `id` (and defaults) on each row; the caller commits.
+    """
+    for r in rows:
+        r.setdefault('timestamp', datetime.utcnow())
+        r.setdefault('is_violation', False)
+        for column in _COLUMNS:
+            r.setdefault(column, None)
+        r['cell'] = cell_of(r['gps_lat'], r['gps_lng'])
+    table = SensorReading.__table__
+    if db.engine.dialect.name == 'sqlite':
+        # SQLite can only honour sort_by_parameter_order one row per statement.
+        # Within the write transaction rowids are handed out in VALUES order,
+        # so sorting the returned ids restores the row order.
+        ids = sorted(db.session.scalars(table.insert().returning(table.c.id), rows).all())
+    else:
+        ids = db.session.scalars(
+            table.insert().returning(table.c.id, sort_by_parameter_order=True),
+            rows,
+        ).all()
+    for r, reading_id in zip(rows, ids):
+        r['id'] = reading_id
+    apply_readings(rows)
+    apply_rollups(rows)
+    apply_forecasts(rows)
+    apply_anomalies(rows)
+    scopes = {f"industry:{r['industry_id']}" for r in rows}
+    scopes.add('industries')
+    if any(r['is_violation'] for r in rows):
+        scopes.add('violations')
+    invalidate_on_commit(db.session, *scopes)
+    return ids
+
+
+class ReadingWriter:
+    def __init__(self, app, batch_size=500, flush_interval=0.25,
+                 max_queue=10000, put_timeout=5.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._closed = False
+        self.rows_written = 0
+        self.batches_written = 0
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='reading-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, row):
+        """
+        Queue one reading dict. The timestamp is assigned here so callers can
+        use it before the row is written. Raises queue.Full if the writer has
+        been saturated for longer than `put_timeout`.
+        """
+        if self._closed:
+            raise RuntimeError('ReadingWriter is stopped')
+        row.setdefault('timestamp', datetime.utcnow())
+        fut = Future()
+        self._queue.put((row, fut), timeout=self.put_timeout)
+        return fut
+
+    def stop(self, timeout=10.0):
+        """Stop accepting rows and flush everything already queued."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    # ── Worker ────────────────────────────────────────────────────────────────
+    def _run(self):
+        with self.app.app_context():
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._flush(batch)
+            # Anything submitted while the stop sentinel was in flight
+            leftover = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    leftover.append(item)
+            if leftover:
+                self._flush(leftover)
+            db.session.remove()
+
+    def _flush(self, batch):
+        rows = [row for row, _ in batch]
+        t0 = time.perf_counter()
+        try:
+            ids = persist(rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f'[WRITER] Flush of {len(batch)} readings failed: {e}')
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        WRITER_FLUSH_SECONDS.observe(time.perf_counter() - t0)
+        WRITER_BATCH_ROWS.observe(len(rows))
+        self.rows_written += len(rows)
+        self.batches_written += 1
+        for (_, fut), reading_id in zip(batch, ids):
+            fut.set_result(reading_id)
+
+
+def start_writer(flask_app):
+    global writer
+    writer = ReadingWriter(
+        flask_app,
+        batch_size=int(os.getenv('WRITER_BATCH_SIZE', 500)),
+        flush_interval=float(os.getenv('WRITER_FLUSH_MS', 250)) / 1000,
+        max_queue=int(os.getenv('WRITER_QUEUE_SIZE', 10000)),
+    ).start()
+    atexit.register(writer.stop)
+    print('[WRITER] Reading writer started.')
+    return writer
+
+
+def get_writer():
+    return writer
+
+
+Callback('aerosense_writer_queue_depth', 'Readings waiting for the group-commit writer',
+         lambda: writer.depth if writer else 0)
+Callback('aerosense_writer_rows_total', 'Readings committed by the writer',
+         lambda: writer.rows_written if writer else 0, kind='counter')
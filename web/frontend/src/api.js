@@ -4,10 +4,33 @@ const api = axios.create({
     baseURL: 'http://localhost:5000/api',
 })
 
+// Last response per GET url; revalidated with If-None-Match so remounting a
+// page costs a 304 instead of a fresh query on the server
+const responses = new Map()
+
 api.interceptors.request.use((config) => {
     const token = localStorage.getItem('aero_token')
     if (token) config.headers.Authorization = `Bearer ${token}`
+    if ((config.method || 'get') === 'get') {
+        const cached = responses.get(api.getUri(config))
+        if (cached) config.headers['If-None-Match'] = cached.etag
+        config.validateStatus = (status) => (status >= 200 && status < 300) || status === 304
+    }
     return config
 })
 
+api.interceptors.response.use((response) => {
+    const { config } = response
+    if ((config.method || 'get') !== 'get') return response
+    const key = api.getUri(config)
+    if (response.status === 304) {
+        const cached = responses.get(key)
+        return { ...response, status: 200, data: cached.data, headers: cached.headers }
+    }
+    if (response.headers.etag) {
+        responses.set(key, { etag: response.headers.etag, data: response.data, headers: response.headers })
+    }
+    return response
+})
+
 export default api
@@ -1,8 +1,12 @@
 import { useEffect, useRef, useState } from 'react'
 import { io } from 'socket.io-client'
 
-export function useSocket(url = 'http://localhost:5000') {
+// drone_update events are deltas against the previous update for the
+// subscribed industry; `subscribed` carries the static fields and a snapshot.
+export function useSocket(industryId, url = 'http://localhost:5000') {
     const socketRef = useRef(null)
+    const subscriptionRef = useRef(null)
+    const stateRef = useRef({})
     const [connected, setConnected] = useState(false)
     const [droneState, setDroneState] = useState(null)
     const [liveReading, setLiveReading] = useState(null)
@@ -11,13 +15,36 @@ export function useSocket(url = 'http://localhost:5000') {
         const socket = io(url, { transports: ['websocket', 'polling'] })
         socketRef.current = socket
 
-        socket.on('connect', () => { setConnected(true) })
+        socket.on('connect', () => {
+            setConnected(true)
+            if (subscriptionRef.current != null) {
+                socket.emit('subscribe', { industry_id: subscriptionRef.current })
+            }
+        })
         socket.on('disconnect', () => { setConnected(false) })
         socket.on('drone_state', (data) => { setDroneState(data) })
-        socket.on('drone_update', (data) => { setLiveReading(data) })
+        socket.on('subscribed', (data) => {
+            const { snapshot, ...info } = data
+            stateRef.current = { ...info, ...(snapshot || {}) }
+        })
+        socket.on('drone_update', (delta) => {
+            if (delta.industry_id !== subscriptionRef.current) return
+            stateRef.current = { ...stateRef.current, ...delta }
+            setLiveReading(stateRef.current)
+        })
 
         return () => { socket.disconnect() }
     }, [url])
 
+    useEffect(() => {
+        const socket = socketRef.current
+        const previous = subscriptionRef.current
+        subscriptionRef.current = industryId ?? null
+        stateRef.current = {}
+        if (!socket || !socket.connected) return
+        if (previous != null) socket.emit('unsubscribe', { industry_id: previous })
+        if (industryId != null) socket.emit('subscribe', { industry_id: industryId })
+    }, [industryId])
+
     return { connected, droneState, liveReading, socket: socketRef.current }
 }
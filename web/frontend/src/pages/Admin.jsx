@@ -90,7 +90,7 @@ export default function Admin() {
                 if (r.data.mode === 'demo') {
                     setStatusMsg(`✓ Demo: Notice logged for ${r.data.email_sent_to} (configure SMTP to send real emails)`)
                 } else {
-                    setStatusMsg(`✓ Email sent to ${r.data.email_sent_to}`)
+                    setStatusMsg(`✓ Notice queued for ${r.data.email_sent_to} (job #${r.data.job_id})`)
                 }
             } else {
                 setStatusMsg('⚠ Email send failed (check SMTP config in backend/.env)')
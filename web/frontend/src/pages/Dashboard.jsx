@@ -9,9 +9,9 @@ import api from '../api'
 const POLLUTANTS = ['pm25', 'pm10', 'no2', 'so2', 'co2']
 
 export default function Dashboard() {
-    const { connected, droneState, liveReading } = useSocket()
     const [industries, setIndustries] = useState([])
     const [selectedId, setSelectedId] = useState(null)
+    const { connected, droneState, liveReading } = useSocket(selectedId)
     const [history, setHistory] = useState([])
     const [currentReading, setCurrentReading] = useState(null)
     const [currentLimits, setCurrentLimits] = useState(null)
@@ -50,7 +50,7 @@ export default function Dashboard() {
         if (!liveReading) return
         if (liveReading.industry_id !== selectedId) return
         setCurrentReading(liveReading)
-        setCurrentLimits(liveReading.limits)
+        if (liveReading.limits) setCurrentLimits(liveReading.limits)
         historyRef.current = [...historyRef.current.slice(-39), liveReading]
         setHistory([...historyRef.current])
     }, [liveReading])